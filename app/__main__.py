@@ -0,0 +1,95 @@
+# Lanzador de producción: python -m app
+# Levanta varios procesos (workers) de uvicorn con la API, por defecto uno por núcleo disponible (hasta 8). Cada worker abre su
+# propio pool de conexiones, ejecutor de bcrypt y caché, así que DB_POOL_MAX y HASH_TRABAJADORES son por worker.
+# Los RUT con k y los índices únicos de CLIENTES se preparan una vez acá, antes de levantar los workers.
+# Usa uvloop y httptools si están instalados (event loop y parser HTTP en C); si no, los de Python.
+# Al recibir SIGTERM o Ctrl+C deja de aceptar conexiones, espera las peticiones en curso hasta
+# API_TIMEOUT_APAGADO segundos y después cierra el repositorio, el ejecutor de hash y el pool (ciclo_de_vida).
+import importlib.util  # para saber si uvloop y httptools están instalados sin importarlos
+import math  # para redondear hacia arriba la cuota de CPU
+import os  # para leer la configuración desde variables de entorno
+from typing import Optional
+
+import uvicorn
+
+
+def instalado(modulo: str) -> bool:
+    return importlib.util.find_spec(modulo) is not None
+
+
+# Tope de workers cuando no se fija API_WORKERS: cada worker carga su propio índice de búsqueda (unos 650 MiB con
+# un millón de clientes), abre hasta DB_POOL_MAX conexiones y tiene sus propios hilos de bcrypt
+TOPE_WORKERS = 8
+
+
+def cuota_cgroup() -> Optional[float]:
+    # CPUs que permite la cuota CFS del contenedor (docker --cpus, limits.cpu de Kubernetes); None si no tiene cuota.
+    # sched_getaffinity y cpu_count no la ven: muestran todos los núcleos del servidor
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as archivo:  # cgroup v2: "<cuota> <periodo>" o "max <periodo>"
+            cuota, periodo = archivo.read().split()[:2]
+        return None if cuota == "max" else int(cuota) / int(periodo)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as archivo:  # cgroup v1: -1 si no hay cuota
+            cuota = int(archivo.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as archivo:
+            periodo = int(archivo.read())
+        return cuota / periodo if cuota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def workers_por_defecto() -> int:
+    # Un worker por núcleo que este proceso puede usar: respeta taskset y la cuota de CPU del contenedor,
+    # con un tope de TOPE_WORKERS por la memoria y las conexiones que suma cada uno
+    if hasattr(os, "process_cpu_count"):  # Python 3.13+
+        nucleos = os.process_cpu_count() or 1
+    elif hasattr(os, "sched_getaffinity"):
+        nucleos = len(os.sched_getaffinity(0))
+    else:
+        nucleos = os.cpu_count() or 1
+    cuota = cuota_cgroup()
+    if cuota is not None:
+        nucleos = min(nucleos, max(1, math.ceil(cuota)))  # con --cpus=1.5 se usan 2 workers
+    return min(nucleos, TOPE_WORKERS)
+
+
+def preparar_bd():
+    # Los RUT con k y los índices únicos se preparan una sola vez acá, antes de levantar los workers: si cada
+    # worker lo hiciera al partir, competirían por el mismo UPDATE y el mismo CREATE INDEX
+    from app.main import crear_pool, asegurar_indices
+
+    pool = crear_pool()
+    try:
+        pool.abrir()
+        asegurar_indices(pool)
+    finally:
+        pool.cerrar()
+    os.environ["DB_ASEGURAR_INDICES"] = "0"  # los workers heredan el entorno y ya no lo repiten
+
+
+def main():
+    concurrencia = os.getenv("API_MAX_CONCURRENCIA")
+    workers = int(os.getenv("API_WORKERS", str(workers_por_defecto())))
+    if workers > 1 and os.getenv("DB_ASEGURAR_INDICES", "1") == "1":
+        preparar_bd()  # si falla no se levanta ningún worker
+    uvicorn.run(
+        "app.main:api",  # como texto, para que cada worker importe la API por su cuenta
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PUERTO", "8000")),
+        workers=workers,
+        loop=os.getenv("API_LOOP", "uvloop" if instalado("uvloop") else "asyncio"),
+        http=os.getenv("API_HTTP", "httptools" if instalado("httptools") else "h11"),
+        timeout_keep_alive=int(os.getenv("API_KEEP_ALIVE", "30")),  # más que el timeout inactivo del balanceador
+        timeout_graceful_shutdown=int(os.getenv("API_TIMEOUT_APAGADO", "30")),  # espera de las peticiones en curso
+        backlog=int(os.getenv("API_BACKLOG", "2048")),  # conexiones en cola del socket antes de aceptarlas
+        limit_concurrency=int(concurrencia) if concurrencia else None,  # sobre esto uvicorn responde 503
+        access_log=os.getenv("API_ACCESS_LOG", "0") == "1",  # el log por petición cuesta CPU; las métricas ya cuentan todo
+        log_level=os.getenv("API_LOG", "info"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,37 @@
+import argparse
+import json
+import os
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
 import cx_Oracle
 import bcrypt
 
+# Archivo donde se guarda el último RUT procesado para poder retomar si el proceso se corta
+ARCHIVO_CHECKPOINT = "actualizar_hash.checkpoint.json"
+
+# Solo traemos desde la BD las contraseñas que todavía no son hash bcrypt, por páginas ordenadas por RUT.
+# La primera página va sin "RUT > :ultimo_rut": Oracle toma '' como NULL y esa condición no traería ninguna fila
+SQL_PENDIENTES = """
+    SELECT RUT, CONTRASENIA FROM CLIENTES
+    WHERE {desde}CONTRASENIA IS NOT NULL
+      AND NOT ((CONTRASENIA LIKE '$2b$%' OR CONTRASENIA LIKE '$2a$%') AND LENGTH(CONTRASENIA) = 60)
+    ORDER BY RUT
+    FETCH FIRST :lote ROWS ONLY
+"""
+SQL_PENDIENTES_INICIO = SQL_PENDIENTES.format(desde="")
+SQL_PENDIENTES_DESDE = SQL_PENDIENTES.format(desde="RUT > :ultimo_rut\n      AND ")
+
+# Solo si la contraseña sigue siendo la que se leyó: si se cambió por la API mientras se hasheaba el lote, no se pisa
+SQL_ACTUALIZAR = "UPDATE CLIENTES SET CONTRASENIA = :p_hash WHERE RUT = :p_rut AND CONTRASENIA = :p_anterior"
+
 def get_conexion():
     try:
-        dsn = cx_Oracle.makedsn("localhost", 1521, service_name="XE")
-        conexion = cx_Oracle.connect(user="integracion", password="integracion", dsn=dsn)
+        # Misma configuración que la API (DB_DSN o DB_HOST/DB_PUERTO/DB_SERVICIO, DB_USUARIO y DB_CLAVE)
+        dsn = os.getenv("DB_DSN") or cx_Oracle.makedsn(os.getenv("DB_HOST", "localhost"), int(os.getenv("DB_PUERTO", "1521")),
+                                                       service_name=os.getenv("DB_SERVICIO", "XE"))
+        conexion = cx_Oracle.connect(user=os.getenv("DB_USUARIO", "integracion"), password=os.getenv("DB_CLAVE", "integracion"), dsn=dsn)
         return conexion
     except Exception as e:
         print("Error al conectar a BD:", e)
@@ -16,48 +43,91 @@ def es_hash_bcrypt(password):
         return False
     return (password.startswith("$2b$") or password.startswith("$2a$")) and len(password) == 60
 
-def actualizar_contrasenas():
+def hashear(contrasenia, costo=12):
+    # Se ejecuta en los procesos del pool: recibe texto plano y devuelve el hash bcrypt
+    return bcrypt.hashpw(contrasenia.encode('utf-8'), bcrypt.gensalt(rounds=costo)).decode('utf-8')
+
+def leer_checkpoint(ruta):
+    if not os.path.exists(ruta):
+        return {"ultimo_rut": None, "actualizadas": 0}
+    with open(ruta, encoding="utf-8") as archivo:
+        checkpoint = json.load(archivo)
+    checkpoint["ultimo_rut"] = checkpoint.get("ultimo_rut") or None  # los checkpoints viejos guardaban "" al partir
+    return checkpoint
+
+def guardar_checkpoint(ruta, datos):
+    # Escribimos en un archivo temporal y lo renombramos para no dejar un checkpoint a medias
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, ruta)
+
+def actualizar_contrasenas(trabajadores=None, tamano_lote=1000, simulacion=False, ruta_checkpoint=ARCHIVO_CHECKPOINT, costo=12):
+    checkpoint = leer_checkpoint(ruta_checkpoint)
+    if checkpoint["ultimo_rut"]:
+        print(f"Retomando desde el RUT {checkpoint['ultimo_rut']} ({checkpoint['actualizadas']} actualizadas antes)")
+
+    procesos = trabajadores or cpu_count()
+    procesadas = 0
+    con_error = 0
+    omitidas = 0  # contraseñas que cambiaron entremedio (ya las hasheó la API)
+    inicio = time.monotonic()
     try:
         conexion = get_conexion()
         cursor = conexion.cursor()
-        
-        # Obtener RUT y contrasena actual de todos los clientes
-        cursor.execute("SELECT RUT, CONTRASENIA FROM CLIENTES")
-        clientes = cursor.fetchall()
-
-        for rut, contrasenia in clientes:
-            if contrasenia is None:
-                print(f"[{rut}] Contraseña vacía, saltando...")
-                continue
-
-            # Verificar si la contraseña es hash bcrypt válido
-            if es_hash_bcrypt(contrasenia):
-                # Verificamos que el hash sea válido tratando de validar la contraseña con el hash
-                # Aquí no tenemos la contraseña original para probar, solo validamos formato
-                print(f"[{rut}] Contraseña parece hash bcrypt válido, no se cambia.")
-                continue
-            else:
-                # Contraseña no tiene formato bcrypt válido, asumimos que está en texto plano
-                print(f"[{rut}] Contraseña sin hash válido, se aplicará hash bcrypt.")
-
-                # Aquí tenemos que hashéar la contraseña
-                # Si la contraseña está guardada en texto plano: 
-                # Si es el hash viejo, no se puede saber la contraseña original, pero suponemos que sí es texto plano
-                password_bytes = contrasenia.encode('utf-8')
-                hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
-                hashed_str = hashed.decode('utf-8')
-
-                # Actualizamos la contraseña con el hash correcto
-                try:
-                    cursor.execute("UPDATE CLIENTES SET CONTRASENIA = :p_hash WHERE RUT = :p_rut",
-                                   {"p_hash": hashed_str, "p_rut": rut})
-                    conexion.commit()
-                    print(f"[{rut}] Contraseña actualizada a hash bcrypt correctamente.")
-                except Exception as e:
-                    print(f"[{rut}] ERROR al actualizar contraseña: {e}")
+        cursor.arraysize = tamano_lote
+
+        with Pool(processes=procesos) as pool:
+            while True:
+                if checkpoint["ultimo_rut"] is None:
+                    cursor.execute(SQL_PENDIENTES_INICIO, {"lote": tamano_lote})
+                else:
+                    cursor.execute(SQL_PENDIENTES_DESDE, {"ultimo_rut": checkpoint["ultimo_rut"], "lote": tamano_lote})
+                filas = [(rut, contrasenia) for rut, contrasenia in cursor.fetchall() if not es_hash_bcrypt(contrasenia)]
+                if not filas:
+                    break
+
+                # Contraseña no tiene formato bcrypt válido, asumimos que está en texto plano y la hasheamos en paralelo
+                hashes = pool.map(partial(hashear, costo=costo), [contrasenia for _, contrasenia in filas], chunksize=max(1, len(filas) // (4 * procesos)))
+
+                if not simulacion:
+                    datos = [{"p_hash": hashed, "p_rut": rut, "p_anterior": contrasenia} for (rut, contrasenia), hashed in zip(filas, hashes)]
+                    try:
+                        cursor.executemany(SQL_ACTUALIZAR, datos, batcherrors=True, arraydmlrowcounts=True)
+                        fallidas = set()
+                        for error in cursor.getbatcherrors():
+                            fallidas.add(error.offset)
+                            print(f"[{filas[error.offset][0]}] ERROR al actualizar contraseña: {error.message}")
+                        # 0 filas actualizadas: la contraseña ya no es la leída, se deja como está
+                        sin_cambio = sum(1 for posicion, filas_afectadas in enumerate(cursor.getarraydmlrowcounts())
+                                         if filas_afectadas == 0 and posicion not in fallidas)
+                        conexion.commit()
+                        con_error += len(fallidas)
+                        omitidas += sin_cambio
+                    except Exception as e:
+                        conexion.rollback()
+                        print(f"ERROR al actualizar el lote que empieza en {filas[0][0]}: {e}")
+                        raise
+
+                procesadas += len(filas)
+                checkpoint["ultimo_rut"] = filas[-1][0]
+                if not simulacion:
+                    checkpoint["actualizadas"] += len(filas) - len(fallidas) - sin_cambio
+                    guardar_checkpoint(ruta_checkpoint, checkpoint)
+
+                transcurrido = time.monotonic() - inicio
+                print(f"Lote hasta {checkpoint['ultimo_rut']}: {procesadas} contraseñas "
+                      f"({procesadas / transcurrido:.1f}/s){' [simulación]' if simulacion else ''}")
+
+        transcurrido = time.monotonic() - inicio
+        print(f"Listo: {procesadas} contraseñas {'revisadas (simulación)' if simulacion else 'actualizadas a hash bcrypt'}, "
+              f"{con_error} con error, {omitidas} omitidas porque cambiaron durante la migración, en {transcurrido:.1f} s")
+        if not simulacion and os.path.exists(ruta_checkpoint):
+            os.remove(ruta_checkpoint)  # la migración terminó completa, la próxima vez parte desde el inicio
 
     except Exception as e:
         print("Error general:", e)
+        print(f"Se puede retomar volviendo a ejecutar el script (checkpoint en {ruta_checkpoint})")
     finally:
         if 'cursor' in locals():
             cursor.close()
@@ -65,4 +135,11 @@ def actualizar_contrasenas():
             conexion.close()
 
 if __name__ == "__main__":
-    actualizar_contrasenas()
+    parser = argparse.ArgumentParser(description="Convierte a hash bcrypt las contraseñas guardadas en texto plano")
+    parser.add_argument("--workers", type=int, default=None, help="procesos para bcrypt (por defecto todos los núcleos)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="filas por lote y por commit")
+    parser.add_argument("--dry-run", action="store_true", help="calcula los hashes pero no guarda nada en la BD")
+    parser.add_argument("--checkpoint", default=ARCHIVO_CHECKPOINT, help="archivo para retomar una ejecución interrumpida")
+    parser.add_argument("--costo", type=int, default=12, help="costo de bcrypt (el mismo HASH_COSTO que usa la API)")
+    args = parser.parse_args()
+    actualizar_contrasenas(args.workers, args.batch_size, args.dry_run, args.checkpoint, args.costo)
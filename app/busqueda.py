@@ -0,0 +1,357 @@
+# Búsqueda de clientes por nombre, email o dirección (GET /clientes/search?q=...).
+# Índice invertido en memoria del proceso: cada texto se normaliza (minúsculas, sin tildes: "Ñuñoa" -> "nunoa"),
+# se corta en palabras y por cada campo se guarda palabra -> documentos que la contienen. Cada término de la
+# consulta calza con las palabras que empiezan con él, así "juan per" encuentra "Juan Pérez".
+# Para ordenar, un calce en el nombre vale más que en el email y este más que en la dirección, y una palabra
+# completa vale el doble que un prefijo. Se recorre primero el término más selectivo y se deja de buscar
+# apenas el resto no puede superar a los mejores resultados encontrados.
+# El índice se carga desde la BD en un hilo aparte al iniciar y se reconstruye cada cierto tiempo; los
+# endpoints de escritura lo actualizan al momento en el mismo proceso.
+import heapq  # para quedarse con los mejores resultados sin ordenar todos
+import logging  # para avisar si falla la carga del índice
+import re  # para cortar los textos en palabras
+import sys  # sys.intern: cada palabra repetida se guarda una sola vez
+import threading  # para proteger el índice y cargarlo en segundo plano
+import time  # para medir cuánto demora la carga
+from array import array  # listas de documentos compactas (4 bytes por documento)
+from bisect import bisect_left, insort  # para encontrar las palabras que empiezan con un prefijo y agregar las nuevas
+from itertools import chain
+from typing import Optional
+
+from app.validaciones import normalizar_texto  # misma normalización que región y comuna
+
+log = logging.getLogger("app.busqueda")
+
+# Campos indexados y cuánto vale un calce en cada uno
+CAMPOS = ("NOMBRE_COMPLETO", "EMAIL", "DIRECCION")
+PESOS = (3, 2, 1)
+MAX_TERMINOS = 8  # términos de la consulta que se consideran
+MAX_PALABRAS_PREFIJO = 50000  # un prefijo que calza con más palabras que esto solo se usa para filtrar
+MAX_BORRADO_DIRECTO = 1000  # listas de documentos más largas que esto se limpian en la siguiente recarga
+_VACIO = ((),) * len(CAMPOS)  # palabras de un documento eliminado
+_PALABRAS = re.compile(r"[^\W_]+")  # letras y números; separa en espacios, @, puntos, guiones, etc.
+_FIN_PREFIJO = "\U0010ffff"  # mayor que cualquier carácter: prefijo + esto cierra el rango de palabras
+
+
+def palabras(texto: Optional[str]) -> tuple:
+    # "Av. O'Higgins 123" -> ("av", "o", "higgins", "123")
+    if not texto:
+        return ()
+    return tuple(map(sys.intern, _PALABRAS.findall(normalizar_texto(texto))))
+
+
+class IndiceBusqueda:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documentos = [{} for _ in CAMPOS]  # por campo: palabra -> array de documentos
+        self._ordenadas = [[] for _ in CAMPOS]  # por campo: palabras ordenadas, para buscar por prefijo
+        self._nuevas = [set() for _ in CAMPOS]  # palabras que trae la carga; se ordenan todas juntas al terminarla
+        self._ruts = []  # documento -> RUT (None si se eliminó)
+        self._palabras = []  # documento -> palabras de cada campo
+        self._por_rut = {}  # RUT -> documento
+        self._libres = []  # documentos eliminados que se pueden reutilizar
+        self._cargando = True  # mientras se carga desde la BD las palabras nuevas se juntan en _nuevas
+        self._tocados = set()  # RUT cambiados durante la carga (la fila que trae la carga puede ser más vieja)
+        self._pendientes = {}  # RUT -> {campo: palabras} de cambios parciales a clientes que la carga todavía no trae
+
+    # --- Cambios (con el lock tomado) ---
+
+    def _poner(self, documento: int, por_campo: tuple):
+        # Cambia las palabras del documento tocando solo las que entran o salen
+        anteriores = self._palabras[documento]
+        self._palabras[documento] = por_campo
+        for campo, (antes, ahora) in enumerate(zip(anteriores, por_campo)):
+            if antes == ahora:
+                continue
+            indice = self._documentos[campo]
+            antes, ahora = set(antes), set(ahora)
+            for palabra in antes - ahora:
+                documentos = indice[palabra]
+                # Sacar un documento obliga a recorrer la lista: en las largas ("cl", "calle") queda y la
+                # búsqueda lo descarta al ver que ya no tiene esa palabra
+                if len(documentos) <= MAX_BORRADO_DIRECTO:
+                    documentos.remove(documento)
+            for palabra in ahora - antes:
+                documentos = indice.get(palabra)
+                if documentos is None:
+                    # las listas vacías se conservan, así una palabra entra una sola vez a la lista ordenada
+                    documentos = indice[palabra] = array("I")
+                    if self._cargando:
+                        self._nuevas[campo].add(palabra)
+                    else:
+                        # Se inserta en su lugar: mover los punteros de la lista cuesta menos de 1 ms con un millón
+                        # de palabras, en cambio reordenarla completa toma más de 100 ms con el lock tomado
+                        insort(self._ordenadas[campo], palabra)
+                documentos.append(documento)
+
+    def _guardar(self, rut: str, por_campo: tuple):
+        documento = self._por_rut.get(rut)
+        if documento is None:
+            if self._libres:
+                documento = self._libres.pop()
+                self._ruts[documento] = rut
+            else:
+                documento = len(self._ruts)
+                self._ruts.append(rut)
+                self._palabras.append(_VACIO)
+            self._por_rut[rut] = documento
+        self._poner(documento, por_campo)
+
+    def actualizar(self, rut: str, campos: dict):
+        # Cliente creado o modificado; 'campos' puede traer solo algunas de las columnas de CAMPOS
+        indexados = campos.keys() & set(CAMPOS)
+        if not indexados:
+            return  # por ejemplo, solo cambió la contraseña
+        with self._lock:
+            documento = self._por_rut.get(rut)
+            if documento is None and len(indexados) < len(CAMPOS):
+                if self._cargando:
+                    # Cambio parcial de un cliente que la carga todavía no trae: se guarda y se aplica sobre su fila,
+                    # que puede haberse leído antes del cambio
+                    pendiente = self._pendientes.setdefault(rut, {})
+                    for campo in indexados:
+                        pendiente[campo] = palabras(campos[campo])
+                return
+            anteriores = self._palabras[documento] if documento is not None else _VACIO
+            por_campo = tuple(palabras(campos[c]) if c in campos else anteriores[i] for i, c in enumerate(CAMPOS))
+            if self._cargando:
+                self._tocados.add(rut)
+                self._pendientes.pop(rut, None)  # el cambio completo ya trae todos los campos
+            self._guardar(rut, por_campo)
+
+    def eliminar(self, rut: str):
+        with self._lock:
+            if self._cargando:
+                self._tocados.add(rut)
+                self._pendientes.pop(rut, None)
+            documento = self._por_rut.pop(rut, None)
+            if documento is None:
+                return
+            self._poner(documento, _VACIO)
+            self._ruts[documento] = None
+            self._libres.append(documento)
+
+    def cargar(self, filas: list):
+        # Lote de (RUT, NOMBRE_COMPLETO, EMAIL, DIRECCION) leído de la BD; se normaliza antes de tomar el lock
+        preparadas = [(rut, tuple(palabras(t) for t in textos)) for rut, *textos in filas]
+        with self._lock:
+            for rut, por_campo in preparadas:
+                if rut in self._tocados:
+                    continue
+                pendiente = self._pendientes.pop(rut, None)
+                if pendiente is not None:
+                    por_campo = tuple(pendiente.get(c, por_campo[i]) for i, c in enumerate(CAMPOS))
+                self._guardar(rut, por_campo)
+
+    def terminar_carga(self):
+        with self._lock:
+            self._cargando = False
+            self._tocados.clear()
+            self._pendientes.clear()  # cambios de clientes que la carga no trajo (por ejemplo, ya eliminados)
+            for campo, nuevas in enumerate(self._nuevas):
+                self._ordenadas[campo] = sorted(chain(self._ordenadas[campo], nuevas))
+                nuevas.clear()
+
+    # --- Búsqueda ---
+
+    def _coincidencias(self, termino: str) -> list:
+        # (puntaje, campo, palabras) de cada forma de calzar el término, de mayor a menor puntaje
+        niveles = []
+        for campo, peso in enumerate(PESOS):
+            ordenadas = self._ordenadas[campo]
+            prefijos = ordenadas[bisect_left(ordenadas, termino):bisect_left(ordenadas, termino + _FIN_PREFIJO)]
+            if termino in self._documentos[campo]:
+                niveles.append((peso * 2, campo, [termino]))  # palabra completa
+            niveles.append((peso, campo, [p for p in prefijos if p != termino]))
+        niveles.sort(key=lambda nivel: -nivel[0])
+        return niveles
+
+    @staticmethod
+    def _maximo(niveles: list) -> int:
+        # Lo más que puede sumar el término (0 si no calza con ninguna palabra)
+        return max((puntaje for puntaje, _, lista in niveles if lista), default=0)
+
+    def _costo(self, niveles: list) -> float:
+        # Documentos que habría que recorrer si este término guía la búsqueda
+        if sum(len(lista) for _, _, lista in niveles) > MAX_PALABRAS_PREFIJO:
+            return float("inf")
+        return sum(len(self._documentos[campo][p]) for _, campo, lista in niveles for p in lista)
+
+    def _candidatos(self, campo: int, lista: list):
+        # Documentos que tienen alguna de estas palabras en el campo (descarta los que ya no la tienen)
+        documentos = self._documentos[campo]
+        for palabra in lista:
+            for documento in documentos[palabra]:
+                if palabra in self._palabras[documento][campo]:
+                    yield documento
+
+    @staticmethod
+    def _puntaje(por_campo: tuple, termino: str) -> int:
+        # Mejor calce del término en las palabras del documento (0 si no calza); los campos van del más
+        # valioso al menos valioso, así que se para apenas los que quedan no pueden mejorar el puntaje
+        mejor = 0
+        for campo, lista in enumerate(por_campo):
+            peso = PESOS[campo]
+            if mejor >= peso * 2:
+                break
+            for palabra in lista:
+                if palabra.startswith(termino):
+                    if palabra == termino:
+                        return peso * 2  # ningún campo que queda puede dar más
+                    mejor = max(mejor, peso)
+        return mejor
+
+    def buscar(self, consulta: str, limite: int) -> list:
+        # Hasta 'limite' pares (RUT, puntaje) que calzan con todos los términos, de mayor a menor puntaje
+        terminos = list(dict.fromkeys(palabras(consulta)))[:MAX_TERMINOS]
+        guias = [t for t in terminos if len(t) >= 2]  # un término de una letra solo filtra
+        if not guias:
+            return []
+        with self._lock:
+            niveles = {t: self._coincidencias(t) for t in guias}
+            maximos = {t: self._maximo(niveles[t]) for t in guias}
+            if not all(maximos.values()):
+                return []  # algún término no aparece en ningún cliente
+            guia = min(guias, key=lambda t: self._costo(niveles[t]))
+            otros = [t for t in terminos if t != guia]
+            maximo_otros = sum(maximos.get(t, 2 * max(PESOS)) for t in otros)  # lo más que pueden sumar los demás términos
+            mejores = []  # min-heap de (puntaje, -orden, documento) con los 'limite' mejores
+            vistos = set()
+            orden = 0
+            for puntaje_guia, campo, lista in niveles[guia]:
+                tope = puntaje_guia + maximo_otros  # lo más que puede sacar un documento de este nivel
+                if len(mejores) >= limite and mejores[0][0] >= tope:
+                    break
+                for documento in self._candidatos(campo, lista):
+                    if documento in vistos:
+                        continue  # ya se contó con un nivel de más puntaje
+                    vistos.add(documento)
+                    total = puntaje_guia
+                    por_campo = self._palabras[documento]
+                    for termino in otros:
+                        puntaje = self._puntaje(por_campo, termino)
+                        if not puntaje:
+                            break
+                        total += puntaje
+                    else:
+                        orden += 1
+                        entrada = (total, -orden, documento)  # a igual puntaje gana el primero encontrado
+                        if len(mejores) < limite:
+                            heapq.heappush(mejores, entrada)
+                        else:
+                            heapq.heappushpop(mejores, entrada)
+                        if len(mejores) >= limite and mejores[0][0] >= tope:
+                            break  # ningún documento que queda en este nivel puede superar a los encontrados
+            return [(self._ruts[documento], total) for total, _, documento in sorted(mejores, reverse=True)]
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"documentos": len(self._por_rut),
+                    "palabras": sum(len(documentos) for documentos in self._documentos)}
+
+
+# Mantiene el índice listo: lo carga al iniciar, lo reconstruye cada 'recarga_s' segundos (para ver los cambios
+# hechos por otros workers) y reparte los cambios de este proceso al índice en uso y al que se está armando.
+class BuscadorClientes:
+    def __init__(self, leer_lotes, recarga_s: float = 900, reintento_s: float = 10):
+        self._leer_lotes = leer_lotes  # función sin argumentos que entrega un generador de lotes de filas
+        self.recarga_s = recarga_s  # 0 = cargar una sola vez
+        self.reintento_s = reintento_s  # espera antes de reintentar una carga fallida
+        self._indice = None  # índice en uso (None hasta terminar la primera carga)
+        self._nuevo = None  # índice que se está cargando
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._cargas = 0
+        self._errores = 0
+        self._duracion_carga_s = 0.0
+        self._busquedas = 0
+
+    @property
+    def listo(self) -> bool:
+        return self._indice is not None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._recargar, name="indice-busqueda", daemon=True)
+        self._hilo.start()
+
+    def _recargar(self):
+        while not self._detener.is_set():
+            try:
+                self.recargar()
+                espera = self.recarga_s
+            except Exception as e:
+                with self._lock:
+                    self._nuevo = None
+                    self._errores += 1
+                log.warning("No se pudo cargar el índice de búsqueda: %s", e)
+                espera = self.reintento_s
+            if espera <= 0:
+                return
+            self._detener.wait(espera)
+
+    def recargar(self):
+        # Arma un índice nuevo desde la BD y lo deja en uso al terminar. Lo llama el hilo de fondo; también
+        # sirve después de cargar clientes por fuera de la API (por ejemplo, en los benchmarks)
+        inicio = time.perf_counter()
+        nuevo = IndiceBusqueda()
+        with self._lock:
+            self._nuevo = nuevo  # desde aquí los cambios también llegan al índice nuevo
+        lotes = self._leer_lotes()
+        try:
+            for filas in lotes:
+                if self._detener.is_set():
+                    return
+                nuevo.cargar(filas)
+        finally:
+            lotes.close()  # devuelve la conexión al pool
+        nuevo.terminar_carga()
+        with self._lock:
+            self._indice, self._nuevo = nuevo, None
+            self._cargas += 1
+            self._duracion_carga_s = time.perf_counter() - inicio
+        log.info("Índice de búsqueda cargado: %d clientes en %.1f s", nuevo.metricas()["documentos"], self._duracion_carga_s)
+
+    def _indices(self) -> list:
+        with self._lock:
+            return [indice for indice in (self._indice, self._nuevo) if indice is not None]
+
+    # actualizar, actualizar_lote y eliminar toman el lock del índice: los endpoints async los llaman con
+    # run_in_threadpool para no frenar el event loop si una búsqueda o una carga lo tiene tomado
+
+    def actualizar(self, rut: str, campos: dict):
+        for indice in self._indices():
+            indice.actualizar(rut, campos)
+
+    def actualizar_lote(self, clientes: list):
+        # [(rut, campos)] de una carga masiva
+        for indice in self._indices():
+            for rut, campos in clientes:
+                indice.actualizar(rut, campos)
+
+    def eliminar(self, rut: str):
+        for indice in self._indices():
+            indice.eliminar(rut)
+
+    def buscar(self, consulta: str, limite: int) -> list:
+        indice = self._indice
+        if indice is None:
+            return []
+        with self._lock:
+            self._busquedas += 1
+        return indice.buscar(consulta, limite)
+
+    def cerrar(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    def metricas(self) -> dict:
+        indice = self._indice
+        with self._lock:
+            resultado = {"listo": indice is not None, "cargas": self._cargas, "errores_carga": self._errores,
+                         "duracion_carga_s": round(self._duracion_carga_s, 3), "busquedas": self._busquedas,
+                         "recarga_s": self.recarga_s}
+        if indice is not None:
+            resultado.update(indice.metricas())
+        return resultado
@@ -0,0 +1,127 @@
+# Caché de lectura para clientes individuales (GET /clientes/{rut} y búsqueda por email del login).
+# El backend es intercambiable: hoy es un LRU con TTL en memoria del proceso, mañana puede ser uno compartido.
+import asyncio  # para que las peticiones que esperan la misma carga reciban el resultado sin ocupar un hilo
+import threading  # para proteger el caché cuando varias peticiones lo usan al mismo tiempo
+import time  # para el vencimiento (TTL) de cada entrada
+from collections import OrderedDict  # mantiene el orden de uso para sacar lo menos usado (LRU)
+
+
+# Backend en memoria: tamaño máximo (LRU) y tiempo de vida por entrada (TTL)
+class CacheMemoria:
+    def __init__(self, max_entradas: int = 10000, ttl: float = 60.0):
+        if max_entradas < 1 or ttl <= 0:
+            raise ValueError("Configuración de caché inválida: se requiere max_entradas >= 1 y ttl > 0")
+        self.max_entradas = max_entradas
+        self.ttl = ttl  # segundos que una entrada se considera vigente
+        self._datos = OrderedDict()  # clave -> (vence_en, valor)
+        self._lock = threading.Lock()
+        self._expiradas = 0
+        self._desalojadas = 0
+
+    def obtener(self, clave: str):
+        # Devuelve (encontrado, valor)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return False, None
+            if entrada[0] < time.monotonic():
+                del self._datos[clave]  # venció
+                self._expiradas += 1
+                return False, None
+            self._datos.move_to_end(clave)  # marcamos la entrada como usada recientemente
+            return True, entrada[1]
+
+    def guardar(self, clave: str, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)  # sacamos la menos usada
+                self._desalojadas += 1
+
+    def borrar(self, clave: str):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"backend": "memoria", "entradas": len(self._datos), "max_entradas": self.max_entradas,
+                    "ttl_s": self.ttl, "expiradas": self._expiradas, "desalojadas": self._desalojadas}
+
+
+# Backend que no guarda nada (para desactivar el caché sin cambiar los endpoints)
+class CacheNula:
+    def obtener(self, clave: str):
+        return False, None
+
+    def guardar(self, clave: str, valor):
+        pass
+
+    def borrar(self, clave: str):
+        pass
+
+    def metricas(self) -> dict:
+        return {"backend": "ninguno"}
+
+
+def _marcar_leida(tarea: asyncio.Task):
+    # Si todas las peticiones que esperaban la carga se cancelaron, nadie lee su error: lo marcamos como leído
+    # para que asyncio no avise "Task exception was never retrieved"
+    if not tarea.cancelled():
+        tarea.exception()
+
+
+class CacheLectura:
+    def __init__(self, backend):
+        self.backend = backend  # CacheMemoria, CacheNula o cualquier objeto con obtener/guardar/borrar/metricas
+        self._lock = threading.Lock()
+        self._cargando = {}  # clave -> tarea de asyncio de la carga en curso (una sola consulta por clave a la vez)
+        self._version = 0  # aumenta con cada invalidación
+        self._aciertos = 0
+        self._fallos = 0
+        self._compartidas = 0  # peticiones que esperaron la carga de otra en vez de ir a la BD
+
+    async def obtener_async(self, clave: str, cargar):
+        # Busca en el caché; si no está, espera la corrutina cargar() una sola vez aunque lleguen varias peticiones juntas
+        encontrado, valor = self.backend.obtener(clave)
+        with self._lock:
+            if encontrado:
+                self._aciertos += 1
+                return valor
+            self._fallos += 1
+            vuelo = self._cargando.get(clave)
+            if vuelo is None:
+                # La carga corre en su propia tarea, no dentro de la petición que llegó primero: si esa petición
+                # se cancela (el cliente cortó), la carga sigue y las demás reciben el resultado
+                vuelo = self._cargando[clave] = asyncio.get_running_loop().create_task(self._cargar(clave, cargar, self._version))
+                vuelo.add_done_callback(_marcar_leida)
+            else:
+                self._compartidas += 1
+        return await asyncio.shield(vuelo)  # shield: si esta petición se cancela, la carga no se cancela
+
+    async def _cargar(self, clave: str, cargar, version: int):
+        try:
+            valor = await cargar()
+            if valor is not None:
+                self.guardar(clave, valor, version)  # lo que no existe no se guarda, así un cliente nuevo se ve de inmediato
+            return valor
+        finally:
+            with self._lock:
+                del self._cargando[clave]
+
+    def guardar(self, clave: str, valor, version: int):
+        # Solo guarda si nadie invalidó mientras se leía de la BD (si no, podríamos guardar datos viejos)
+        with self._lock:
+            if version == self._version:
+                self.backend.guardar(clave, valor)
+
+    def invalidar(self, clave: str):
+        with self._lock:
+            self._version += 1
+        self.backend.borrar(clave)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            resultado = {"aciertos": self._aciertos, "fallos": self._fallos, "compartidas": self._compartidas}
+        resultado.update(self.backend.metricas())
+        return resultado
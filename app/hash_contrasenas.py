@@ -0,0 +1,189 @@
+# Ejecutor dedicado para bcrypt.
+# Hashear o validar una contraseña cuesta 100-300 ms de CPU, así que se hace en un pool aparte
+# con cupo limitado: si hay demasiadas contraseñas esperando se rechaza la petición (503) en vez de
+# acaparar los hilos que usan los endpoints baratos como GET /clientes.
+import asyncio  # para esperar el resultado sin bloquear el event loop
+import threading  # para contar las tareas pendientes de forma segura
+import time  # para medir la latencia de cada llamada
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor  # pools de hilos o de procesos
+import bcrypt  # libreria para hashear y validar contraseñas
+from app.metricas import medir_fase  # tiempo de bcrypt dentro de la petición en curso
+
+
+class SobrecargaHashError(Exception):
+    """Se lanza cuando la cola del ejecutor de contraseñas está llena."""
+
+    def __init__(self, reintentar_en: int):
+        super().__init__("Demasiadas contraseñas en proceso, intente nuevamente")
+        self.reintentar_en = reintentar_en  # segundos sugeridos para el header Retry-After
+
+
+# Estas funciones quedan a nivel de módulo para que el pool de procesos pueda usarlas
+def _hashear(contrasenia: str, costo: int) -> str:
+    return bcrypt.hashpw(contrasenia.encode('utf-8'), bcrypt.gensalt(rounds=costo)).decode('utf-8')
+
+
+def _verificar(contrasenia: str, hash_guardado: str) -> bool:
+    return bcrypt.checkpw(contrasenia.encode('utf-8'), hash_guardado.encode('utf-8'))
+
+
+def costo_de(hash_guardado: str) -> Optional[int]:
+    # Costo de un hash bcrypt ($2b$12$... -> 12); None si no es un hash bcrypt
+    if hash_guardado is None or len(hash_guardado) != 60 or hash_guardado[0] != "$" or hash_guardado[3] != "$":
+        return None
+    cifras = hash_guardado[4:6]
+    return int(cifras) if cifras.isdigit() else None
+
+
+def calibrar_costo(objetivo_s: float, minimo: int = 10, maximo: int = 14, muestras: int = 3) -> int:
+    # Mayor costo cuyo hash tarda a lo más 'objetivo_s' en esta máquina (sin bajar de 'minimo').
+    # Se mide el costo mínimo y el resto se estima: cada punto de costo duplica el tiempo de bcrypt.
+    duraciones = []
+    for _ in range(muestras):
+        inicio = time.perf_counter()
+        bcrypt.hashpw(b"calibracion", bcrypt.gensalt(rounds=minimo))
+        duraciones.append(time.perf_counter() - inicio)
+    base = min(duraciones)  # la medición más rápida es la que menos ruido tiene
+    costo = minimo
+    while costo < maximo and base * 2 ** (costo + 1 - minimo) <= objetivo_s:
+        costo += 1
+    return costo
+
+
+# Política de contraseñas: con qué costo se hashean y si los hashes con otro costo se rehacen al hacer login
+class PoliticaHash:
+    def __init__(self, costo: int = 12, rehash_al_login: bool = False, objetivo_s: Optional[float] = None):
+        if not 4 <= costo <= 31:
+            raise ValueError("Configuración de hash inválida: bcrypt acepta costos entre 4 y 31")
+        self.costo = costo  # 12 es el costo por defecto de bcrypt.gensalt()
+        self.rehash_al_login = rehash_al_login
+        self.objetivo_s = objetivo_s  # latencia objetivo usada para calibrar el costo (None si se fijó a mano)
+        self._lock = threading.Lock()
+        self._rehash = {"rehechos": 0, "omitidos": 0, "errores": 0}
+
+    def necesita_rehash(self, hash_guardado: str) -> bool:
+        # Solo hashes bcrypt con un costo menor al de la política; el texto plano lo migra actualizar_hash.py.
+        # Nunca se baja el costo: con HASH_COSTO=auto dos workers pueden calibrar distinto (11 y 12) y si se
+        # rehiciera en ambos sentidos cada login en otro worker volvería a reescribir el hash
+        costo = costo_de(hash_guardado)
+        return costo is not None and costo < self.costo
+
+    def anotar_rehash(self, resultado: str):
+        # resultado: "rehechos", "omitidos" (ejecutor ocupado o la contraseña cambió entremedio) o "errores"
+        with self._lock:
+            self._rehash[resultado] += 1
+
+    def metricas(self) -> dict:
+        with self._lock:
+            resultado = {"costo": self.costo, "rehash_al_login": self.rehash_al_login, **self._rehash}
+        if self.objetivo_s is not None:
+            resultado["objetivo_ms"] = round(self.objetivo_s * 1000, 1)
+        return resultado
+
+
+class EjecutorHash:
+    def __init__(self, trabajadores: int = 4, max_pendientes: int = 32, modo: str = "hilos",
+                 reintentar_en: int = 1, politica: Optional[PoliticaHash] = None):
+        if trabajadores < 1 or max_pendientes < trabajadores:
+            raise ValueError("Configuración de hash inválida: se requiere trabajadores >= 1 y max_pendientes >= trabajadores")
+        self.politica = politica or PoliticaHash()  # costo con el que se hashea
+        self.trabajadores = trabajadores  # hilos o procesos que ejecutan bcrypt
+        self.max_pendientes = max_pendientes  # tareas que pueden estar en ejecución o en cola al mismo tiempo
+        self.modo = modo  # "hilos" (bcrypt libera el GIL) o "procesos"
+        self.reintentar_en = reintentar_en
+        if modo == "procesos":
+            self._pool = ProcessPoolExecutor(max_workers=trabajadores)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="bcrypt")
+        self._lock = threading.Condition()  # condición para que los lotes puedan esperar cupo
+        self._pendientes = 0
+        # Métricas por operación: llamadas, rechazos, latencia total y máxima (en segundos)
+        self._metricas = {
+            operacion: {"llamadas": 0, "rechazadas": 0, "errores": 0, "latencia_total_s": 0.0, "latencia_max_s": 0.0}
+            for operacion in ("hashear", "verificar")
+        }
+
+    def _reservar(self, operacion: str, cantidad: int, esperar: bool):
+        # Toma 'cantidad' cupos de la cola; si no hay cupo rechaza o espera según 'esperar'
+        with self._lock:
+            while self._pendientes + cantidad > self.max_pendientes:
+                if not esperar:
+                    self._metricas[operacion]["rechazadas"] += 1
+                    raise SobrecargaHashError(self.reintentar_en)
+                self._lock.wait()
+            self._pendientes += cantidad
+
+    def _registrar(self, operacion: str, cantidad: int, duracion: float, error: bool):
+        # Devuelve los cupos y anota la latencia de cada llamada
+        medir_fase("bcrypt", duracion)
+        with self._lock:
+            self._pendientes -= cantidad
+            self._lock.notify_all()
+            datos = self._metricas[operacion]
+            datos["llamadas"] += cantidad
+            datos["latencia_total_s"] += duracion * cantidad
+            datos["latencia_max_s"] = max(datos["latencia_max_s"], duracion)
+            if error:
+                datos["errores"] += 1
+
+    async def _ejecutar_async(self, operacion: str, funcion, *args):
+        self._reservar(operacion, 1, esperar=False)
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return await asyncio.wrap_future(self._pool.submit(funcion, *args))
+        except Exception:
+            error = True
+            raise
+        finally:
+            # la duración incluye el tiempo en cola y el tiempo de bcrypt
+            self._registrar(operacion, 1, time.perf_counter() - inicio, error)
+
+    async def hashear_async(self, contrasenia: str) -> str:
+        return await self._ejecutar_async("hashear", _hashear, contrasenia, self.politica.costo)
+
+    async def verificar_async(self, contrasenia: str, hash_guardado: str) -> bool:
+        return await self._ejecutar_async("verificar", _verificar, contrasenia, hash_guardado)
+
+    def hashear_lote(self, contrasenias: list) -> list:
+        # Para cargas masivas: hashea en paralelo por tandas del tamaño del pool.
+        # En vez de rechazar, espera cupo para no quitarle todo el ejecutor a los logins.
+        resultado = []
+        for i in range(0, len(contrasenias), self.trabajadores):
+            tanda = contrasenias[i:i + self.trabajadores]
+            self._reservar("hashear", len(tanda), esperar=True)
+            inicio = time.perf_counter()
+            error = False
+            try:
+                resultado.extend(self._pool.map(_hashear, tanda, [self.politica.costo] * len(tanda)))
+            except Exception:
+                error = True
+                raise
+            finally:
+                self._registrar("hashear", len(tanda), time.perf_counter() - inicio, error)
+        return resultado
+
+    def calentar(self):
+        # Un hash de prueba por trabajador: crea todos los hilos (o procesos, que además importan bcrypt)
+        # antes de recibir tráfico, así el primer login no paga ese costo. No se cuenta en las métricas.
+        list(self._pool.map(_hashear, ["calentamiento"] * self.trabajadores, [self.politica.costo] * self.trabajadores))
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)  # esperamos a que terminen los hashes en curso
+
+    def metricas(self) -> dict:
+        with self._lock:
+            resultado = {"modo": self.modo, "trabajadores": self.trabajadores,
+                         "max_pendientes": self.max_pendientes, "pendientes": self._pendientes}
+            for operacion, datos in self._metricas.items():
+                promedio = datos["latencia_total_s"] / datos["llamadas"] if datos["llamadas"] else 0.0
+                resultado[operacion] = {
+                    "llamadas": datos["llamadas"],
+                    "rechazadas": datos["rechazadas"],
+                    "errores": datos["errores"],
+                    "latencia_promedio_s": round(promedio, 6),
+                    "latencia_max_s": round(datos["latencia_max_s"], 6),
+                }
+        resultado["politica"] = self.politica.metricas()
+        return resultado
@@ -0,0 +1,167 @@
+# Límite de intentos de login, para frenar la fuerza bruta antes de gastar una consulta y un bcrypt.
+# Cada email y cada IP tienen un "balde de fichas" (token bucket): cada intento gasta una ficha y las
+# fichas se recargan con el tiempo. Además, demasiados fallos dentro de una ventana bloquean la clave por un
+# tiempo que se duplica con cada fallo nuevo (30 s, 60 s, 120 s, ... hasta un máximo). La cuenta de fallos se
+# va olvidando con el tiempo sin fallar, así unos pocos errores de tipeo repartidos en horas nunca bloquean.
+# El estado vive en un almacén intercambiable: hoy en memoria del proceso, mañana uno compartido entre workers.
+import threading  # para proteger el almacén cuando varias peticiones lo usan al mismo tiempo
+import time  # para recargar fichas y vencer bloqueos
+from collections import OrderedDict  # orden de uso para sacar las claves inactivas (LRU)
+from typing import Optional
+
+
+# Estado de una clave (email o IP); se guarda como lista para poder modificarlo en su lugar
+FICHAS, ACTUALIZADO, FALLOS, BLOQUEADO_HASTA, ULTIMO_FALLO = range(5)
+
+
+# Almacén en memoria con tope de claves: cuando se llena se sacan las que llevan más tiempo sin usarse
+class AlmacenMemoria:
+    def __init__(self, max_claves: int = 100000):
+        if max_claves < 1:
+            raise ValueError("Configuración inválida: se requiere max_claves >= 1")
+        self.max_claves = max_claves
+        self._datos = OrderedDict()  # clave -> estado
+        self._lock = threading.Lock()
+        self._desalojadas = 0
+
+    def modificar(self, clave: str, funcion, nuevo):
+        # Aplica funcion(estado) de forma atómica y devuelve su resultado; si la clave no existe parte de nuevo()
+        with self._lock:
+            estado = self._datos.get(clave)
+            if estado is None:
+                estado = self._datos[clave] = nuevo()
+                while len(self._datos) > self.max_claves:
+                    self._datos.popitem(last=False)  # sacamos la clave inactiva hace más tiempo
+                    self._desalojadas += 1
+            else:
+                self._datos.move_to_end(clave)  # marcamos la clave como usada recientemente
+            return funcion(estado)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"almacen": "memoria", "claves": len(self._datos), "max_claves": self.max_claves,
+                    "desalojadas": self._desalojadas}
+
+
+class LimitadorLogin:
+    def __init__(self, almacen, rafaga_email: int = 5, por_minuto_email: float = 5, fallos_email: int = 5,
+                 rafaga_ip: int = 20, por_minuto_ip: float = 30, fallos_ip: int = 20, bloqueo_base: float = 30,
+                 bloqueo_max: float = 900, ventana_fallos: float = 900):
+        if min(rafaga_email, rafaga_ip, fallos_email, fallos_ip) < 1 or min(por_minuto_email, por_minuto_ip, bloqueo_base, ventana_fallos) <= 0:
+            raise ValueError("Configuración de límite de login inválida")
+        self.almacen = almacen  # AlmacenMemoria o cualquier objeto con modificar/metricas
+        # Por tipo de clave: (fichas máximas, fichas que se recargan por segundo, fallos dentro de la ventana antes de bloquear).
+        # La IP tiene más margen porque varias personas pueden salir por la misma (oficina, NAT)
+        self.reglas = {"email": (rafaga_email, por_minuto_email / 60, fallos_email),
+                       "ip": (rafaga_ip, por_minuto_ip / 60, fallos_ip)}
+        self.bloqueo_base = bloqueo_base  # segundos del primer bloqueo
+        self.bloqueo_max = bloqueo_max  # tope del bloqueo
+        self.ventana_fallos = ventana_fallos  # segundos sin fallar en que se olvida una cuenta de fallos completa
+        self._lock = threading.Lock()
+        self._rechazadas = 0
+        self._bloqueos = 0
+
+    def _claves(self, email: str, ip: Optional[str]) -> list:
+        claves = [("email", "email:" + email.strip().lower())]
+        if ip:
+            claves.append(("ip", "ip:" + ip))
+        return claves
+
+    def _nuevo(self, tipo: str):
+        return lambda: [float(self.reglas[tipo][0]), time.monotonic(), 0.0, 0.0, 0.0]
+
+    def revisar(self, email: str, ip: Optional[str]) -> Optional[float]:
+        # Gasta una ficha de la IP y otra del email. Devuelve None si se puede intentar el login,
+        # o los segundos que hay que esperar (para responder 429 con Retry-After).
+        # La IP se revisa primero y, si una clave rechaza, se devuelven las fichas ya gastadas: así una IP frenada
+        # o bloqueada no puede vaciar el balde del email de otra persona
+        gastadas = []
+        for tipo, clave in reversed(self._claves(email, ip)):
+            rafaga, recarga, _ = self.reglas[tipo]
+
+            def gastar(estado):
+                ahora = time.monotonic()
+                if estado[BLOQUEADO_HASTA] > ahora:
+                    return estado[BLOQUEADO_HASTA] - ahora
+                estado[FICHAS] = min(rafaga, estado[FICHAS] + (ahora - estado[ACTUALIZADO]) * recarga)
+                estado[ACTUALIZADO] = ahora
+                if estado[FICHAS] < 1:
+                    return (1 - estado[FICHAS]) / recarga  # tiempo hasta la próxima ficha
+                estado[FICHAS] -= 1
+                return None
+
+            espera = self.almacen.modificar(clave, gastar, self._nuevo(tipo))
+            if espera is not None:
+                for tipo_gastado, clave_gastada in gastadas:
+                    self.almacen.modificar(clave_gastada, self._devolver(tipo_gastado), self._nuevo(tipo_gastado))
+                with self._lock:
+                    self._rechazadas += 1
+                return espera
+            gastadas.append((tipo, clave))
+        return None
+
+    def _devolver(self, tipo: str):
+        rafaga = self.reglas[tipo][0]
+
+        def devolver(estado):
+            estado[FICHAS] = min(rafaga, estado[FICHAS] + 1)
+
+        return devolver
+
+    def registrar_fallo(self, email: str, ip: Optional[str]):
+        # Contraseña o email incorrectos: cuenta el fallo y bloquea si ya son demasiados dentro de la ventana
+        for tipo, clave in self._claves(email, ip):
+            fallos_para_bloqueo = self.reglas[tipo][2]
+
+            def fallar(estado):
+                ahora = time.monotonic()
+                # Los fallos se olvidan de a poco (una cuenta completa por ventana sin fallar). El tiempo se cuenta
+                # desde el último fallo o desde que venció el bloqueo, así esperar el bloqueo no borra los fallos
+                # y quien vuelve a fallar apenas termina queda bloqueado el doble de tiempo
+                quieto = ahora - max(estado[ULTIMO_FALLO], estado[BLOQUEADO_HASTA])
+                if quieto > 0:
+                    estado[FALLOS] = max(0.0, estado[FALLOS] - quieto * fallos_para_bloqueo / self.ventana_fallos)
+                estado[FALLOS] += 1
+                estado[ULTIMO_FALLO] = ahora
+                # Se compara la cuenta redondeada: con el olvido gradual, 5 fallos seguidos suman 4,9999 y no 5
+                fallos = int(estado[FALLOS] + 0.5)
+                if fallos < fallos_para_bloqueo:
+                    return False
+                exceso = fallos - fallos_para_bloqueo
+                # Bloqueo exponencial: base, 2*base, 4*base, ... sin pasar el máximo
+                estado[BLOQUEADO_HASTA] = ahora + min(self.bloqueo_base * 2 ** min(exceso, 30), self.bloqueo_max)
+                return True
+
+            if self.almacen.modificar(clave, fallar, self._nuevo(tipo)):
+                with self._lock:
+                    self._bloqueos += 1
+
+    def registrar_exito(self, email: str, ip: Optional[str]):
+        # Login correcto: se perdonan los fallos del email (los de la IP no, para que una cuenta propia
+        # no sirva para limpiar los fallos de una IP que prueba contraseñas de otros)
+        def limpiar(estado):
+            estado[FALLOS] = 0.0
+            estado[BLOQUEADO_HASTA] = 0.0
+
+        self.almacen.modificar(self._claves(email, None)[0][1], limpiar, self._nuevo("email"))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            resultado = {"rechazadas": self._rechazadas, "bloqueos": self._bloqueos}
+        resultado.update(self.almacen.metricas())
+        return resultado
+
+
+# Limitador que deja pasar todo (para desactivarlo sin cambiar el endpoint)
+class LimitadorNulo:
+    def revisar(self, email: str, ip: Optional[str]) -> Optional[float]:
+        return None
+
+    def registrar_fallo(self, email: str, ip: Optional[str]):
+        pass
+
+    def registrar_exito(self, email: str, ip: Optional[str]):
+        pass
+
+    def metricas(self) -> dict:
+        return {"almacen": "ninguno"}
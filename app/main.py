@@ -1,82 +1,203 @@
 # Pondremos una libreria (minuscula es la libreria y mayusculas son los metodos que tiene la libreria):
-from fastapi import FastAPI, HTTPException  # HTTPException es un error de tipo petición
-from pydantic import BaseModel, Field  # Para validar y estructurar datos de entrada; Field lo uso para definir opcionales xd
-import cx_Oracle  # libreria que conecta python con ORACLE
-import bcrypt  # libreria para hashear y validar contraseñas
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, BackgroundTasks  # HTTPException es un error de tipo petición; BackgroundTasks corre trabajo después de responder
+from pydantic import BaseModel, Field, ValidationError  # Para validar y estructurar datos de entrada; Field lo uso para definir opcionales xd
 from typing import Optional  # para campos opcionales en PATCH
-import re #Para la validación del rut
-
-regiones_y_comunas = {
-    "Arica y Parinacota": ["Arica", "Camarones", "Putre", "General Lagos"],
-    "Tarapacá": ["Iquique", "Alto Hospicio", "Pozo Almonte", "Camiña", "Colchane", "Huara", "Pica"],
-    "Antofagasta": ["Antofagasta", "Mejillones", "Sierra Gorda", "Taltal", "Calama", "Ollagüe", "San Pedro de Atacama"],
-    "Atacama": ["Copiapó", "Caldera", "Tierra Amarilla", "Chañaral", "Diego de Almagro", "Vallenar", "Freirina", "Huasco", "Alto del Carmen"],
-    "Coquimbo": ["La Serena", "Coquimbo", "Andacollo", "La Higuera", "Paihuano", "Vicuña", "Illapel", "Canela", "Los Vilos", "Salamanca", "Ovalle", "Combarbalá", "Monte Patria", "Punitaqui", "Río Hurtado"],
-    "Valparaíso": ["Valparaíso", "Casablanca", "Concón", "Juan Fernández", "Puchuncaví", "Quintero", "Viña del Mar", "Isla de Pascua", "Los Andes", "Calle Larga", "Rinconada", "San Esteban", "La Ligua", "Cabildo", "Papudo", "Petorca", "Zapallar", "Quillota", "Calera", "Hijuelas", "La Cruz", "Nogales", "San Antonio", "Algarrobo", "Cartagena", "El Quisco", "El Tabo", "Santo Domingo", "San Felipe", "Catemu", "Llaillay", "Panquehue", "Putaendo", "Santa María"],
-    "Metropolitana": ["Santiago", "Cerrillos", "Cerro Navia", "Conchalí", "El Bosque", "Estación Central", "Huechuraba", "Independencia", "La Cisterna", "La Florida", "La Granja", "La Pintana", "La Reina", "Las Condes", "Lo Barnechea", "Lo Espejo", "Lo Prado", "Macul", "Maipú", "Ñuñoa", "Pedro Aguirre Cerda", "Peñalolén", "Providencia", "Pudahuel", "Quilicura", "Quinta Normal", "Recoleta", "Renca", "San Joaquín", "San Miguel", "San Ramón", "Vitacura", "Puente Alto", "Pirque", "San José de Maipo", "Colina", "Lampa", "Tiltil", "San Bernardo", "Buin", "Calera de Tango", "Paine", "Melipilla", "Alhué", "Curacaví", "María Pinto", "San Pedro", "Talagante", "El Monte", "Isla de Maipo", "Padre Hurtado", "Peñaflor"],
-    "Libertador General Bernardo O'Higgins": ["Rancagua", "Codegua", "Coinco", "Coltauco", "Doñihue", "Graneros", "Las Cabras", "Machalí", "Malloa", "Mostazal", "Olivar", "Peumo", "Pichidegua", "Quinta de Tilcoco", "Rengo", "Requínoa", "San Vicente", "Pichilemu", "La Estrella", "Litueche", "Marchihue", "Navidad", "Paredones", "San Fernando", "Chépica", "Chimbarongo", "Lolol", "Nancagua", "Palmilla", "Peralillo", "Placilla", "Pumanque", "Santa Cruz"],
-    "Maule": ["Talca", "San Clemente", "Pelarco", "Pencahue", "Maule", "San Rafael", "Curepto", "Constitución", "Empedrado", "Río Claro", "Linares", "San Javier", "Villa Alegre", "Yerbas Buenas", "Colbún", "Parral", "Retiro", "Longaví", "Cauquenes", "Chanco", "Pelluhue"],
-    "Ñuble": ["Chillán", "Chillán Viejo", "Cobquecura", "Coelemu", "Coihueco", "El Carmen", "Ninhue", "Ñiquén", "Pemuco", "Pinto", "Portezuelo", "Quillón", "Quirihue", "Ránquil", "San Carlos", "San Fabián", "San Ignacio", "San Nicolás", "Treguaco", "Yungay"],
-    "Biobío": ["Concepción", "Coronel", "Chiguayante", "Florida", "Hualpén", "Hualqui", "Lota", "Penco", "San Pedro de la Paz", "Santa Juana", "Talcahuano", "Tomé", "Yumbel", "Cabrero", "Laja", "Los Ángeles", "Mulchén", "Nacimiento", "Negrete", "Quilaco", "Quilleco", "San Rosendo", "Santa Bárbara", "Tucapel", "Alto Biobío"],
-    "La Araucanía": ["Temuco", "Carahue", "Cunco", "Curarrehue", "Freire", "Galvarino", "Gorbea", "Lautaro", "Loncoche", "Melipeuco", "Nueva Imperial", "Padre Las Casas", "Perquenco", "Pitrufquén", "Pucón", "Saavedra", "Teodoro Schmidt", "Toltén", "Vilcún", "Villarrica", "Cholchol", "Angol", "Collipulli", "Curacautín", "Ercilla", "Lonquimay", "Los Sauces", "Lumaco", "Purén", "Renaico", "Traiguén", "Victoria"],
-    "Los Ríos": ["Valdivia", "Corral", "Lanco", "Los Lagos", "Máfil", "Mariquina", "Paillaco", "Panguipulli", "La Unión", "Futrono", "Lago Ranco", "Río Bueno"],
-    "Los Lagos": ["Puerto Montt", "Calbuco", "Cochamó", "Fresia", "Frutillar", "Los Muermos", "Llanquihue", "Maullín", "Puerto Varas", "Castro", "Ancud", "Chonchi", "Curaco de Vélez", "Dalcahue", "Puqueldón", "Queilén", "Quellón", "Quemchi", "Quinchao", "Osorno", "Puerto Octay", "Purranque", "Puyehue", "Río Negro", "San Juan de la Costa", "San Pablo"],
-    "Aysén": ["Coyhaique", "Lago Verde", "Aysén", "Cisnes", "Guaitecas", "Cochrane", "O'Higgins", "Tortel", "Chile Chico", "Río Ibáñez"],
-    "Magallanes": ["Punta Arenas", "Laguna Blanca", "Río Verde", "San Gregorio", "Cabo de Hornos", "Antártica", "Porvenir", "Primavera", "Timaukel", "Natales", "Torres del Paine"]
-}
-
-def validar_region_comuna(region: str, comuna: str) -> bool:
-    region = region.strip().title()
-    comuna = comuna.strip().title()
-    return region in regiones_y_comunas and comuna in regiones_y_comunas[region]
-
+import csv  # para escribir la exportación en CSV
+import io  # buffer en memoria para armar cada lote del CSV
+import json  # para escribir la exportación en NDJSON
+import os  # para leer la configuración del pool desde variables de entorno
+import hashlib  # para calcular el ETag de las respuestas de regiones y comunas
+import logging  # para dejar registro de los errores inesperados
+import math  # para redondear hacia arriba el header Retry-After
+import time  # para medir el tiempo de serialización
+from contextlib import asynccontextmanager  # para abrir y cerrar el pool al iniciar y apagar la API
+from app.pool_conexiones import PoolConexiones, BackendOracle, BackendSQLite, PoolAgotadoError  # pool de conexiones (Oracle o SQLite de pruebas)
+from app.hash_contrasenas import EjecutorHash, PoliticaHash, SobrecargaHashError, calibrar_costo  # pool dedicado para bcrypt y su política de costo
+from app.repositorio import RepositorioClientes, ClienteDuplicadoError, BDOcupadaError, SQL_RUT_K_MAYUSCULA  # capa de datos asíncrona
+from app.cache_clientes import CacheLectura, CacheMemoria, CacheNula  # caché de lectura de clientes
+from app.limite_login import LimitadorLogin, LimitadorNulo, AlmacenMemoria  # límite de intentos de login
+from app.metricas import RegistroMetricas, MiddlewareMetricas, medir_fase  # métricas en formato Prometheus
+from app.serializacion import RespuestaJSON, a_ndjson  # JSON rápido (orjson si está instalado)
+from app.busqueda import BuscadorClientes, CAMPOS as CAMPOS_BUSQUEDA  # índice de búsqueda de clientes en memoria
+from app.validaciones import (  # validaciones de RUT, email, región y comuna preparadas al importar
+    regiones_y_comunas, region_comuna_oficial, REGIONES_OFICIALES, COMUNAS_OFICIALES, email_valido,
+    normalizar_rut, normalizar_texto, error_cliente, validar_lote, ERROR_RUT, ERROR_EMAIL, ERROR_REGION_COMUNA, ERROR_CONTRASENIA,
+)
 
+# Validación de email que responde 400 si el correo no es válido
 def validar_email(email: str):
-    # Validación básica con expresión regular
-    patron = r"^[\w\.-]+@[\w\.-]+\.(com|cl|org|net|edu)$"
-    if not re.match(patron, email):
-        raise HTTPException(
-            status_code=400,
-            detail="El correo ingresado no es válido. Debe contener '@' y un dominio como '.cl' o '.com'."
-        )
-
-
-# Valida que el RUT tenga el formato chileno sin puntos y con guion (ej: 12345678-9)
-def validar_formato_rut(rut: str) -> bool:
-    return bool(re.match(r"^\d{7,8}-[\dkK]$", rut))
-
-#Validar que el digito verificador y el rut correspondan
-def validar_rut_con_dv(rut: str) -> bool:
-    if not validar_formato_rut(rut):
-        return False
-
-    cuerpo, dv_ingresado = rut.upper().split("-")
-    suma = 0
-    multiplicador = 2
-
-    for digito in reversed(cuerpo):
-        suma += int(digito) * multiplicador
-        multiplicador += 1
-        if multiplicador > 7:
-            multiplicador = 2
+    if not email_valido(email):
+        raise HTTPException(status_code=400, detail=ERROR_EMAIL)
 
-    resto = suma % 11
-    dv_calculado = 11 - resto
-
-    if dv_calculado == 11:
-        dv_correcto = "0"
-    elif dv_calculado == 10:
-        dv_correcto = "K"
-    else:
-        dv_correcto = str(dv_calculado)
-
-    return dv_ingresado == dv_correcto
+# Valida el RUT recibido (acepta 12.345.678-9) y lo devuelve normalizado como 12345678-9; si no es válido responde 400
+def rut_normalizado(rut: str) -> str:
+    normalizado = normalizar_rut(rut)
+    if normalizado is None:
+        raise HTTPException(status_code=400, detail=ERROR_RUT)
+    return normalizado
 
 # Importamos middleware para manejar CORS (control de acceso desde distintos dominios)
 from fastapi.middleware.cors import CORSMiddleware  
+from fastapi.responses import StreamingResponse, Response  # para enviar la exportación por partes y respuestas ya serializadas
+from fastapi.concurrency import run_in_threadpool  # para correr el trabajo con la BD fuera del event loop
+
+# Creamos el pool según la configuración (por defecto Oracle; DB_BACKEND=sqlite para pruebas locales)
+def crear_pool() -> PoolConexiones:
+    if os.getenv("DB_BACKEND", "oracle").lower() == "sqlite":
+        backend = BackendSQLite(os.getenv("DB_SQLITE_RUTA", ":memory:"))
+    else:
+        backend = BackendOracle(
+            os.getenv("DB_USUARIO", "integracion"),  # usuario de la base de datos
+            os.getenv("DB_CLAVE", "integracion"),  # clave del usuario
+            os.getenv("DB_HOST", "localhost"),  # host del servidor Oracle
+            int(os.getenv("DB_PUERTO", "1521")),  # puerto del listener
+            os.getenv("DB_SERVICIO", "XE"),  # nombre del servicio
+            dsn=os.getenv("DB_DSN"),  # DSN completo; si se define reemplaza a host, puerto y servicio
+        )
+    return PoolConexiones(
+        backend,
+        minimo=int(os.getenv("DB_POOL_MIN", "2")),  # conexiones abiertas desde el inicio
+        maximo=int(os.getenv("DB_POOL_MAX", "10")),  # tope de conexiones simultáneas
+        incremento=int(os.getenv("DB_POOL_INCREMENTO", "1")),  # cuántas se abren cuando faltan
+        timeout_adquirir=float(os.getenv("DB_POOL_TIMEOUT", "5")),  # segundos de espera por una conexión libre
+        revisar_al_prestar=os.getenv("DB_POOL_PING", "1") == "1",  # ping antes de entregar la conexión
+    )
+
+# Se asegura de que existan los índices únicos de RUT y EMAIL: los duplicados los detecta la BD y no una consulta previa.
+# Sin esos índices la API aceptaría emails repetidos, así que si no se pueden crear no parte.
+# Antes pasa a mayúscula la K de los RUT guardados como 12345678-k, porque la API busca siempre con normalizar_rut
+def asegurar_indices(pool: PoolConexiones):
+    conexion = pool.adquirir()
+    try:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(SQL_RUT_K_MAYUSCULA)
+            if cursor.rowcount > 0:
+                log.info("%d RUT con k minúscula pasados a mayúscula", cursor.rowcount)
+        finally:
+            cursor.close()
+        pool.backend.asegurar_indices_unicos(conexion)
+        conexion.commit()
+    except Exception as ex:
+        # por ejemplo si ya hay emails repetidos (ORA-01452), el mismo RUT con k y con K, o falta el permiso para crear índices
+        log.error("No se pudieron preparar los RUT y los índices únicos de CLIENTES: %s. Corrija los datos o cree los índices "
+                  "UQ_CLIENTES_RUT y UQ_CLIENTES_EMAIL a mano y vuelva a iniciar con DB_ASEGURAR_INDICES=0", ex)
+        raise
+    finally:
+        pool.liberar(conexion)
+
+# Política de contraseñas: costo fijo (HASH_COSTO=12) o calibrado al iniciar (HASH_COSTO=auto) para que
+# un hash tarde HASH_OBJETIVO_MS en esta máquina
+def crear_politica_hash() -> PoliticaHash:
+    rehash = os.getenv("HASH_REHASH_LOGIN", "0") == "1"  # rehacer al hacer login los hashes con un costo menor
+    if os.getenv("HASH_COSTO", "12") != "auto":
+        return PoliticaHash(int(os.getenv("HASH_COSTO", "12")), rehash_al_login=rehash)
+    objetivo = float(os.getenv("HASH_OBJETIVO_MS", "250")) / 1000
+    costo = calibrar_costo(
+        objetivo,
+        minimo=int(os.getenv("HASH_COSTO_MIN", "10")),  # nunca bajar de este costo aunque la máquina sea lenta
+        maximo=int(os.getenv("HASH_COSTO_MAX", "14")),
+    )
+    log.info("Costo de bcrypt calibrado en %d para %.0f ms por hash", costo, objetivo * 1000)
+    return PoliticaHash(costo, rehash_al_login=rehash, objetivo_s=objetivo)
+
+# Creamos el ejecutor de bcrypt separado de los hilos que atienden las peticiones
+def crear_ejecutor_hash() -> EjecutorHash:
+    return EjecutorHash(
+        trabajadores=int(os.getenv("HASH_TRABAJADORES", str(os.cpu_count() or 2))),  # hilos o procesos para bcrypt
+        max_pendientes=int(os.getenv("HASH_MAX_PENDIENTES", "32")),  # sobre este número se responde 503
+        modo=os.getenv("HASH_MODO", "hilos"),  # "hilos" o "procesos"
+        reintentar_en=int(os.getenv("HASH_RETRY_AFTER", "1")),  # segundos para el header Retry-After
+        politica=crear_politica_hash(),
+    )
+
+# Creamos el caché de clientes (CACHE_BACKEND=ninguno lo desactiva)
+def crear_cache() -> CacheLectura:
+    if os.getenv("CACHE_BACKEND", "memoria") == "ninguno":
+        return CacheLectura(CacheNula())
+    return CacheLectura(CacheMemoria(
+        max_entradas=int(os.getenv("CACHE_MAX", "10000")),  # máximo de entradas (se sacan las menos usadas)
+        ttl=float(os.getenv("CACHE_TTL", "60")),  # segundos que dura cada entrada
+    ))
+
+# Creamos el límite de intentos de login (LOGIN_LIMITADOR=ninguno lo desactiva)
+def crear_limitador_login():
+    if os.getenv("LOGIN_LIMITADOR", "memoria") == "ninguno":
+        return LimitadorNulo()
+    return LimitadorLogin(
+        AlmacenMemoria(max_claves=int(os.getenv("LOGIN_MAX_CLAVES", "100000"))),  # emails e IP recordados (se sacan los inactivos)
+        rafaga_email=int(os.getenv("LOGIN_EMAIL_RAFAGA", "5")),  # intentos seguidos permitidos por email
+        por_minuto_email=float(os.getenv("LOGIN_EMAIL_POR_MINUTO", "5")),  # intentos que se recuperan por minuto
+        fallos_email=int(os.getenv("LOGIN_EMAIL_FALLOS", "5")),  # fallos dentro de la ventana antes de bloquear el email
+        rafaga_ip=int(os.getenv("LOGIN_IP_RAFAGA", "20")),  # intentos seguidos permitidos por IP
+        por_minuto_ip=float(os.getenv("LOGIN_IP_POR_MINUTO", "30")),
+        fallos_ip=int(os.getenv("LOGIN_IP_FALLOS", "20")),  # fallos dentro de la ventana antes de bloquear la IP
+        bloqueo_base=float(os.getenv("LOGIN_BLOQUEO_BASE", "30")),  # segundos del primer bloqueo (luego se duplica)
+        bloqueo_max=float(os.getenv("LOGIN_BLOQUEO_MAX", "900")),  # bloqueo máximo en segundos
+        ventana_fallos=float(os.getenv("LOGIN_VENTANA_FALLOS_S", "900")),  # segundos sin fallar en que se olvidan todos los fallos
+    )
+
+# Creamos el índice de búsqueda de clientes y empezamos a cargarlo en segundo plano (BUSQUEDA_INDICE=ninguno lo desactiva)
+def crear_buscador(repo: RepositorioClientes) -> BuscadorClientes:
+    buscador = BuscadorClientes(
+        lambda: repo.exportar(["RUT", *CAMPOS_BUSQUEDA], EXPORT_LOTE),  # recorre la tabla por lotes con una conexión del pool
+        recarga_s=float(os.getenv("BUSQUEDA_RECARGA_S", "900")),  # cada cuánto se reconstruye para ver cambios de otros workers
+    )
+    if os.getenv("BUSQUEDA_INDICE", "memoria") != "ninguno":
+        buscador.iniciar()
+    return buscador
+
+# Deja todo listo antes de aceptar tráfico, para que las primeras peticiones no paguen el arranque:
+# hilos y conexiones de la BD, hilos (o procesos) de bcrypt y las tablas de validación
+async def calentar(app: FastAPI):
+    inicio = time.perf_counter()
+    region, comunas = next(iter(regiones_y_comunas.items()))
+    error_cliente("11111111-1", "Cliente", "cliente@ferremas.cl", "contrasenia", region, comunas[0])  # validaciones y normalización
+    await run_in_threadpool(app.state.hasher.calentar)  # no bloquea el loop mientras bcrypt trabaja
+    try:
+        await app.state.repositorio.calentar()
+    except Exception as e:  # si la BD aún no responde, la API igual parte y lo reintenta cada petición
+        log.warning("No se pudo calentar la conexión a la BD: %s", e)
+    log.info("API lista en %.2f s", time.perf_counter() - inicio)
+
+# El pool y el ejecutor de hash se abren al iniciar la API y se cierran al apagarla.
+# Uvicorn llama al cierre después de esperar las peticiones en curso, así que nada se corta a la mitad.
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    app.state.pool = crear_pool()
+    app.state.pool.abrir()
+    if os.getenv("DB_ASEGURAR_INDICES", "1") == "1":
+        try:
+            asegurar_indices(app.state.pool)  # índices únicos en RUT y EMAIL
+        except Exception:
+            app.state.pool.cerrar()  # no se levanta la API: se cierran las conexiones ya abiertas
+            raise
+    app.state.hasher = crear_ejecutor_hash()
+    app.state.cache = crear_cache()
+    app.state.limitador = crear_limitador_login()
+    app.state.repositorio = RepositorioClientes(
+        app.state.pool,
+        max_concurrencia=int(os.getenv("DB_CONCURRENCIA", str(app.state.pool.maximo))),  # consultas simultáneas (por defecto, una por conexión)
+        max_pendientes=int(os.getenv("DB_MAX_PENDIENTES", "200")),  # sobre esto se responde 503
+    )
+    app.state.buscador = crear_buscador(app.state.repositorio)
+    if os.getenv("API_CALENTAR", "1") == "1":
+        await calentar(app)
+    yield
+    app.state.buscador.cerrar()  # detiene la carga del índice si sigue en curso
+    app.state.repositorio.cerrar()
+    app.state.hasher.cerrar()
+    app.state.pool.cerrar()
+
+log = logging.getLogger("app")
+
+# Métricas de todo el proceso (latencia por ruta, reparto del tiempo y SQL); SQL_LENTA_MS activa el log de consultas lentas
+metricas = RegistroMetricas(
+    umbral_sql_lenta=float(os.environ["SQL_LENTA_MS"]) / 1000 if os.getenv("SQL_LENTA_MS") else None,
+)
 
 # crearé una variable de la API:
-api = FastAPI()  # Instanciamos la aplicación FastAPI
+api = FastAPI(lifespan=ciclo_de_vida, default_response_class=RespuestaJSON)  # Instanciamos la aplicación FastAPI
 
 # Definimos lista con orígenes permitidos para acceder a la API (solo estos podrán hacer peticiones)
 origins = [
@@ -94,6 +215,9 @@ api.add_middleware(
     allow_headers=["*"],         # Permitir todos los headers
 )
 
+# Middleware que mide cada petición (va por fuera de todo lo demás)
+api.add_middleware(MiddlewareMetricas, registro=metricas)
+
 # Modelo para validar datos de login (estructura que espera el endpoint):
 class LoginData(BaseModel):
     email: str  # Email del cliente
@@ -118,275 +242,605 @@ class ClientePatch(BaseModel):
     comuna: Optional[str] = None  # Comuna opcional
     direccion: Optional[str] = None  # Dirección opcional
 
-# Haremos la conexión con ORACLE:
-def get_conexion():  # variable de conexion
+# Dependencia que entrega el ejecutor de bcrypt
+def get_hasher(request: Request) -> EjecutorHash:
+    return request.app.state.hasher
+
+# Dependencia que entrega el índice de búsqueda
+def get_buscador(request: Request) -> BuscadorClientes:
+    return request.app.state.buscador
+
+# Dependencia que entrega el caché de clientes
+def get_cache(request: Request) -> CacheLectura:
+    return request.app.state.cache
+
+# Dependencia que entrega el límite de intentos de login
+def get_limitador(request: Request):
+    return request.app.state.limitador
+
+# IP de quien hace la petición; detrás de un proxy (LOGIN_CONFIAR_PROXY=1) se toma de X-Forwarded-For
+def ip_cliente(request: Request) -> Optional[str]:
+    if os.getenv("LOGIN_CONFIAR_PROXY", "0") == "1":
+        reenviada = request.headers.get("x-forwarded-for")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+# Dependencia que entrega el repositorio asíncrono de clientes
+def get_repositorio(request: Request) -> RepositorioClientes:
+    return request.app.state.repositorio
+
+# Obtiene un cliente por RUT pasando por el caché
+async def cliente_cacheado(cache: CacheLectura, repo: RepositorioClientes, rut: str) -> Optional[dict]:
+    return await cache.obtener_async(f"rut:{rut}", lambda: repo.obtener_cliente(rut))
+
+# Hashea una contraseña en el ejecutor dedicado; si está saturado responde 503 con Retry-After
+async def hashear_contrasenia(hasher: EjecutorHash, contrasenia: str) -> str:
     try:
-        dsn = cx_Oracle.makedsn("localhost", 1521, service_name="XE")  # Aqui va el DSN (Data Source Name) con host, puerto y servicio de la base de datos
-        conexion = cx_Oracle.connect(user="integracion", password="integracion", dsn=dsn)  # Aqui va la conexión usando usuario, contraseña y DSN
-        return conexion  # Devolvemos conexión activa
-    except Exception as ex:
-        print("Error al conectar:", ex)  # Mostramos error en consola
-        raise  # Re-lanzamos error para manejarlo afuera
+        return await hasher.hashear_async(contrasenia)
+    except SobrecargaHashError as ex:
+        raise HTTPException(status_code=503, detail=str(ex), headers={"Retry-After": str(ex.reintentar_en)})
+
+# Valida una contraseña contra su hash en el ejecutor dedicado; si está saturado responde 503 con Retry-After
+async def verificar_contrasenia(hasher: EjecutorHash, contrasenia: str, hash_guardado: str) -> bool:
+    try:
+        return await hasher.verificar_async(contrasenia, hash_guardado)
+    except SobrecargaHashError as ex:
+        raise HTTPException(status_code=503, detail=str(ex), headers={"Retry-After": str(ex.reintentar_en)})
+
+# Se corre después de enviar la respuesta del login: rehace el hash con el costo de la política.
+# Si el ejecutor está ocupado se deja para el próximo login; nunca le quita cupo a las peticiones.
+async def rehashear_contrasenia(repo: RepositorioClientes, hasher: EjecutorHash, rut: str, contrasenia: str, hash_anterior: str):
+    try:
+        nuevo = await hasher.hashear_async(contrasenia)
+        reemplazado = await repo.reemplazar_contrasenia(rut, hash_anterior, nuevo)
+        hasher.politica.anotar_rehash("rehechos" if reemplazado else "omitidos")
+    except (SobrecargaHashError, BDOcupadaError, PoolAgotadoError):
+        hasher.politica.anotar_rehash("omitidos")
+    except Exception as e:
+        hasher.politica.anotar_rehash("errores")
+        log.warning("No se pudo rehacer el hash del cliente %s: %s", rut, e)
+
+# Un valor duplicado (ORA-00001) es error del cliente: 400 si es el email y 409 si es el RUT
+def error_duplicado(ex: ClienteDuplicadoError, detalle_email: str) -> HTTPException:
+    if ex.columna == "EMAIL":
+        return HTTPException(status_code=400, detail=detalle_email)
+    return HTTPException(status_code=409, detail="El RUT ya está registrado")
+
+# Error inesperado: 503 si la base de datos está saturada, 500 en cualquier otro caso
+def error_servidor(e: Exception, mensaje: str) -> HTTPException:
+    metricas.registrar_error(e)  # errores_total{tipo=...} en /metrics
+    if isinstance(e, (BDOcupadaError, PoolAgotadoError)):
+        log.warning("%s: %s", mensaje, e)
+        return HTTPException(status_code=503, detail="Base de datos ocupada, intente nuevamente")
+    log.error("%s", mensaje, exc_info=e)  # con el traceback completo
+    return HTTPException(status_code=500, detail=f"{mensaje}: {str(e)}")
+
+# GET con todas las métricas en formato de texto de Prometheus
+@api.get("/metrics")  # Ruta que lee Prometheus
+def metrics(request: Request):
+    estado = request.app.state
+    texto = metricas.exportar({
+        "pool": estado.pool.metricas(),
+        "repositorio": estado.repositorio.metricas(),
+        "cache": estado.cache.metricas(),
+        "busqueda": estado.buscador.metricas(),
+        "hash": estado.hasher.metricas(),
+        "login": estado.limitador.metricas(),
+    })
+    return Response(content=texto, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# GET para ver el estado del pool de conexiones
+@api.get("/pool/metricas")  # Ruta para métricas del pool
+def metricas_pool(request: Request):
+    return request.app.state.pool.metricas()  # conexiones en uso, libres, esperas y timeouts
+
+# GET para ver el estado de la capa de datos asíncrona
+@api.get("/repositorio/metricas")  # Ruta para métricas del repositorio
+def metricas_repositorio(repo: RepositorioClientes = Depends(get_repositorio)):
+    return repo.metricas()  # consultas pendientes y rechazadas
+
+# GET para ver el estado del límite de intentos de login
+@api.get("/login/metricas")  # Ruta para métricas del límite de login
+def metricas_login(limitador=Depends(get_limitador)):
+    return limitador.metricas()  # rechazos, bloqueos y claves recordadas
+
+# GET para ver el estado del caché de clientes
+@api.get("/cache/metricas")  # Ruta para métricas del caché
+def metricas_cache(cache: CacheLectura = Depends(get_cache)):
+    return cache.metricas()  # aciertos, fallos, cargas compartidas, entradas y desalojos
+
+# GET para ver el estado del ejecutor de bcrypt
+@api.get("/hash/metricas")  # Ruta para métricas de hash
+def metricas_hash(hasher: EjecutorHash = Depends(get_hasher)):
+    return hasher.metricas()  # llamadas, rechazos y latencia de hashear/verificar
+
+# GET para ver el estado del índice de búsqueda
+@api.get("/busqueda/metricas")  # Ruta para métricas de la búsqueda
+def metricas_busqueda(buscador: BuscadorClientes = Depends(get_buscador)):
+    return buscador.metricas()  # clientes y palabras indexadas, cargas y búsquedas
 
 # Ahora Haré algunos endpoints:
 
-# GET para listar los clientes
+# Respuesta JSON ya serializada con su ETag, armada una sola vez
+def preparar_respuesta_json(datos) -> tuple:
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'  # ETag fuerte: cambia solo si cambian los bytes
+    return cuerpo, etag
+
+# Regiones y comunas no cambian mientras la API está arriba: se serializan una sola vez al iniciar
+REGIONES_JSON = preparar_respuesta_json(list(regiones_y_comunas))
+COMUNAS_JSON = {normalizar_texto(region): preparar_respuesta_json(comunas) for region, comunas in regiones_y_comunas.items()}
+CACHE_REGIONES = "public, max-age=86400"  # el navegador o la app pueden guardarlas un día
+
+# Devuelve los bytes preparados, o 304 si el cliente ya tiene esa versión (If-None-Match)
+def respuesta_cacheable(request: Request, cuerpo: bytes, etag: str) -> Response:
+    encabezados = {"ETag": etag, "Cache-Control": CACHE_REGIONES}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etiquetas = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+        if "*" in etiquetas or etag in etiquetas:
+            return Response(status_code=304, headers=encabezados)
+    return Response(content=cuerpo, media_type="application/json", headers=encabezados)
+
+# GET para listar las regiones
+@api.get("/regiones")  # Ruta para listar regiones
+def get_regiones(request: Request):
+    return respuesta_cacheable(request, *REGIONES_JSON)
+
+# GET para listar las comunas de una región (sin importar mayúsculas ni tildes)
+@api.get("/regiones/{region}/comunas")  # Ruta para listar comunas de una región
+def get_comunas(request: Request, region: str):
+    respuesta = COMUNAS_JSON.get(normalizar_texto(region))
+    if respuesta is None:
+        raise HTTPException(status_code=404, detail="Región no encontrada")
+    return respuesta_cacheable(request, *respuesta)
+
+# Columnas que se pueden pedir con ?fields= (la contraseña nunca se devuelve)
+COLUMNAS_CLIENTE = {
+    "rut": "RUT",
+    "nombre_completo": "NOMBRE_COMPLETO",
+    "email": "EMAIL",
+    "region": "REGION",
+    "comuna": "COMUNA",
+    "direccion": "DIRECCION",
+}
+
+# GET para listar los clientes por páginas (paginación por RUT: ?after=<rut>&limit=N)
 @api.get("/clientes")  # Ruta para listar clientes
-def get_clientes():
+async def get_clientes(
+    after: Optional[str] = None,  # RUT del último cliente de la página anterior
+    limit: int = Query(100, ge=1, le=1000),  # cantidad de clientes por página
+    fields: Optional[str] = None,  # columnas separadas por coma, ej: rut,email
+    region: Optional[str] = None,  # filtro exacto por región
+    comuna: Optional[str] = None,  # filtro exacto por comuna
+    email_prefijo: Optional[str] = None,  # filtro por inicio del email
+    shape: str = Query("objects", pattern="^(objects|rows|columns)$"),  # forma de la lista de clientes
+    repo: RepositorioClientes = Depends(get_repositorio),
+):
+    # Armamos la lista de columnas pedidas; el RUT siempre va porque es el cursor de la página
+    if fields:
+        pedidas = [f.strip().lower() for f in fields.split(",") if f.strip()]
+        invalidas = [f for f in pedidas if f not in COLUMNAS_CLIENTE]
+        if invalidas:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(invalidas)}")
+        columnas = ["RUT"] + [COLUMNAS_CLIENTE[f] for f in pedidas if f != "rut"]
+    else:
+        columnas = list(COLUMNAS_CLIENTE.values())
+
+    after = after or None  # ?after= vacío es la primera página: Oracle toma '' como NULL y RUT > NULL no trae nada
+
     try:
-        cone = get_conexion()  # se crea variable y se le entrega a cone
-        cursor = cone.cursor()  # cursor es un elemento ejecutable que permite ejecutar comandos sql de una bd
-        sql1 = "SELECT RUT, NOMBRE_COMPLETO, EMAIL, CONTRASENIA, REGION, COMUNA, DIRECCION FROM CLIENTES"  # Consulta para obtener todos los campos relevantes de la tabla CLIENTES
-        cursor.execute(sql1)  # ejecuto la variable de la petición
-        rows = cursor.fetchall()  # Con esto tomo todo el resultado del select
-        lista1 = []  # creamos lista para guardar todos los clientes de la bd uno por uno
-        for c in rows:  # creo c de clientes
-            cliente = {"RUT": c[0], "NOMBRE_COMPLETO": c[1], "EMAIL": c[2], "CONTRASENIA": c[3], "REGION": c[4], "COMUNA": c[5], "DIRECCION": c[6]}  # Aqui va el diccionario con los datos de cada cliente, usando índices de columnas
-            lista1.append(cliente)  # agregamos el diccionario a la lista
-        return lista1  # Aqui devuelve la lista con todos los clientes
+        rows = await repo.listar_clientes(columnas, limit + 1, after, region, comuna, email_prefijo)  # pedimos una fila extra para saber si hay otra página
+        hay_mas = len(rows) > limit
+        if hay_mas:
+            del rows[limit:]  # sacamos la fila extra
+        siguiente = rows[-1][0] if hay_mas else None  # cursor para pedir la siguiente página (el RUT es la primera columna)
+        if shape == "rows":
+            # Las tuplas del cursor tal cual, con los nombres de columna una sola vez
+            clientes = {"columnas": columnas, "clientes": rows, "siguiente": siguiente}
+        elif shape == "columns":
+            # Una lista por columna: {"RUT": [...], "EMAIL": [...]}
+            clientes = {"clientes": dict(zip(columnas, zip(*rows))) if rows else {c: [] for c in columnas}, "siguiente": siguiente}
+        else:
+            clientes = {"clientes": [dict(zip(columnas, c)) for c in rows], "siguiente": siguiente}  # un diccionario por cliente con las columnas pedidas
+        return RespuestaJSON(clientes)  # Aqui devuelve la página de clientes, ya serializada (sin pasar por jsonable_encoder)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")  # Si ocurre error devolvemos código 500 con detalle del error
+        raise error_servidor(e, "Error al obtener usuarios")  # Si ocurre error devolvemos código 500 con detalle del error
+
+# Tamaño de cada lote leído del cursor durante la exportación
+EXPORT_LOTE = int(os.getenv("EXPORT_LOTE", "2000"))
+
+# Generador que lee los clientes por lotes y los va codificando directo a la respuesta
+def exportar_lotes(repo: RepositorioClientes, formato: str):
+    columnas = list(COLUMNAS_CLIENTE.values())
+    lotes = repo.exportar(columnas, EXPORT_LOTE)
+    try:
+        if formato == "csv":
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(columnas)  # encabezado
+        for filas in lotes:
+            inicio = time.perf_counter()
+            if formato == "csv":
+                escritor.writerows(filas)
+                trozo = buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)  # vaciamos el buffer para el siguiente lote
+            else:
+                trozo = a_ndjson(columnas, filas)
+            medir_fase("serializacion", time.perf_counter() - inicio)
+            yield trozo
+        if formato == "csv" and buffer.tell():
+            yield buffer.getvalue().encode("utf-8")  # encabezado de una tabla vacía
     finally:
-        if 'cursor' in locals():  # Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): #Esto cierra la conexión
-            cone.close()
+        lotes.close()  # devuelve la conexión al pool aunque el cliente corte la descarga
+
+# GET para exportar todos los clientes en NDJSON o CSV sin cargarlos en memoria
+@api.get("/clientes/export")  # Ruta para exportar clientes
+def exportar_clientes(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), repo: RepositorioClientes = Depends(get_repositorio)):
+    tipos = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+    return StreamingResponse(
+        exportar_lotes(repo, format),
+        media_type=tipos[format],
+        headers={"Content-Disposition": f'attachment; filename="clientes.{format}"'},
+    )
+
+# GET para buscar clientes por nombre, email o dirección (sin importar tildes ni mayúsculas), los que mejor calzan primero.
+# Va antes de /clientes/{rut} para que "search" no se tome como un RUT
+@api.get("/clientes/search")  # Ruta para buscar clientes
+async def buscar_clientes(q: str = Query(..., min_length=2, max_length=200), limit: int = Query(20, ge=1, le=100),
+                          repo: RepositorioClientes = Depends(get_repositorio), buscador: BuscadorClientes = Depends(get_buscador)):
+    if not buscador.listo:
+        raise HTTPException(status_code=503, detail="El índice de búsqueda se está cargando, intente nuevamente", headers={"Retry-After": "5"})
+    try:
+        encontrados = await run_in_threadpool(buscador.buscar, q, limit)  # [(rut, puntaje)] desde el índice en memoria
+        clientes = await repo.obtener_clientes([rut for rut, _ in encontrados])  # datos al día, en una sola consulta
+    except Exception as e:
+        raise error_servidor(e, "Error al buscar clientes")
+    # Un cliente que otro worker eliminó todavía puede estar en el índice: como ya no está en la BD, se omite
+    return {"clientes": [{**{columna: clientes[rut][columna] for columna in COLUMNAS_CLIENTE.values()}, "puntaje": puntaje}
+                         for rut, puntaje in encontrados if rut in clientes]}
 
 # POST para login, validando contraseña con hash
 @api.post("/login")  # Ruta para login
-def login(datos: LoginData):  # recibe un JSON con email y contrasenia validado con LoginData
+async def login(request: Request, datos: LoginData, tareas: BackgroundTasks, repo: RepositorioClientes = Depends(get_repositorio), hasher: EjecutorHash = Depends(get_hasher), limitador=Depends(get_limitador)):  # recibe un JSON con email y contrasenia validado con LoginData
+    ip = ip_cliente(request)
+    espera = limitador.revisar(datos.email, ip)  # antes de tocar la BD o bcrypt
+    if espera is not None:
+        raise HTTPException(status_code=429, detail="Demasiados intentos de login, intente más tarde",
+                            headers={"Retry-After": str(max(1, math.ceil(espera)))})
     try:
-        cone = get_conexion()  # se crea variable y se le entrega a cone
-        cursor = cone.cursor()  # cursor es un elemento ejecutable que permite ejecutar comandos sql de una bd
-        sql = "SELECT CONTRASENIA FROM CLIENTES WHERE EMAIL = :email"  # Consulta para obtener contraseña hasheada almacenada para ese email
-        cursor.execute(sql, {"email": datos.email})  # ejecuto la variable de la petición
-        resultado = cursor.fetchone()  # Tomamos primer resultado (único)
+        # Buscamos el cliente por email directo en la BD, sin caché: con varios workers el caché de otro proceso
+        # podría tener la contraseña anterior o un cliente ya eliminado
+        resultado = await repo.obtener_cliente_por_email(datos.email)
 
         if resultado is None:
+            limitador.registrar_fallo(datos.email, ip)
             raise HTTPException(status_code=401, detail="Email o contraseña incorrectos") # Este error es en caso de que no exista ese email en la BD, error 401
 
-        password_hash_db = resultado[0]  # contraseña almacenada en la BD (hash)
-        if bcrypt.checkpw(datos.contrasenia.encode('utf-8'), password_hash_db.encode('utf-8')): # Aqui se valida el password ingresado con el hash almacenado
+        password_hash_db = resultado["CONTRASENIA"]  # contraseña almacenada en la BD (hash)
+        if await verificar_contrasenia(hasher, datos.contrasenia, password_hash_db): # Aqui se valida el password ingresado con el hash almacenado
+            limitador.registrar_exito(datos.email, ip)
+            if hasher.politica.rehash_al_login and hasher.politica.necesita_rehash(password_hash_db):
+                tareas.add_task(rehashear_contrasenia, repo, hasher, resultado["RUT"], datos.contrasenia, password_hash_db)  # después de responder
             return {"mensaje": "Login exitoso"}  # Login correcto
         else:
+            limitador.registrar_fallo(datos.email, ip)
             raise HTTPException(status_code=401, detail="Email o contraseña incorrectos")  # Error login por datos incorrectos
 
+    except HTTPException:
+        raise  # Los errores HTTP (401, 503, etc.) se devuelven tal cual
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en login: {str(e)}")  # Error general de servidor en login
-    finally:
-        if 'cursor' in locals(): # Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): # Esto cierra la conexión
-            cone.close()
+        raise error_servidor(e, "Error en login")  # Error general de servidor en login
+
+# Validaciones de un cliente nuevo (se usan al crear uno o al cargar varios en /clientes/bulk)
+def validar_cliente_nuevo(cliente: Cliente):
+    # RUT, nombre que no sea solo números, email, región/comuna y largo de contraseña
+    error = error_cliente(cliente.rut, cliente.nombre_completo, cliente.email, cliente.contrasenia, cliente.region, cliente.comuna)
+    if error is not None:
+        raise HTTPException(status_code=400, detail=error)
+    cliente.rut = normalizar_rut(cliente.rut)  # se guarda siempre como 12345678-9
+    cliente.region, cliente.comuna = region_comuna_oficial(cliente.region, cliente.comuna)  # y con los nombres oficiales ("nunoa" -> "Ñuñoa")
 
 # POST para crear un nuevo cliente
 @api.post("/clientes")  # Ruta para crear cliente
-def crear_cliente(cliente: Cliente):
-        # Validar formato del RUT
-    if not validar_rut_con_dv(cliente.rut):
-        raise HTTPException(status_code=400, detail="El RUT ingresado no es válido o tiene un dígito verificador incorrecto. Ejemplo correcto: 12345678-9")
-    # Validar que el nombre no sea solo números
-    if re.fullmatch(r'\d+', cliente.nombre_completo):
-        raise HTTPException(status_code=400, detail="El nombre no puede contener solo números")
+async def crear_cliente(cliente: Cliente, repo: RepositorioClientes = Depends(get_repositorio), hasher: EjecutorHash = Depends(get_hasher), buscador: BuscadorClientes = Depends(get_buscador)):
+    validar_cliente_nuevo(cliente)
 
     try:
-        validar_email(cliente.email)
-
-        # Validar región y comuna
-        if not validar_region_comuna(cliente.region, cliente.comuna):
-            raise HTTPException(status_code=400, detail="Región y comuna no válidas")
-
-
-        # Validar longitud mínima de contraseña
-        if len(cliente.contrasenia) < 8:
-            raise HTTPException(status_code=400, detail="La contraseña debe tener al menos 8 caracteres")
-
-        cone = get_conexion()  # conexion
-        cursor = cone.cursor()  # cursor
-        #Validar que el correo no esté repetido
-        cursor.execute("SELECT EMAIL FROM CLIENTES WHERE EMAIL = :email", {"email": cliente.email})
-        if cursor.fetchone():
-             raise HTTPException(status_code=400, detail="El email ya está registrado en otro cliente")
-
-        hashed_password = bcrypt.hashpw(cliente.contrasenia.encode('utf-8'), bcrypt.gensalt()).decode('utf-8') # Hasheamos la contraseña antes de guardarla para seguridad
-        sql = """
-        INSERT INTO CLIENTES (RUT, NOMBRE_COMPLETO, EMAIL, CONTRASENIA, REGION, COMUNA, DIRECCION) 
-        VALUES (:rut, :nombre, :email, :contrasenia, :region, :comuna, :direccion) 
-        """ # Insert SQL con bind variables para evitar inyección SQL
-        cursor.execute(sql, {
-            "rut": cliente.rut,
-            "nombre": cliente.nombre_completo,
-            "email": cliente.email,
-            "contrasenia": hashed_password,
-            "region": cliente.region,
-            "comuna": cliente.comuna,
-            "direccion": cliente.direccion
-        })
-        cone.commit()  # Confirmamos cambios en la base de datos
+        hashed_password = await hashear_contrasenia(hasher, cliente.contrasenia) # Hasheamos la contraseña antes de guardarla para seguridad
+        datos = {
+            "RUT": cliente.rut,
+            "NOMBRE_COMPLETO": cliente.nombre_completo,
+            "EMAIL": cliente.email,
+            "CONTRASENIA": hashed_password,
+            "REGION": cliente.region,
+            "COMUNA": cliente.comuna,
+            "DIRECCION": cliente.direccion
+        }
+        await repo.crear_cliente(datos)  # INSERT con bind variables y commit
+        await run_in_threadpool(buscador.actualizar, cliente.rut, datos)  # ya se puede encontrar con /clientes/search (fuera del event loop)
         return {"mensaje": "Cliente creado exitosamente"}  # Mensaje de éxito
+    except HTTPException:
+        raise  # Los errores HTTP (401, 503, etc.) se devuelven tal cual
+    except ClienteDuplicadoError as e:
+        raise error_duplicado(e, "El email ya está registrado en otro cliente")  # el índice único detecta el email o RUT repetido
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al crear cliente: {str(e)}") # Error al crear cliente
-    finally:
-        if 'cursor' in locals(): #Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): # Esto cierra la conexión
-            cone.close()
+        raise error_servidor(e, "Error al crear cliente") # Error al crear cliente
+
+# Tamaño por defecto de cada lote de la carga masiva (Oracle acepta hasta 1000 valores en un IN)
+BULK_LOTE = int(os.getenv("BULK_LOTE", "500"))
+ERROR_BULK_OCUPADA = "Base de datos ocupada: la fila no se procesó, intente nuevamente"  # filas que quedaron sin procesar
+
+# Valida un lote de la carga masiva; devuelve el reporte de las filas con error y las (fila, cliente) válidas
+def validar_lote_clientes(lote: list) -> tuple:
+    reporte = {}  # resultado por número de fila
+    validos = []  # (fila, cliente) que pasaron las validaciones
+    ruts_vistos = set()
+    emails_vistos = set()
+    leidos = []  # (fila, cliente) con la estructura correcta, pendientes de validar
+    for fila, datos in lote:
+        try:
+            leidos.append((fila, Cliente.model_validate(datos)))
+        except ValidationError as ex:
+            campos = ", ".join(str(e["loc"][0]) for e in ex.errors() if e["loc"]) or "cuerpo"
+            rut = datos.get("rut") if isinstance(datos, dict) else None
+            reporte[fila] = {"fila": fila, "rut": rut, "error": f"Datos inválidos o faltantes: {campos}"}
+
+    # Todas las validaciones del lote en una sola llamada
+    for (fila, cliente), error in zip(leidos, validar_lote([cliente for _, cliente in leidos])):
+        rut = cliente.rut
+        if error is not None:
+            reporte[fila] = {"fila": fila, "rut": rut, "error": error}
+            continue
+        cliente.rut = normalizar_rut(cliente.rut)
+        cliente.region, cliente.comuna = region_comuna_oficial(cliente.region, cliente.comuna)  # nombres oficiales, así los filtros ?region= y ?comuna= los encuentran
+        # Duplicados dentro del mismo archivo
+        if cliente.rut in ruts_vistos:
+            reporte[fila] = {"fila": fila, "rut": rut, "error": "El RUT está repetido en la carga"}
+            continue
+        if cliente.email in emails_vistos:
+            reporte[fila] = {"fila": fila, "rut": rut, "error": "El email está repetido en la carga"}
+            continue
+        ruts_vistos.add(cliente.rut)
+        emails_vistos.add(cliente.email)
+        validos.append((fila, cliente))
+    return reporte, validos
+
+# Procesa un lote de la carga masiva: valida, revisa duplicados, hashea e inserta con un solo executemany
+async def procesar_lote_clientes(repo: RepositorioClientes, hasher: EjecutorHash, buscador: BuscadorClientes, lote: list) -> list:
+    reporte, validos = await run_in_threadpool(validar_lote_clientes, lote)
+
+    if validos:
+        try:
+            # Una sola consulta para saber qué RUT y emails del lote ya existen en la BD
+            ruts_bd, emails_bd = await repo.existentes([c.rut for _, c in validos], [c.email for _, c in validos])
+
+            nuevos = []
+            for fila, cliente in validos:
+                if cliente.rut in ruts_bd:
+                    reporte[fila] = {"fila": fila, "rut": cliente.rut, "error": "El RUT ya está registrado"}
+                elif cliente.email in emails_bd:
+                    reporte[fila] = {"fila": fila, "rut": cliente.rut, "error": "El email ya está registrado en otro cliente"}
+                else:
+                    nuevos.append((fila, cliente))
+
+            if nuevos:
+                hashes = await run_in_threadpool(hasher.hashear_lote, [cliente.contrasenia for _, cliente in nuevos])  # bcrypt en paralelo
+                filas_sql = [{
+                    "RUT": cliente.rut,
+                    "NOMBRE_COMPLETO": cliente.nombre_completo,
+                    "EMAIL": cliente.email,
+                    "CONTRASENIA": hash_cliente,
+                    "REGION": cliente.region,
+                    "COMUNA": cliente.comuna,
+                    "DIRECCION": cliente.direccion
+                } for (_, cliente), hash_cliente in zip(nuevos, hashes)]
+                errores = await repo.insertar_lote(filas_sql)  # un executemany y un commit
+                insertados = []  # (rut, columnas) para el índice de búsqueda
+                for posicion, (fila, cliente) in enumerate(nuevos):
+                    if posicion in errores:
+                        reporte[fila] = {"fila": fila, "rut": cliente.rut, "error": f"Error al insertar: {errores[posicion]}"}
+                    else:
+                        reporte[fila] = {"fila": fila, "rut": cliente.rut, "ok": True}
+                        insertados.append((cliente.rut, filas_sql[posicion]))
+                if insertados:
+                    await run_in_threadpool(buscador.actualizar_lote, insertados)
+        except (BDOcupadaError, PoolAgotadoError):
+            raise  # la BD está saturada: nada de este lote se guardó, crear_clientes_bulk reporta las filas que faltan
+        except Exception as e:
+            for fila, cliente in validos:
+                if fila not in reporte:
+                    reporte[fila] = {"fila": fila, "rut": cliente.rut, "error": f"Error al insertar el lote: {str(e)}"}
+
+    return [reporte[fila] for fila, _ in lote]
+
+# POST para cargar muchos clientes de una vez (JSON con una lista, o NDJSON con un cliente por línea)
+@api.post("/clientes/bulk")  # Ruta para carga masiva
+async def crear_clientes_bulk(request: Request, lote: int = Query(BULK_LOTE, ge=1, le=1000),
+                              repo: RepositorioClientes = Depends(get_repositorio), hasher: EjecutorHash = Depends(get_hasher),
+                              buscador: BuscadorClientes = Depends(get_buscador)):
+    reporte = []
+    ocupada = False  # la BD se saturó: los lotes anteriores ya se guardaron, los que faltan se reportan sin procesar
+
+    async def procesar(pendientes):
+        nonlocal ocupada
+        if not ocupada:
+            try:
+                reporte.extend(await procesar_lote_clientes(repo, hasher, buscador, pendientes))
+                return
+            except (BDOcupadaError, PoolAgotadoError) as e:
+                metricas.registrar_error(e)
+                log.warning("Carga masiva cortada en la fila %d: %s", pendientes[0][0], e)
+                ocupada = True
+        reporte.extend({"fila": fila, "rut": datos.get("rut") if isinstance(datos, dict) else None, "error": ERROR_BULK_OCUPADA}
+                       for fila, datos in pendientes)
+
+    if "ndjson" in request.headers.get("content-type", ""):
+        # NDJSON: vamos leyendo el cuerpo por partes y procesando cada lote apenas se completa
+        pendientes = []
+        fila = 0
+        resto = b""
+        async for trozo in request.stream():
+            resto += trozo
+            *lineas, resto = resto.split(b"\n")
+            if not trozo:
+                lineas.append(resto)  # última línea sin salto de línea al final
+                resto = b""
+            for linea in lineas:
+                if not linea.strip():
+                    continue
+                try:
+                    datos = json.loads(linea)
+                except ValueError:
+                    datos = None  # la línea queda reportada como inválida
+                pendientes.append((fila, datos))
+                fila += 1
+                if len(pendientes) >= lote:
+                    await procesar(pendientes)
+                    pendientes = []
+        if resto.strip():
+            try:
+                datos = json.loads(resto)
+            except ValueError:
+                datos = None
+            pendientes.append((fila, datos))
+        if pendientes:
+            await procesar(pendientes)
+    else:
+        try:
+            datos = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="El cuerpo no es un JSON válido")
+        if not isinstance(datos, list):
+            raise HTTPException(status_code=400, detail="Se esperaba una lista de clientes")
+        filas = list(enumerate(datos))
+        for i in range(0, len(filas), lote):
+            await procesar(filas[i:i + lote])
+
+    insertados = sum(1 for r in reporte if r.get("ok"))
+    return {"insertados": insertados, "con_error": len(reporte) - insertados, "filas": reporte}
+
+# GET para obtener un cliente por rut (pasa por el caché)
+@api.get("/clientes/{rut}")  # Ruta para obtener un cliente
+async def get_cliente(rut: str, repo: RepositorioClientes = Depends(get_repositorio), cache: CacheLectura = Depends(get_cache)):
+    rut = rut_normalizado(rut)  # Validar formato y dígito verificador del RUT recibido
+    try:
+        cliente = await cliente_cacheado(cache, repo, rut)
+    except Exception as e:
+        raise error_servidor(e, "Error al obtener cliente")
+    if cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return {columna: cliente[columna] for columna in COLUMNAS_CLIENTE.values()}  # sin la contraseña
 
 # PUT para actualizar un cliente existente (por rut)
 @api.put("/clientes/{rut}")  # Ruta para actualizar cliente completo
-def actualizar_cliente(rut: str, cliente: Cliente):
-        # Validar formato del RUT recibido
-    if not validar_rut_con_dv(rut):
-        raise HTTPException(status_code=400, detail="El RUT ingresado no es válido o tiene un dígito verificador incorrecto. Ejemplo correcto: 12345678-9")
+async def actualizar_cliente(rut: str, cliente: Cliente, repo: RepositorioClientes = Depends(get_repositorio), hasher: EjecutorHash = Depends(get_hasher), cache: CacheLectura = Depends(get_cache), buscador: BuscadorClientes = Depends(get_buscador)):
+    rut = rut_normalizado(rut)  # Validar formato y dígito verificador del RUT recibido
 
     try:
         validar_email(cliente.email)
 
-        # Validar región y comuna
-        if not validar_region_comuna(cliente.region, cliente.comuna):
-            raise HTTPException(status_code=400, detail="Región y comuna no válidas")
+        # Validar región y comuna (se guardan con los nombres oficiales)
+        oficiales = region_comuna_oficial(cliente.region, cliente.comuna)
+        if oficiales is None:
+            raise HTTPException(status_code=400, detail=ERROR_REGION_COMUNA)
+        cliente.region, cliente.comuna = oficiales
 
 
         # Validar longitud de contraseña
         if len(cliente.contrasenia) < 8:
-            raise HTTPException(status_code=400, detail="La contraseña debe tener al menos 8 caracteres")
+            raise HTTPException(status_code=400, detail=ERROR_CONTRASENIA)
         
 
-        cone = get_conexion()  # conexión
-        cursor = cone.cursor()  # cursor
-        hashed_password = bcrypt.hashpw(cliente.contrasenia.encode('utf-8'), bcrypt.gensalt()).decode('utf-8') # Hasheamos la contraseña antes de actualizar para seguridad
-
-        cursor.execute("SELECT RUT FROM CLIENTES WHERE RUT = :rut", {"rut": rut}) # Con esto validamos que el cliente exista antes de actualizar
-        if cursor.fetchone() is None:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Este error se usa en caso que el cliente no exista, error 404
-        
-        # Validar que el email no esté usado por otro cliente distinto
-        cursor.execute("SELECT RUT FROM CLIENTES WHERE EMAIL = :email AND RUT != :rut", {"email": cliente.email, "rut": rut})
-        if cursor.fetchone() is not None:
-            raise HTTPException(status_code=400, detail="El correo ya está en uso por otro cliente")
-
-        # Actualizamos todos los campos del cliente
-        sql = """
-        UPDATE CLIENTES SET
-            NOMBRE_COMPLETO = :nombre,
-            EMAIL = :email,
-            CONTRASENIA = :contrasenia,
-            REGION = :region,
-            COMUNA = :comuna,
-            DIRECCION = :direccion
-        WHERE RUT = :rut
-        """
-        cursor.execute(sql, {
-            "nombre": cliente.nombre_completo,
-            "email": cliente.email,
-            "contrasenia": hashed_password,
-            "region": cliente.region,
-            "comuna": cliente.comuna,
-            "direccion": cliente.direccion,
-            "rut": rut
-        })
-        cone.commit()  # Confirmamos cambios
+        hashed_password = await hashear_contrasenia(hasher, cliente.contrasenia) # Hasheamos la contraseña antes de actualizar para seguridad
+
+        # Actualizamos todos los campos del cliente en una sola sentencia (el índice único de EMAIL rechaza correos repetidos)
+        campos = {
+            "NOMBRE_COMPLETO": cliente.nombre_completo,
+            "EMAIL": cliente.email,
+            "CONTRASENIA": hashed_password,
+            "REGION": cliente.region,
+            "COMUNA": cliente.comuna,
+            "DIRECCION": cliente.direccion
+        }
+        if not await repo.actualizar_cliente(rut, campos):
+            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Si no se actualizó ninguna fila el cliente no existe, error 404
+        cache.invalidar(f"rut:{rut}")  # sacamos del caché la versión anterior del cliente
+        await run_in_threadpool(buscador.actualizar, rut, campos)  # y del índice de búsqueda las palabras anteriores
         return {"mensaje": "Cliente actualizado exitosamente"}  # Mensaje éxito
+    except HTTPException:
+        raise  # Los errores HTTP (401, 503, etc.) se devuelven tal cual
+    except ClienteDuplicadoError as e:
+        raise error_duplicado(e, "El correo ya está en uso por otro cliente")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al actualizar cliente: {str(e)}") # Error general al actualizar cliente
-    finally:
-        if 'cursor' in locals(): # Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): # Esto ciera la conexión
-            cone.close()
+        raise error_servidor(e, "Error al actualizar cliente") # Error general al actualizar cliente
 
 # DELETE para eliminar un cliente por rut
 @api.delete("/clientes/{rut}")  # Ruta para eliminar cliente
-def eliminar_cliente(rut: str):
-        # Validar formato del RUT recibido
-    if not validar_rut_con_dv(rut):
-        raise HTTPException(status_code=400, detail="El RUT ingresado no es válido o tiene un dígito verificador incorrecto. Ejemplo correcto: 12345678-9")
+async def eliminar_cliente(rut: str, repo: RepositorioClientes = Depends(get_repositorio), cache: CacheLectura = Depends(get_cache), buscador: BuscadorClientes = Depends(get_buscador)):
+    rut = rut_normalizado(rut)  # Validar formato y dígito verificador del RUT recibido
 
     try:
-        cone = get_conexion()  # conexión
-        cursor = cone.cursor()  # cursor
-        cursor.execute("SELECT RUT FROM CLIENTES WHERE RUT = :rut", {"rut": rut}) # Verificamos que exista el cliente antes de eliminar
-        if cursor.fetchone() is None:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Este error se usa si el cliente no se encuentra, error 404
-        cursor.execute("DELETE FROM CLIENTES WHERE RUT = :rut", {"rut": rut}) # Aquí ejecutamos la eliminación
-        cone.commit()  # Confirmamos cambios
+        if not await repo.eliminar_cliente(rut): # Aquí ejecutamos la eliminación
+            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Si no se borró ninguna fila el cliente no existe, error 404
+        cache.invalidar(f"rut:{rut}")  # sacamos del caché el cliente eliminado
+        await run_in_threadpool(buscador.eliminar, rut)  # y del índice de búsqueda
         return {"mensaje": "Cliente eliminado exitosamente"}  # Mensaje de éxito
+    except HTTPException:
+        raise  # Los errores HTTP (404, etc.) se devuelven tal cual
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al eliminar cliente: {str(e)}") # Error general al eliminar cliente
-    finally:
-        if 'cursor' in locals(): # Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): # Esto cierra la conexión
-            cone.close()
+        raise error_servidor(e, "Error al eliminar cliente") # Error general al eliminar cliente
 
 # PATCH para actualizar parcialmente un cliente (por rut)
 @api.patch("/clientes/{rut}")  # Ruta para actualización parcial
-def actualizar_cliente_parcial(rut: str, cliente: ClientePatch):  # Recibe rut por path y datos parciales en body
-        # Validar formato del RUT recibido
-    if not validar_rut_con_dv(rut):
-        raise HTTPException(status_code=400, detail="El RUT ingresado no es válido o tiene un dígito verificador incorrecto. Ejemplo correcto: 12345678-9")
+async def actualizar_cliente_parcial(rut: str, cliente: ClientePatch, repo: RepositorioClientes = Depends(get_repositorio), hasher: EjecutorHash = Depends(get_hasher), cache: CacheLectura = Depends(get_cache), buscador: BuscadorClientes = Depends(get_buscador)):  # Recibe rut por path y datos parciales en body
+    rut = rut_normalizado(rut)  # Validar formato y dígito verificador del RUT recibido
 
     try:
-        validar_email(cliente.email)
-
-        cone = get_conexion()  # Creamos conexión
-        cursor = cone.cursor()  # Creamos cursor
+        if cliente.email is not None:
+            validar_email(cliente.email)
 
-        cursor.execute("SELECT RUT FROM CLIENTES WHERE RUT = :rut", {"rut": rut}) # Verificamos que el cliente exista antes de actualizar
-        if cursor.fetchone() is None:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Este eror se usa si el cliente no se encuentra, error 404
-        
         # Validar región y comuna si ambos campos están presentes
         if cliente.region is not None and cliente.comuna is not None:
-            if not validar_region_comuna(cliente.region, cliente.comuna):
-                raise HTTPException(status_code=400, detail="Región y comuna no válidas")
+            oficiales = region_comuna_oficial(cliente.region, cliente.comuna)
+            if oficiales is None:
+                raise HTTPException(status_code=400, detail=ERROR_REGION_COMUNA)
+            cliente.region, cliente.comuna = oficiales
 
 
-        campos_a_actualizar = []  # Lista que almacenará los campos a actualizar en SQL
-        valores = {}  # Diccionario para los valores bind del execute
+        campos = {}  # Columnas a actualizar con su nuevo valor
 
-        # Por cada campo opcional que venga en el JSON, se agrega a la lista y al diccionario
+        # Por cada campo opcional que venga en el JSON, se agrega al diccionario
         if cliente.nombre_completo is not None:
-            campos_a_actualizar.append("NOMBRE_COMPLETO = :nombre")
-            valores["nombre"] = cliente.nombre_completo
+            campos["NOMBRE_COMPLETO"] = cliente.nombre_completo
         if cliente.email is not None:
-            cursor.execute("SELECT RUT FROM CLIENTES WHERE EMAIL = :email AND RUT != :rut", {"email": cliente.email, "rut": rut})
-            if cursor.fetchone() is not None:
-                raise HTTPException(status_code=400, detail="El correo ya está en uso por otro cliente")
-            campos_a_actualizar.append("EMAIL = :email")
-            valores["email"] = cliente.email
+            campos["EMAIL"] = cliente.email
         if cliente.contrasenia is not None:
             if len(cliente.contrasenia) < 8:
-                raise HTTPException(status_code=400, detail="La contraseña debe tener al menos 8 caracteres")
-            hashed_password = bcrypt.hashpw(cliente.contrasenia.encode('utf-8'), bcrypt.gensalt()).decode('utf-8') # Hasheamos la contraseña si viene para actualizar
-            campos_a_actualizar.append("CONTRASENIA = :contrasenia")
-            valores["contrasenia"] = hashed_password
+                raise HTTPException(status_code=400, detail=ERROR_CONTRASENIA)
+            campos["CONTRASENIA"] = await hashear_contrasenia(hasher, cliente.contrasenia) # Hasheamos la contraseña si viene para actualizar
         if cliente.region is not None:
-            campos_a_actualizar.append("REGION = :region")
-            valores["region"] = cliente.region
+            campos["REGION"] = REGIONES_OFICIALES.get(normalizar_texto(cliente.region), cliente.region)  # nombre oficial si se reconoce
         if cliente.comuna is not None:
-            campos_a_actualizar.append("COMUNA = :comuna")
-            valores["comuna"] = cliente.comuna
+            campos["COMUNA"] = COMUNAS_OFICIALES.get(normalizar_texto(cliente.comuna), cliente.comuna)
         if cliente.direccion is not None:
-            campos_a_actualizar.append("DIRECCION = :direccion")
-            valores["direccion"] = cliente.direccion
+            campos["DIRECCION"] = cliente.direccion
 
-        if not campos_a_actualizar:
+        if not campos:
             raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar") # Si no se envió ningún campo para actualizar, devolvemos error 400
 
-        valores["rut"] = rut  # agregamos el rut para la cláusula WHERE
-
-        sql = f"UPDATE CLIENTES SET {', '.join(campos_a_actualizar)} WHERE RUT = :rut" # Construimos la consulta SQL dinámicamente con los campos a actualizar
-
-        cursor.execute(sql, valores)  # Ejecutamos la consulta con los valores bind
-        cone.commit()  # Confirmamos los cambios en la base de datos
+        if not await repo.actualizar_cliente(rut, campos):  # UPDATE solo con los campos enviados
+            raise HTTPException(status_code=404, detail="Cliente no encontrado") # Si no se actualizó ninguna fila el cliente no existe, error 404
+        cache.invalidar(f"rut:{rut}")  # sacamos del caché la versión anterior del cliente
+        await run_in_threadpool(buscador.actualizar, rut, campos)  # solo cambia el índice si vino nombre, email o dirección
 
         return {"mensaje": "Cliente actualizado parcialmente exitosamente"}  # Mensaje de éxito
 
+    except HTTPException:
+        raise  # Los errores HTTP (401, 503, etc.) se devuelven tal cual
+    except ClienteDuplicadoError as e:
+        raise error_duplicado(e, "El correo ya está en uso por otro cliente")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al actualizar cliente parcialmente: {str(e)}") # Manejo de error general en actualización parcial
-    finally:
-        if 'cursor' in locals(): # Esto cierra el cursor
-            cursor.close()
-        if 'cone' in locals(): #Esto cierra la conexión
-            cone.close()
+        raise error_servidor(e, "Error al actualizar cliente parcialmente") # Manejo de error general en actualización parcial
@@ -0,0 +1,287 @@
+# Métricas de la API en formato Prometheus (GET /metrics).
+# Un middleware mide cada petición (latencia por ruta) y, mientras dura, las demás capas van anotando
+# cuánto tiempo se fue en pedir la conexión, en el SQL, en bcrypt y en serializar la respuesta.
+# Ese reparto se guarda en una variable de contexto, que pasa a los hilos de la BD y de bcrypt.
+import logging  # para el log de consultas lentas
+import re  # para agrupar sentencias que solo cambian en la cantidad de binds
+import threading  # para proteger los contadores cuando varias peticiones los usan al mismo tiempo
+import time  # para medir duraciones
+from contextvars import ContextVar  # medición de la petición en curso
+from typing import Optional
+
+log_sql = logging.getLogger("app.sql")
+
+# Límites de los histogramas de latencia (en segundos), los mismos que usa Prometheus por defecto
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fases en que se reparte el tiempo de una petición
+FASES = ("conexion", "sql", "bcrypt", "serializacion")
+
+# (registro, {fase: segundos}) de la petición en curso; None fuera de una petición
+_medicion_actual: ContextVar[Optional[tuple]] = ContextVar("medicion_actual", default=None)
+
+# Listas de binds numerados como (:r0, :r1, :r2) se agrupan en una sola sentencia
+_PATRON_LISTA_BINDS = re.compile(r"\(\s*:[A-Za-z_]+\d+(?:\s*,\s*:[A-Za-z_]+\d+)*\s*\)")
+_PATRON_ESPACIOS = re.compile(r"\s+")
+
+
+class Histograma:
+    def __init__(self, limites: tuple = LIMITES_LATENCIA):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)  # la última casilla es +Inf
+        self.suma = 0.0
+
+    def observar(self, valor: float):
+        # Se llama con el lock del registro tomado
+        posicion = 0
+        while posicion < len(self.limites) and valor > self.limites[posicion]:
+            posicion += 1
+        self.cuentas[posicion] += 1
+        self.suma += valor
+
+
+def _etiquetas(**valores) -> str:
+    # {clave="valor",...} escapando \, " y saltos de línea como pide el formato de Prometheus
+    partes = []
+    for clave, valor in valores.items():
+        texto = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{texto}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def normalizar_sentencia(sql: str, largo_maximo: int = 200) -> str:
+    # Texto de la sentencia en una línea, con las listas IN (:r0, :r1, ...) agrupadas
+    texto = _PATRON_LISTA_BINDS.sub("(:lista)", _PATRON_ESPACIOS.sub(" ", sql).strip())
+    return texto[:largo_maximo]
+
+
+class RegistroMetricas:
+    def __init__(self, umbral_sql_lenta: Optional[float] = None, max_sentencias: int = 200):
+        self.umbral_sql_lenta = umbral_sql_lenta  # segundos; sobre esto la consulta se escribe en el log (None = apagado)
+        self.max_sentencias = max_sentencias  # tope de sentencias distintas, para no crecer sin límite
+        self._lock = threading.Lock()
+        self._peticiones = {}  # (metodo, ruta, estado) -> cantidad
+        self._latencias = {}  # (metodo, ruta) -> Histograma
+        self._fases = {fase: Histograma() for fase in FASES}  # tiempo por fase (una observación por petición)
+        self._fases_por_ruta = {}  # (metodo, ruta, fase) -> segundos acumulados
+        self._sentencias = {}  # sentencia -> [ejecuciones, segundos, filas]
+        self._sql_lentas = 0
+        self._errores = {}  # tipo de excepción -> cantidad
+
+    # --- Lo que llama el middleware ---
+
+    def iniciar_peticion(self):
+        # Devuelve el token para restaurar la variable de contexto al terminar
+        return _medicion_actual.set((self, dict.fromkeys(FASES, 0.0)))
+
+    def terminar_peticion(self, token, metodo: str, ruta: str, estado: int, duracion: float, fases: Optional[dict] = None):
+        # 'fases' es el reparto al momento de responder; por defecto, el acumulado hasta ahora
+        if fases is None:
+            _, fases = _medicion_actual.get()
+        _medicion_actual.reset(token)
+        with self._lock:
+            clave = (metodo, ruta, estado)
+            self._peticiones[clave] = self._peticiones.get(clave, 0) + 1
+            histograma = self._latencias.get((metodo, ruta))
+            if histograma is None:
+                histograma = self._latencias[(metodo, ruta)] = Histograma()
+            histograma.observar(duracion)
+            for fase, segundos in fases.items():
+                if segundos:
+                    self._fases[fase].observar(segundos)
+                    clave_fase = (metodo, ruta, fase)
+                    self._fases_por_ruta[clave_fase] = self._fases_por_ruta.get(clave_fase, 0.0) + segundos
+
+    # --- Lo que llaman las demás capas ---
+
+    def registrar_sql(self, sql: str, duracion: float, filas: int, ejecucion: bool = True):
+        # ejecucion=False cuando solo se traen filas de una sentencia ya ejecutada
+        sentencia = normalizar_sentencia(sql)
+        with self._lock:
+            datos = self._sentencias.get(sentencia)
+            if datos is None:
+                if len(self._sentencias) >= self.max_sentencias:
+                    sentencia = "(otras)"
+                datos = self._sentencias.setdefault(sentencia, [0, 0.0, 0])
+            datos[0] += ejecucion
+            datos[1] += duracion
+            datos[2] += max(filas, 0)
+            lenta = ejecucion and self.umbral_sql_lenta is not None and duracion >= self.umbral_sql_lenta
+            if lenta:
+                self._sql_lentas += 1
+        if lenta:
+            log_sql.warning("Consulta lenta (%.1f ms, %d filas): %s", duracion * 1000, filas, sentencia)
+
+    def registrar_error(self, error: Exception):
+        tipo = type(error).__name__
+        with self._lock:
+            self._errores[tipo] = self._errores.get(tipo, 0) + 1
+
+    # --- Exportación ---
+
+    def exportar(self, extras: Optional[dict] = None) -> str:
+        # Texto en formato de exposición de Prometheus (version 0.0.4).
+        # 'extras' son las métricas que ya entregan el pool, el caché, etc.: {"pool": {...}, "cache": {...}}
+        lineas = []
+
+        def histograma(nombre, ayuda, series):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for etiquetas, h in series:
+                acumulado = 0
+                for limite, cuenta in zip(h.limites + ("+Inf",), h.cuentas):
+                    acumulado += cuenta
+                    lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+                lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {h.suma}")
+                lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {acumulado}")
+
+        def contador(nombre, ayuda, series, tipo="counter"):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in series:
+                lineas.append(f"{nombre}{_etiquetas(**etiquetas) if etiquetas else ''} {valor}")
+
+        with self._lock:
+            contador("http_peticiones_total", "Peticiones atendidas por ruta y código de estado",
+                     [({"metodo": m, "ruta": r, "estado": e}, n) for (m, r, e), n in sorted(self._peticiones.items())])
+            histograma("http_peticion_duracion_segundos", "Latencia de las peticiones por ruta",
+                       [({"metodo": m, "ruta": r}, h) for (m, r), h in sorted(self._latencias.items())])
+            histograma("fase_duracion_segundos", "Tiempo de cada fase dentro de una petición",
+                       [({"fase": fase}, h) for fase, h in self._fases.items()])
+            contador("http_fase_segundos_total", "Segundos acumulados por ruta en cada fase",
+                     [({"metodo": m, "ruta": r, "fase": f}, s) for (m, r, f), s in sorted(self._fases_por_ruta.items())])
+            contador("sql_ejecuciones_total", "Ejecuciones por sentencia SQL",
+                     [({"sentencia": s}, d[0]) for s, d in sorted(self._sentencias.items())])
+            contador("sql_duracion_segundos_total", "Segundos acumulados por sentencia SQL",
+                     [({"sentencia": s}, d[1]) for s, d in sorted(self._sentencias.items())])
+            contador("sql_filas_total", "Filas leídas o modificadas por sentencia SQL",
+                     [({"sentencia": s}, d[2]) for s, d in sorted(self._sentencias.items())])
+            contador("sql_lentas_total", "Consultas sobre el umbral de consulta lenta", [({}, self._sql_lentas)])
+            contador("errores_total", "Errores inesperados por tipo de excepción",
+                     [({"tipo": t}, n) for t, n in sorted(self._errores.items())])
+
+        # Métricas propias de cada componente, como gauges: pool_en_uso, cache_aciertos, hash_verificar_llamadas...
+        for prefijo, datos in (extras or {}).items():
+            for nombre, valor in _aplanar(prefijo, datos):
+                contador(nombre, f"Valor de {nombre} reportado por el componente", [({}, valor)], tipo="gauge")
+        return "\n".join(lineas) + "\n"
+
+
+def _aplanar(prefijo: str, datos: dict):
+    # {"hashear": {"llamadas": 3}} -> ("hash_hashear_llamadas", 3); los textos se omiten
+    for clave, valor in datos.items():
+        nombre = f"{prefijo}_{clave}"
+        if isinstance(valor, dict):
+            yield from _aplanar(nombre, valor)
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            yield nombre, valor
+
+
+def medir_fase(fase: str, duracion: float):
+    # Suma 'duracion' a la fase de la petición en curso (fuera de una petición no hace nada)
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion[1][fase] += duracion
+
+
+def registrar_sql(sql: str, duracion: float, filas: int, ejecucion: bool = True):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion[1]["sql"] += duracion
+        medicion[0].registrar_sql(sql, duracion, filas, ejecucion)
+
+
+# Cursor que mide cada sentencia: texto, duración y filas
+class CursorMedido:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = None  # última sentencia ejecutada, para anotarle las filas leídas
+
+    def _medir(self, metodo, sql, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, *args, **kwargs)
+        finally:
+            self._sql = sql
+            filas = self._cursor.rowcount if self._cursor.rowcount is not None else -1
+            registrar_sql(sql, time.perf_counter() - inicio, filas)
+
+    def execute(self, sql, *args, **kwargs):
+        return self._medir(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._medir(self._cursor.executemany, sql, *args, **kwargs)
+
+    def _leer(self, metodo, *args):
+        # El tiempo de traer filas también es tiempo de SQL (en Oracle son idas y vueltas al servidor)
+        inicio = time.perf_counter()
+        filas = metodo(*args)
+        cantidad = len(filas) if isinstance(filas, list) else int(filas is not None)
+        if self._sql is not None:
+            registrar_sql(self._sql, time.perf_counter() - inicio, cantidad, ejecucion=False)
+        return filas
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._leer(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def __setattr__(self, nombre, valor):
+        if nombre.startswith("_"):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._cursor, nombre, valor)  # arraysize, prefetchrows, etc. van al cursor real
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+# Conexión que entrega cursores medidos; el resto de los métodos pasan directo a la conexión real
+class ConexionMedida:
+    def __init__(self, conexion):
+        self.conexion = conexion  # conexión real (es la que se devuelve al pool)
+
+    def cursor(self):
+        return CursorMedido(self.conexion.cursor())
+
+    def __getattr__(self, nombre):
+        return getattr(self.conexion, nombre)
+
+
+# Middleware ASGI: mide cada petición hasta que se envía el último trozo de la respuesta
+class MiddlewareMetricas:
+    def __init__(self, app, registro: RegistroMetricas):
+        self.app = app
+        self.registro = registro
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        estado = 500  # si la app falla antes de responder
+        token = self.registro.iniciar_peticion()
+        # Latencia y fases hasta enviar la respuesta completa: las tareas en segundo plano que corren
+        # después (como el rehash del login) no se cuentan como tiempo de la petición
+        respondida = None
+
+        async def enviar(mensaje):
+            nonlocal estado, respondida
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+            if mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                respondida = (time.perf_counter(), dict(_medicion_actual.get()[1]))
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            # Se usa la plantilla de la ruta (/clientes/{rut}) y no la URL, para no crear una serie por cliente
+            plantilla = getattr(ruta, "path", "sin_ruta")
+            fin, fases = respondida or (time.perf_counter(), None)
+            self.registro.terminar_peticion(token, scope["method"], plantilla, estado, fin - inicio, fases)
@@ -0,0 +1,336 @@
+# Pool de conexiones a la base de datos.
+# En vez de abrir una conexión nueva (handshake TCP + sesión Oracle) en cada petición,
+# se crean algunas conexiones al iniciar la API y los endpoints las piden prestadas y las devuelven.
+import re  # para leer el nombre de la restricción en los errores de duplicado
+import os  # para armar la ruta de la base SQLite temporal
+import sqlite3  # libreria para la base SQLite de pruebas (viene con python)
+import tempfile  # carpeta temporal para la base SQLite de pruebas
+import threading  # para proteger el pool cuando varias peticiones lo usan al mismo tiempo
+import time  # para medir los tiempos de espera
+from collections import deque  # cola donde se guardan las conexiones libres
+
+
+class PoolAgotadoError(Exception):
+    """Se lanza cuando no se consiguió una conexión libre dentro del tiempo de espera."""
+
+
+# Backend para Oracle: sabe cómo crear, revisar y cerrar conexiones cx_Oracle
+class BackendOracle:
+    def __init__(self, usuario: str, clave: str, host: str = "localhost", puerto: int = 1521, servicio: str = "XE",
+                 dsn: str = None):
+        import cx_Oracle  # se importa aquí para que el backend SQLite funcione sin tener Oracle instalado
+        self.cx_Oracle = cx_Oracle
+        self.usuario = usuario
+        self.clave = clave
+        # DSN completo si se entrega (ej: "db.interna:1521/ORCLPDB1"), si no se arma con host, puerto y servicio
+        self.dsn = dsn or cx_Oracle.makedsn(host, puerto, service_name=servicio)
+
+    def conectar(self):
+        return self.cx_Oracle.connect(user=self.usuario, password=self.clave, dsn=self.dsn)
+
+    def esta_viva(self, conexion) -> bool:
+        try:
+            conexion.ping()  # ida y vuelta mínima al servidor para saber si la sesión sigue viva
+            return True
+        except Exception:
+            return False
+
+    def cerrar_conexion(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass  # si la conexión ya estaba muerta no hay nada que cerrar
+
+    def limitar(self, sql: str) -> str:
+        return f"{sql} FETCH FIRST :limite ROWS ONLY"  # sintaxis Oracle 12c+ para limitar filas
+
+    def ejecutar_lote(self, cursor, sql: str, filas: list) -> list:
+        # Un solo executemany con array binds; las filas que fallan no detienen el resto
+        cursor.executemany(sql, filas, batcherrors=True)
+        return [(error.offset, error.message) for error in cursor.getbatcherrors()]  # (posición, mensaje ORA-xxxxx)
+
+    # ORA-00955 (el nombre ya existe), ORA-01408 (la columna ya tiene índice) y ORA-00054 (otra sesión tiene la tabla
+    # bloqueada): pasan cuando otro worker está creando el mismo índice al mismo tiempo
+    ERRORES_INDICE_CONCURRENTE = (955, 1408, 54)
+
+    def asegurar_indices_unicos(self, conexion, columnas=("RUT", "EMAIL"), intentos: int = 10, espera: float = 1.0):
+        # Crea un índice único por columna si todavía no existe (así las búsquedas y los duplicados usan índice)
+        cursor = conexion.cursor()
+        try:
+            for columna in columnas:
+                if self._tiene_indice_unico(cursor, columna):
+                    continue
+                try:
+                    cursor.execute(f"CREATE UNIQUE INDEX UQ_CLIENTES_{columna} ON CLIENTES ({columna})")
+                except self.cx_Oracle.DatabaseError as error:
+                    if error.args[0].code not in self.ERRORES_INDICE_CONCURRENTE:
+                        raise
+                    # Lo está creando otro worker: esperamos a que termine y confirmamos que quedó el índice único
+                    for _ in range(intentos):
+                        if self._tiene_indice_unico(cursor, columna):
+                            break
+                        time.sleep(espera)
+                    else:
+                        raise
+        finally:
+            cursor.close()
+
+    def _tiene_indice_unico(self, cursor, columna: str) -> bool:
+        cursor.execute("""
+            SELECT COUNT(*) FROM USER_INDEXES i
+            JOIN USER_IND_COLUMNS c ON c.INDEX_NAME = i.INDEX_NAME
+            WHERE i.TABLE_NAME = 'CLIENTES' AND i.UNIQUENESS = 'UNIQUE' AND c.COLUMN_NAME = :columna
+              AND i.STATUS IN ('VALID', 'N/A')  -- N/A: índice particionado
+              AND (SELECT COUNT(*) FROM USER_IND_COLUMNS c2 WHERE c2.INDEX_NAME = i.INDEX_NAME) = 1
+        """, {"columna": columna})
+        return cursor.fetchone()[0] > 0
+
+    def columna_duplicada(self, conexion, error):
+        # Si el error es ORA-00001 (unique constraint violated) devuelve la columna repetida, si no None
+        if not isinstance(error, self.cx_Oracle.IntegrityError) or error.args[0].code != 1:
+            return None
+        nombre = re.search(r"\(([^.()]+)\.([^.()]+)\)", error.args[0].message)  # ORA-00001: ... (ESQUEMA.NOMBRE_INDICE) ...
+        if nombre is None:
+            return "RUT"
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("SELECT COLUMN_NAME FROM USER_IND_COLUMNS WHERE INDEX_NAME = :indice", {"indice": nombre.group(2)})
+            fila = cursor.fetchone()
+        finally:
+            cursor.close()
+        return fila[0] if fila else "RUT"
+
+
+# Tabla CLIENTES equivalente a la de Oracle, para levantar la base SQLite de pruebas
+DDL_CLIENTES_SQLITE = """
+CREATE TABLE IF NOT EXISTS CLIENTES (
+    RUT VARCHAR(12) PRIMARY KEY,
+    NOMBRE_COMPLETO VARCHAR(100) NOT NULL,
+    EMAIL VARCHAR(100) NOT NULL,
+    CONTRASENIA VARCHAR(100),
+    REGION VARCHAR(100),
+    COMUNA VARCHAR(100),
+    DIRECCION VARCHAR(200)
+)
+"""
+
+
+# Backend SQLite: sirve como reemplazo local de Oracle para pruebas y benchmarks
+class BackendSQLite:
+    def __init__(self, ruta: str = ":memory:"):
+        self.ruta = ruta
+        if ruta == ":memory:":
+            # Base desechable en un archivo temporal (se borra al terminar el proceso) para que todas las
+            # conexiones del pool vean la misma base. No se usa memoria compartida (cache=shared) porque ahí
+            # dos escrituras al mismo tiempo fallan con "database table is locked" en vez de esperar su turno.
+            self._temporal = tempfile.TemporaryDirectory(prefix="clientes_sqlite_")
+            self.ruta = os.path.join(self._temporal.name, "clientes.db")
+        self._esquema_creado = False
+
+    def conectar(self):
+        # timeout: segundos que una escritura espera a que termine otra antes de fallar
+        conexion = sqlite3.connect(self.ruta, uri=self.ruta.startswith("file:"), timeout=10, check_same_thread=False)
+        conexion.execute("PRAGMA synchronous=NORMAL")  # con WAL no hace falta fsync en cada commit
+        if not self._esquema_creado:
+            conexion.execute("PRAGMA journal_mode=WAL")  # lectores y un escritor al mismo tiempo
+            conexion.execute(DDL_CLIENTES_SQLITE)  # la primera conexión crea la tabla si no existe
+            conexion.commit()
+            self._esquema_creado = True
+        return conexion
+
+    def esta_viva(self, conexion) -> bool:
+        try:
+            conexion.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def cerrar_conexion(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def limitar(self, sql: str) -> str:
+        return f"{sql} LIMIT :limite"
+
+    def ejecutar_lote(self, cursor, sql: str, filas: list) -> list:
+        # SQLite no tiene batcherrors: ejecutamos fila por fila y juntamos los errores igual que Oracle
+        errores = []
+        for posicion, fila in enumerate(filas):
+            try:
+                cursor.execute(sql, fila)
+            except sqlite3.DatabaseError as ex:
+                errores.append((posicion, str(ex)))
+        return errores
+
+    def asegurar_indices_unicos(self, conexion, columnas=("RUT", "EMAIL")):
+        for columna in columnas:
+            conexion.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS UQ_CLIENTES_{columna} ON CLIENTES ({columna})")
+
+    def columna_duplicada(self, conexion, error):
+        # SQLite informa el duplicado como "UNIQUE constraint failed: CLIENTES.EMAIL"
+        if not isinstance(error, sqlite3.IntegrityError):
+            return None
+        encontrado = re.search(r"UNIQUE constraint failed: \w+\.(\w+)", str(error))
+        return encontrado.group(1).upper() if encontrado else None
+
+
+class PoolConexiones:
+    def __init__(self, backend, minimo: int = 2, maximo: int = 10, incremento: int = 1,
+                 timeout_adquirir: float = 5.0, revisar_al_prestar: bool = True):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError("Configuración de pool inválida: se requiere 0 <= minimo <= maximo y maximo >= 1")
+        self.backend = backend  # backend que crea las conexiones reales (Oracle o SQLite)
+        self.minimo = minimo  # conexiones que se abren al iniciar
+        self.maximo = maximo  # tope de conexiones abiertas al mismo tiempo
+        self.incremento = max(1, incremento)  # cuántas conexiones se abren de golpe cuando faltan
+        self.timeout_adquirir = timeout_adquirir  # segundos que se espera por una conexión libre
+        self.revisar_al_prestar = revisar_al_prestar  # si es True se hace ping antes de entregar la conexión
+        self._libres = deque()  # conexiones disponibles
+        self._abiertas = 0  # total de conexiones creadas y no cerradas
+        self._en_uso = 0  # conexiones prestadas a endpoints
+        self._cerrado = False
+        self._condicion = threading.Condition()
+        # Contadores para las métricas del pool
+        self._esperas = 0
+        self._timeouts = 0
+        self._descartadas = 0
+        self._tiempo_espera_total = 0.0
+
+    def abrir(self):
+        # Abrimos las conexiones mínimas al iniciar la API
+        with self._condicion:
+            while self._abiertas < self.minimo:
+                self._libres.append(self.backend.conectar())
+                self._abiertas += 1
+
+    def _abrir_reservadas(self, cantidad: int):
+        # Abre 'cantidad' conexiones cuyo cupo ya se reservó en _abiertas. Se llama sin el lock: el handshake con
+        # Oracle puede tardar y mientras tanto las demás peticiones siguen prestando y devolviendo conexiones
+        for _ in range(cantidad):
+            try:
+                conexion = self.backend.conectar()
+            except Exception:
+                with self._condicion:
+                    self._abiertas -= 1  # devolvemos el cupo reservado
+                    self._condicion.notify()
+                continue  # quien la pidió ya tiene la suya; la próxima vez que falten se vuelve a intentar
+            with self._condicion:
+                if self._cerrado:
+                    self._abiertas -= 1
+                    self.backend.cerrar_conexion(conexion)
+                else:
+                    self._libres.append(conexion)
+                self._condicion.notify()
+
+    def adquirir(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout_adquirir
+        extra = 0  # conexiones de más que se abren para la cola (DB_POOL_INCREMENTO)
+        with self._condicion:
+            if self._cerrado:
+                raise PoolAgotadoError("El pool de conexiones está cerrado")
+            espero = False
+            while True:
+                if self._libres:
+                    conexion = self._libres.popleft()
+                    self._en_uso += 1
+                    break
+                if self._abiertas < self.maximo:
+                    # Reservamos el cupo con el lock tomado y abrimos la conexión fuera de él
+                    conexion = None
+                    extra = min(self.incremento, self.maximo - self._abiertas) - 1
+                    self._abiertas += 1 + extra
+                    self._en_uso += 1
+                    break
+                # No hay conexiones libres ni se pueden crear más: hay que esperar
+                if not espero:
+                    espero = True
+                    self._esperas += 1
+                restante = limite - time.monotonic()
+                if restante <= 0 or not self._condicion.wait(restante):
+                    if not self._libres and self._abiertas >= self.maximo:
+                        self._timeouts += 1
+                        raise PoolAgotadoError(f"No hay conexiones libres después de {self.timeout_adquirir} segundos")
+            if espero:
+                self._tiempo_espera_total += time.monotonic() - inicio
+
+        if conexion is None:
+            try:
+                conexion = self.backend.conectar()
+            except Exception:
+                with self._condicion:
+                    self._abiertas -= 1 + extra
+                    self._en_uso -= 1
+                    self._condicion.notify()
+                raise
+            if extra:
+                # Las de más se abren en otro hilo, así esta petición no espera handshakes que no va a usar
+                threading.Thread(target=self._abrir_reservadas, args=(extra,), name="pool-incremento", daemon=True).start()
+            return conexion  # recién abierta: no hace falta el ping
+
+        # El ping se hace fuera del lock para no bloquear a las demás peticiones
+        if self.revisar_al_prestar and not self.backend.esta_viva(conexion):
+            self.backend.cerrar_conexion(conexion)
+            with self._condicion:
+                self._descartadas += 1
+            try:
+                conexion = self.backend.conectar()  # reemplazamos la conexión muerta por una nueva
+            except Exception:
+                with self._condicion:
+                    self._abiertas -= 1
+                    self._en_uso -= 1
+                    self._condicion.notify()
+                raise
+        return conexion
+
+    def _descartar(self, conexion):
+        # Cierra una conexión que no sirve y la saca de la cuenta
+        self.backend.cerrar_conexion(conexion)
+        with self._condicion:
+            self._abiertas -= 1
+            self._en_uso -= 1
+            self._descartadas += 1
+            self._condicion.notify()
+
+    def liberar(self, conexion, descartar: bool = False):
+        if descartar:
+            self._descartar(conexion)
+            return
+        try:
+            conexion.rollback()  # deshacemos lo que haya quedado sin confirmar para no ensuciar la siguiente petición
+        except Exception:
+            self._descartar(conexion)
+            return
+        with self._condicion:
+            self._en_uso -= 1
+            if self._cerrado:
+                self._abiertas -= 1
+                self.backend.cerrar_conexion(conexion)
+            else:
+                self._libres.append(conexion)
+            self._condicion.notify()
+
+    def cerrar(self):
+        # Cerramos todas las conexiones libres al apagar la API
+        with self._condicion:
+            self._cerrado = True
+            while self._libres:
+                self.backend.cerrar_conexion(self._libres.popleft())
+                self._abiertas -= 1
+            self._condicion.notify_all()
+
+    def metricas(self) -> dict:
+        with self._condicion:
+            return {
+                "abiertas": self._abiertas,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+                "esperas": self._esperas,
+                "timeouts": self._timeouts,
+                "descartadas": self._descartadas,
+                "tiempo_espera_total_s": round(self._tiempo_espera_total, 6),
+            }
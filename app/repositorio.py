@@ -0,0 +1,307 @@
+# Acceso asíncrono a la tabla CLIENTES.
+# Los endpoints hacen "await" sobre estos métodos y no ocupan un hilo mientras esperan a la base de datos.
+# Como cx_Oracle no tiene modo asíncrono, cada consulta corre en un ejecutor propio de la capa de datos
+# (del tamaño que se configure), separado del threadpool de Starlette, usando el pool de conexiones.
+import asyncio  # para esperar las consultas sin bloquear el event loop
+import contextvars  # para que las métricas de la petición sigan a la consulta en el hilo de la BD
+import threading  # para contar las consultas pendientes de forma segura
+import time  # para medir la espera por una conexión
+from concurrent.futures import ThreadPoolExecutor  # hilos donde corre el driver de la BD
+from typing import Optional
+
+from app.pool_conexiones import PoolConexiones
+from app.metricas import ConexionMedida, medir_fase  # cursores medidos y reparto del tiempo por fase
+
+# Columnas de la tabla CLIENTES en el orden en que se leen
+COLUMNAS = ("RUT", "NOMBRE_COMPLETO", "EMAIL", "CONTRASENIA", "REGION", "COMUNA", "DIRECCION")
+
+# Columnas que se pueden modificar con actualizar_cliente
+COLUMNAS_EDITABLES = ("NOMBRE_COMPLETO", "EMAIL", "CONTRASENIA", "REGION", "COMUNA", "DIRECCION")
+
+# Insert con bind variables (las claves de cada fila son los nombres de las columnas)
+SQL_INSERTAR = f"INSERT INTO CLIENTES ({', '.join(COLUMNAS)}) VALUES ({', '.join(':' + c for c in COLUMNAS)})"
+
+# RUT guardados antes de normalizar_rut con la k minúscula (12345678-k): se pasan a 12345678-K al iniciar
+SQL_RUT_K_MAYUSCULA = "UPDATE CLIENTES SET RUT = UPPER(RUT) WHERE RUT LIKE '%k' AND RUT <> UPPER(RUT)"
+
+
+# Escapa los comodines de LIKE para que el prefijo del email se busque literal
+def escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class ClienteDuplicadoError(Exception):
+    """Se lanza cuando un INSERT o UPDATE choca con un índice único (RUT o EMAIL)."""
+
+    def __init__(self, columna: str):
+        super().__init__(f"Valor duplicado en {columna}")
+        self.columna = columna
+
+
+class BDOcupadaError(Exception):
+    """Se lanza cuando hay demasiadas consultas esperando turno en la capa de datos."""
+
+
+class RepositorioClientes:
+    def __init__(self, pool: PoolConexiones, max_concurrencia: int = 10, max_pendientes: int = 200):
+        if max_concurrencia < 1 or max_pendientes < max_concurrencia:
+            raise ValueError("Configuración inválida: se requiere max_concurrencia >= 1 y max_pendientes >= max_concurrencia")
+        self.pool = pool
+        self.max_concurrencia = max_concurrencia  # consultas ejecutándose al mismo tiempo
+        self.max_pendientes = max_pendientes  # consultas en ejecución o en cola; sobre esto se rechaza
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="bd")
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._rechazadas = 0
+
+    async def _en_bd(self, funcion, *args):
+        # Corre funcion(conexion, *args) en el ejecutor de la capa de datos con una conexión del pool
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                self._rechazadas += 1
+                raise BDOcupadaError("Demasiadas consultas en espera")
+            self._pendientes += 1
+        try:
+            contexto = contextvars.copy_context()  # run_in_executor no copia el contexto por sí solo
+            return await asyncio.get_running_loop().run_in_executor(self._ejecutor, contexto.run, self._con_conexion, funcion, args)
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+
+    def _con_conexion(self, funcion, args):
+        conexion = self._adquirir()
+        try:
+            return funcion(ConexionMedida(conexion), *args)
+        finally:
+            self.pool.liberar(conexion)
+
+    def _adquirir(self):
+        inicio = time.perf_counter()
+        try:
+            return self.pool.adquirir()
+        finally:
+            medir_fase("conexion", time.perf_counter() - inicio)
+
+    def _duplicado(self, conexion, ex: Exception):
+        # Traduce el error de índice único a ClienteDuplicadoError; cualquier otro error se relanza igual
+        columna = self.pool.backend.columna_duplicada(conexion, ex)
+        if columna is not None:
+            raise ClienteDuplicadoError(columna) from ex
+
+    async def calentar(self):
+        # Antes de recibir tráfico: una consulta por conexión abierta del pool, así se crean los hilos del
+        # ejecutor y cada conexión deja preparada la consulta más usada (GET /clientes/{rut})
+        await asyncio.gather(*(self.obtener_cliente("0-0") for _ in range(min(self.pool.minimo, self.max_concurrencia))))
+
+    # --- Consultas (corren en el ejecutor, reciben la conexión) ---
+
+    def _obtener_cliente(self, conexion, rut: str) -> Optional[dict]:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(COLUMNAS)} FROM CLIENTES WHERE RUT = :rut", {"rut": rut})
+            fila = cursor.fetchone()
+            return dict(zip(COLUMNAS, fila)) if fila else None
+        finally:
+            cursor.close()
+
+    def _obtener_clientes(self, conexion, ruts: list) -> dict:
+        # Varios clientes en una sola consulta: RUT -> cliente
+        valores = {f"r{i}": rut for i, rut in enumerate(ruts)}
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(COLUMNAS)} FROM CLIENTES WHERE RUT IN ({', '.join(':' + v for v in valores)})", valores)
+            return {fila[0]: dict(zip(COLUMNAS, fila)) for fila in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def _obtener_cliente_por_email(self, conexion, email: str) -> Optional[dict]:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(COLUMNAS)} FROM CLIENTES WHERE EMAIL = :email", {"email": email})
+            fila = cursor.fetchone()
+            return dict(zip(COLUMNAS, fila)) if fila else None
+        finally:
+            cursor.close()
+
+    def _crear_cliente(self, conexion, datos: dict):
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(SQL_INSERTAR, datos)
+            conexion.commit()
+        except Exception as ex:
+            self._duplicado(conexion, ex)
+            raise
+        finally:
+            cursor.close()
+
+    def _actualizar_cliente(self, conexion, rut: str, campos: dict) -> bool:
+        columnas = [c for c in COLUMNAS_EDITABLES if c in campos]  # solo columnas conocidas, nunca texto del usuario
+        valores = {c: campos[c] for c in columnas}
+        valores["RUT"] = rut
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(f"UPDATE CLIENTES SET {', '.join(f'{c} = :{c}' for c in columnas)} WHERE RUT = :RUT", valores)
+            if cursor.rowcount == 0:
+                return False  # no existe el cliente
+            conexion.commit()
+            return True
+        except Exception as ex:
+            self._duplicado(conexion, ex)
+            raise
+        finally:
+            cursor.close()
+
+    def _eliminar_cliente(self, conexion, rut: str) -> bool:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("DELETE FROM CLIENTES WHERE RUT = :rut", {"rut": rut})
+            if cursor.rowcount == 0:
+                return False
+            conexion.commit()
+            return True
+        finally:
+            cursor.close()
+
+    def _reemplazar_contrasenia(self, conexion, rut: str, anterior: str, nueva: str) -> bool:
+        # Solo si la contraseña sigue siendo la leída: no pisa un cambio de contraseña hecho entremedio
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("UPDATE CLIENTES SET CONTRASENIA = :nueva WHERE RUT = :rut AND CONTRASENIA = :anterior",
+                           {"nueva": nueva, "rut": rut, "anterior": anterior})
+            if cursor.rowcount == 0:
+                return False
+            conexion.commit()
+            return True
+        finally:
+            cursor.close()
+
+    def _listar_clientes(self, conexion, columnas: list, limite: int, after, region, comuna, email_prefijo) -> list:
+        columnas = [c for c in columnas if c in COLUMNAS]  # solo columnas conocidas, nunca texto del usuario
+        # Los filtros van como variables bind dentro del WHERE para que los resuelva la base de datos
+        condiciones = []
+        valores = {"limite": limite}
+        if after is not None:
+            condiciones.append("RUT > :after")
+            valores["after"] = after
+        if region is not None:
+            condiciones.append("REGION = :region")
+            valores["region"] = region
+        if comuna is not None:
+            condiciones.append("COMUNA = :comuna")
+            valores["comuna"] = comuna
+        if email_prefijo is not None:
+            condiciones.append("EMAIL LIKE :email_prefijo ESCAPE '\\'")
+            valores["email_prefijo"] = escapar_like(email_prefijo) + "%"
+        sql = f"SELECT {', '.join(columnas)} FROM CLIENTES"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql = self.pool.backend.limitar(sql + " ORDER BY RUT")  # ordenado por la llave primaria
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(sql, valores)
+            return cursor.fetchmany(limite)
+        finally:
+            cursor.close()
+
+    def _existentes(self, conexion, ruts: list, emails: list) -> tuple:
+        # Una sola consulta para saber cuáles de estos RUT y emails ya están en la BD
+        valores = {}
+        for i, rut in enumerate(ruts):
+            valores[f"r{i}"] = rut
+        for i, email in enumerate(emails):
+            valores[f"e{i}"] = email
+        lista_ruts = ", ".join(f":r{i}" for i in range(len(ruts))) or "NULL"
+        lista_emails = ", ".join(f":e{i}" for i in range(len(emails))) or "NULL"
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(f"SELECT RUT, EMAIL FROM CLIENTES WHERE RUT IN ({lista_ruts}) OR EMAIL IN ({lista_emails})", valores)
+            ruts_bd = set()
+            emails_bd = set()
+            for rut, email in cursor.fetchall():
+                ruts_bd.add(rut)
+                emails_bd.add(email)
+            return ruts_bd, emails_bd
+        finally:
+            cursor.close()
+
+    def _insertar_lote(self, conexion, filas: list) -> dict:
+        cursor = conexion.cursor()
+        try:
+            errores = dict(self.pool.backend.ejecutar_lote(cursor, SQL_INSERTAR, filas))  # posición -> mensaje
+            conexion.commit()  # un commit por lote
+            return errores
+        finally:
+            cursor.close()
+
+    # --- Métodos asíncronos que usan los endpoints ---
+
+    async def obtener_cliente(self, rut: str) -> Optional[dict]:
+        # Cliente completo (incluye el hash de la contraseña) o None si no existe
+        return await self._en_bd(self._obtener_cliente, rut)
+
+    async def obtener_clientes(self, ruts: list) -> dict:
+        # RUT -> cliente completo, solo de los que existen (hasta 1000 RUT, el máximo de un IN en Oracle)
+        if not ruts:
+            return {}
+        return await self._en_bd(self._obtener_clientes, ruts)
+
+    async def obtener_cliente_por_email(self, email: str) -> Optional[dict]:
+        # Cliente completo dueño del email (usa el índice único de EMAIL) o None
+        return await self._en_bd(self._obtener_cliente_por_email, email)
+
+    async def crear_cliente(self, datos: dict):
+        # datos trae las 7 columnas (RUT, NOMBRE_COMPLETO, ...); lanza ClienteDuplicadoError si el RUT o el email ya existen
+        await self._en_bd(self._crear_cliente, datos)
+
+    async def actualizar_cliente(self, rut: str, campos: dict) -> bool:
+        # Actualiza las columnas de 'campos' en una sola sentencia; devuelve False si el cliente no existe
+        return await self._en_bd(self._actualizar_cliente, rut, campos)
+
+    async def eliminar_cliente(self, rut: str) -> bool:
+        return await self._en_bd(self._eliminar_cliente, rut)
+
+    async def reemplazar_contrasenia(self, rut: str, anterior: str, nueva: str) -> bool:
+        # Cambia el hash guardado de un cliente; False si no existe o su contraseña ya no es 'anterior'
+        return await self._en_bd(self._reemplazar_contrasenia, rut, anterior, nueva)
+
+    async def listar_clientes(self, columnas: list, limite: int, after: Optional[str] = None, region: Optional[str] = None,
+                              comuna: Optional[str] = None, email_prefijo: Optional[str] = None) -> list:
+        # Hasta 'limite' filas ordenadas por RUT, como tuplas en el orden de 'columnas'
+        return await self._en_bd(self._listar_clientes, columnas, limite, after, region, comuna, email_prefijo)
+
+    async def existentes(self, ruts: list, emails: list) -> tuple:
+        # (RUT que ya existen, emails que ya existen)
+        return await self._en_bd(self._existentes, ruts, emails)
+
+    async def insertar_lote(self, filas: list) -> dict:
+        # Inserta varias filas (claves = columnas) con un solo executemany y un commit; devuelve {posición: error}
+        return await self._en_bd(self._insertar_lote, filas)
+
+    def exportar(self, columnas: list, tamano_lote: int):
+        # Generador síncrono que entrega la tabla completa en lotes de filas, ordenada por RUT.
+        # Usa su propia conexión porque la respuesta se sigue enviando después de terminar el endpoint.
+        columnas = [c for c in columnas if c in COLUMNAS]
+        conexion = self._adquirir()
+        try:
+            cursor = ConexionMedida(conexion).cursor()
+            cursor.arraysize = tamano_lote  # filas que trae cada ida y vuelta a la base de datos
+            if hasattr(cursor, "prefetchrows"):
+                cursor.prefetchrows = tamano_lote + 1  # prefetch de Oracle para la primera ida y vuelta
+            cursor.execute(f"SELECT {', '.join(columnas)} FROM CLIENTES ORDER BY RUT")
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                yield filas
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            self.pool.liberar(conexion)  # al terminar o si el cliente corta la descarga
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)  # esperamos las consultas en curso
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"max_concurrencia": self.max_concurrencia, "max_pendientes": self.max_pendientes,
+                    "pendientes": self._pendientes, "rechazadas": self._rechazadas}
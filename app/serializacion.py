@@ -0,0 +1,39 @@
+# Serialización JSON de las respuestas.
+# Se usa orjson si está instalado (varias veces más rápido que el módulo json y escribe bytes directo);
+# si no, se usa json con el mismo formato compacto que FastAPI.
+import json  # respaldo cuando orjson no está instalado
+import time  # para medir el tiempo de serialización
+
+from fastapi.responses import JSONResponse
+
+from app.metricas import medir_fase  # tiempo de serialización dentro de la petición en curso
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+
+def a_json(contenido) -> bytes:
+    # Tuplas y listas se escriben como arreglos JSON; los textos van en UTF-8 sin escapar tildes ni eñes
+    if orjson is not None:
+        return orjson.dumps(contenido)
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def a_ndjson(columnas: list, filas: list) -> bytes:
+    # Una línea JSON por fila ({"RUT": ..., "EMAIL": ...}\n)
+    if orjson is not None:
+        return b"".join(orjson.dumps(dict(zip(columnas, fila))) + b"\n" for fila in filas)
+    return "".join(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False, separators=(",", ":")) + "\n"
+                   for fila in filas).encode("utf-8")
+
+
+# Respuesta JSON por defecto de la API: usa a_json y anota cuánto se demora en serializar.
+# Los endpoints con muchas filas la devuelven directamente para saltarse el jsonable_encoder de FastAPI.
+class RespuestaJSON(JSONResponse):
+    def render(self, content) -> bytes:
+        inicio = time.perf_counter()
+        cuerpo = a_json(content)
+        medir_fase("serializacion", time.perf_counter() - inicio)
+        return cuerpo
@@ -0,0 +1,169 @@
+# Validaciones de clientes (RUT, email, región y comuna).
+# Todo lo que se puede preparar una sola vez (expresiones regulares e índice de regiones y comunas)
+# se arma al importar el módulo, así cada validación es solo una búsqueda.
+import re  # expresiones regulares para email y RUT
+import unicodedata  # para quitar tildes al normalizar región y comuna
+from typing import Optional
+
+regiones_y_comunas = {
+    "Arica y Parinacota": ["Arica", "Camarones", "Putre", "General Lagos"],
+    "Tarapacá": ["Iquique", "Alto Hospicio", "Pozo Almonte", "Camiña", "Colchane", "Huara", "Pica"],
+    "Antofagasta": ["Antofagasta", "Mejillones", "Sierra Gorda", "Taltal", "Calama", "Ollagüe", "San Pedro de Atacama"],
+    "Atacama": ["Copiapó", "Caldera", "Tierra Amarilla", "Chañaral", "Diego de Almagro", "Vallenar", "Freirina", "Huasco", "Alto del Carmen"],
+    "Coquimbo": ["La Serena", "Coquimbo", "Andacollo", "La Higuera", "Paihuano", "Vicuña", "Illapel", "Canela", "Los Vilos", "Salamanca", "Ovalle", "Combarbalá", "Monte Patria", "Punitaqui", "Río Hurtado"],
+    "Valparaíso": ["Valparaíso", "Casablanca", "Concón", "Juan Fernández", "Puchuncaví", "Quintero", "Viña del Mar", "Isla de Pascua", "Los Andes", "Calle Larga", "Rinconada", "San Esteban", "La Ligua", "Cabildo", "Papudo", "Petorca", "Zapallar", "Quillota", "Calera", "Hijuelas", "La Cruz", "Nogales", "San Antonio", "Algarrobo", "Cartagena", "El Quisco", "El Tabo", "Santo Domingo", "San Felipe", "Catemu", "Llaillay", "Panquehue", "Putaendo", "Santa María"],
+    "Metropolitana": ["Santiago", "Cerrillos", "Cerro Navia", "Conchalí", "El Bosque", "Estación Central", "Huechuraba", "Independencia", "La Cisterna", "La Florida", "La Granja", "La Pintana", "La Reina", "Las Condes", "Lo Barnechea", "Lo Espejo", "Lo Prado", "Macul", "Maipú", "Ñuñoa", "Pedro Aguirre Cerda", "Peñalolén", "Providencia", "Pudahuel", "Quilicura", "Quinta Normal", "Recoleta", "Renca", "San Joaquín", "San Miguel", "San Ramón", "Vitacura", "Puente Alto", "Pirque", "San José de Maipo", "Colina", "Lampa", "Tiltil", "San Bernardo", "Buin", "Calera de Tango", "Paine", "Melipilla", "Alhué", "Curacaví", "María Pinto", "San Pedro", "Talagante", "El Monte", "Isla de Maipo", "Padre Hurtado", "Peñaflor"],
+    "Libertador General Bernardo O'Higgins": ["Rancagua", "Codegua", "Coinco", "Coltauco", "Doñihue", "Graneros", "Las Cabras", "Machalí", "Malloa", "Mostazal", "Olivar", "Peumo", "Pichidegua", "Quinta de Tilcoco", "Rengo", "Requínoa", "San Vicente", "Pichilemu", "La Estrella", "Litueche", "Marchihue", "Navidad", "Paredones", "San Fernando", "Chépica", "Chimbarongo", "Lolol", "Nancagua", "Palmilla", "Peralillo", "Placilla", "Pumanque", "Santa Cruz"],
+    "Maule": ["Talca", "San Clemente", "Pelarco", "Pencahue", "Maule", "San Rafael", "Curepto", "Constitución", "Empedrado", "Río Claro", "Linares", "San Javier", "Villa Alegre", "Yerbas Buenas", "Colbún", "Parral", "Retiro", "Longaví", "Cauquenes", "Chanco", "Pelluhue"],
+    "Ñuble": ["Chillán", "Chillán Viejo", "Cobquecura", "Coelemu", "Coihueco", "El Carmen", "Ninhue", "Ñiquén", "Pemuco", "Pinto", "Portezuelo", "Quillón", "Quirihue", "Ránquil", "San Carlos", "San Fabián", "San Ignacio", "San Nicolás", "Treguaco", "Yungay"],
+    "Biobío": ["Concepción", "Coronel", "Chiguayante", "Florida", "Hualpén", "Hualqui", "Lota", "Penco", "San Pedro de la Paz", "Santa Juana", "Talcahuano", "Tomé", "Yumbel", "Cabrero", "Laja", "Los Ángeles", "Mulchén", "Nacimiento", "Negrete", "Quilaco", "Quilleco", "San Rosendo", "Santa Bárbara", "Tucapel", "Alto Biobío"],
+    "La Araucanía": ["Temuco", "Carahue", "Cunco", "Curarrehue", "Freire", "Galvarino", "Gorbea", "Lautaro", "Loncoche", "Melipeuco", "Nueva Imperial", "Padre Las Casas", "Perquenco", "Pitrufquén", "Pucón", "Saavedra", "Teodoro Schmidt", "Toltén", "Vilcún", "Villarrica", "Cholchol", "Angol", "Collipulli", "Curacautín", "Ercilla", "Lonquimay", "Los Sauces", "Lumaco", "Purén", "Renaico", "Traiguén", "Victoria"],
+    "Los Ríos": ["Valdivia", "Corral", "Lanco", "Los Lagos", "Máfil", "Mariquina", "Paillaco", "Panguipulli", "La Unión", "Futrono", "Lago Ranco", "Río Bueno"],
+    "Los Lagos": ["Puerto Montt", "Calbuco", "Cochamó", "Fresia", "Frutillar", "Los Muermos", "Llanquihue", "Maullín", "Puerto Varas", "Castro", "Ancud", "Chonchi", "Curaco de Vélez", "Dalcahue", "Puqueldón", "Queilén", "Quellón", "Quemchi", "Quinchao", "Osorno", "Puerto Octay", "Purranque", "Puyehue", "Río Negro", "San Juan de la Costa", "San Pablo"],
+    "Aysén": ["Coyhaique", "Lago Verde", "Aysén", "Cisnes", "Guaitecas", "Cochrane", "O'Higgins", "Tortel", "Chile Chico", "Río Ibáñez"],
+    "Magallanes": ["Punta Arenas", "Laguna Blanca", "Río Verde", "San Gregorio", "Cabo de Hornos", "Antártica", "Porvenir", "Primavera", "Timaukel", "Natales", "Torres del Paine"]
+}
+
+# Mensajes de error (los mismos que devuelve la API)
+ERROR_RUT = "El RUT ingresado no es válido o tiene un dígito verificador incorrecto. Ejemplo correcto: 12345678-9"
+ERROR_NOMBRE = "El nombre no puede contener solo números"
+ERROR_EMAIL = "El correo ingresado no es válido. Debe contener '@' y un dominio como '.cl' o '.com'."
+ERROR_REGION_COMUNA = "Región y comuna no válidas"
+ERROR_CONTRASENIA = "La contraseña debe tener al menos 8 caracteres"
+
+# Expresiones regulares compiladas una sola vez
+PATRON_EMAIL = re.compile(r"[\w\.-]+@[\w\.-]+\.(com|cl|org|net|edu)")  # siempre con fullmatch: con ^...$ y match pasaba un "\n" al final
+PATRON_RUT = re.compile(r"([0-9]{7,8})-([0-9kK])")  # sin puntos y con guion (ej: 12345678-9); solo dígitos ASCII, \d acepta otros
+PATRON_SOLO_NUMEROS = re.compile(r"\d+")
+_QUITAR_PUNTOS = str.maketrans("", "", ". ")  # para aceptar RUT escritos como 12.345.678-9
+
+# Dígito verificador: cada dígito (de derecha a izquierda) se multiplica por 2, 3, 4, 5, 6, 7, 2, 3.
+# En vez de recorrer dígito por dígito, se precalcula la suma de cada par de dígitos con sus pesos,
+# así un RUT de 8 dígitos son 4 búsquedas en diccionario.
+def _tabla_pares(peso_izquierdo: int, peso_derecho: int) -> dict:
+    return {f"{a}{b}": a * peso_izquierdo + b * peso_derecho for a in range(10) for b in range(10)}
+
+_PARES_3_2 = _tabla_pares(3, 2)  # dígitos 1-2 y 7-8 contando desde la derecha
+_PARES_5_4 = _tabla_pares(5, 4)  # dígitos 3-4
+_PARES_7_6 = _tabla_pares(7, 6)  # dígitos 5-6
+_DV_POR_RESTO = "0K987654321"  # dígito verificador según suma % 11 (11 - resto, con 11 -> 0 y 10 -> K)
+
+
+# Tabla para str.translate que borra las marcas (tildes, diéresis, la virgulilla de la ñ) que deja NFKD.
+# Cada carácter se revisa con unicodedata.combining la primera vez que aparece y queda guardado,
+# así quitar las tildes corre en C en vez de recorrer el texto carácter por carácter en Python.
+class _TablaSinMarcas(dict):
+    def __missing__(self, codigo: int):
+        valor = None if unicodedata.combining(chr(codigo)) else codigo
+        self[codigo] = valor
+        return valor
+
+_SIN_MARCAS = _TablaSinMarcas()
+
+
+def normalizar_texto(texto: str) -> str:
+    # Minúsculas, sin tildes ni espacios repetidos: "  Ñuñoa " y "nunoa" quedan iguales
+    texto = texto.strip().casefold()
+    if not texto.isascii():  # un texto ASCII no tiene tildes que quitar
+        texto = unicodedata.normalize("NFKD", texto).translate(_SIN_MARCAS)
+    return " ".join(texto.split())
+
+
+# Índice (región, comuna) armado una sola vez al importar, con los nombres oficiales de cada par. Guarda cada par en
+# minúsculas con y sin tildes, así el caso común se resuelve solo con strip() + casefold(); la normalización completa queda para lo raro.
+INDICE_REGION_COMUNA = {
+    clave: (region, comuna)
+    for region, comunas in regiones_y_comunas.items()
+    for comuna in comunas
+    for clave in ((region.casefold(), comuna.casefold()), (normalizar_texto(region), normalizar_texto(comuna)))
+}
+
+# Nombre oficial de cada región y de cada comuna por separado (para PATCH, que puede traer solo una de las dos)
+REGIONES_OFICIALES = {normalizar_texto(region): region for region in regiones_y_comunas}
+COMUNAS_OFICIALES = {normalizar_texto(comuna): comuna for comunas in regiones_y_comunas.values() for comuna in comunas}
+
+
+def region_comuna_oficial(region: str, comuna: str) -> Optional[tuple]:
+    # (región, comuna) con los nombres de regiones_y_comunas, o None si el par no existe: "metropolitana", "nunoa" -> "Metropolitana", "Ñuñoa"
+    par = INDICE_REGION_COMUNA.get((region.strip().casefold(), comuna.strip().casefold()))
+    if par is None:
+        par = INDICE_REGION_COMUNA.get((normalizar_texto(region), normalizar_texto(comuna)))
+    return par
+
+
+def validar_region_comuna(region: str, comuna: str) -> bool:
+    return region_comuna_oficial(region, comuna) is not None
+
+
+def email_valido(email: str) -> bool:
+    # Validación básica con expresión regular
+    return PATRON_EMAIL.fullmatch(email) is not None
+
+
+# Valida que el RUT tenga el formato chileno sin puntos y con guion (ej: 12345678-9)
+def validar_formato_rut(rut: str) -> bool:
+    return PATRON_RUT.fullmatch(rut) is not None
+
+
+def calcular_dv(cuerpo: str) -> str:
+    # Suma ponderada de los dígitos del RUT (hasta 8) y el resto de dividir por 11
+    c = cuerpo.zfill(8)
+    return _DV_POR_RESTO[(_PARES_3_2[c[6:]] + _PARES_5_4[c[4:6]] + _PARES_7_6[c[2:4]] + _PARES_3_2[c[:2]]) % 11]
+
+
+def normalizar_rut(rut: str) -> Optional[str]:
+    # Devuelve el RUT como 12345678-9 (sin puntos, K mayúscula) si el formato y el dígito verificador son correctos
+    if "." in rut or " " in rut:
+        rut = rut.translate(_QUITAR_PUNTOS)
+    encontrado = PATRON_RUT.fullmatch(rut)
+    if encontrado is None:
+        return None
+    cuerpo, dv_ingresado = encontrado.groups()
+    if dv_ingresado == "k":
+        dv_ingresado = "K"
+    return f"{cuerpo}-{dv_ingresado}" if calcular_dv(cuerpo) == dv_ingresado else None
+
+
+#Validar que el digito verificador y el rut correspondan
+def validar_rut_con_dv(rut: str) -> bool:
+    return normalizar_rut(rut) is not None
+
+
+def error_cliente(rut: str, nombre_completo: str, email: str, contrasenia: str, region: str, comuna: str) -> Optional[str]:
+    # Devuelve el primer error de validación de un cliente nuevo, o None si está todo bien
+    if normalizar_rut(rut) is None:
+        return ERROR_RUT
+    if PATRON_SOLO_NUMEROS.fullmatch(nombre_completo):
+        return ERROR_NOMBRE
+    if PATRON_EMAIL.fullmatch(email) is None:
+        return ERROR_EMAIL
+    if not validar_region_comuna(region, comuna):
+        return ERROR_REGION_COMUNA
+    if len(contrasenia) < 8:
+        return ERROR_CONTRASENIA
+    return None
+
+
+def validar_lote(clientes: list) -> list:
+    # Valida muchos clientes de una vez (carga masiva); devuelve un error o None por cada uno, en el mismo orden.
+    # Región y comuna se normalizan una sola vez por valor distinto, ya que en una carga se repiten mucho.
+    normalizados = {}
+    resultado = []
+    for cliente in clientes:
+        if normalizar_rut(cliente.rut) is None:
+            resultado.append(ERROR_RUT)
+        elif PATRON_SOLO_NUMEROS.fullmatch(cliente.nombre_completo):
+            resultado.append(ERROR_NOMBRE)
+        elif PATRON_EMAIL.fullmatch(cliente.email) is None:
+            resultado.append(ERROR_EMAIL)
+        else:
+            clave = (cliente.region, cliente.comuna)
+            if clave not in normalizados:
+                normalizados[clave] = region_comuna_oficial(cliente.region, cliente.comuna)
+            if normalizados[clave] is None:
+                resultado.append(ERROR_REGION_COMUNA)
+            elif len(cliente.contrasenia) < 8:
+                resultado.append(ERROR_CONTRASENIA)
+            else:
+                resultado.append(None)
+    return resultado
@@ -0,0 +1,146 @@
+# Benchmark de la capa de datos asíncrona: compara un endpoint síncrono (def, corre en el threadpool
+# de Starlette y espera a la BD ocupando un hilo) con el camino async de app/repositorio.py.
+# Usa SQLite en memoria con una latencia simulada por consulta para parecerse a una BD remota, y mide
+# además un endpoint barato (/ping) que se llama durante la carga para ver si queda bloqueado.
+# Uso: python benchmarks/bench_async.py [--concurrencia 200] [--peticiones 2000] [--latencia-ms 50] [--conexiones 80]
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.pool_conexiones import BackendSQLite, PoolConexiones  # noqa: E402
+from app.repositorio import COLUMNAS, RepositorioClientes  # noqa: E402
+
+
+# Cursor que espera 'latencia' segundos en cada execute, como si la BD estuviera en otra máquina
+class CursorLento:
+    def __init__(self, cursor, latencia: float):
+        self._cursor = cursor
+        self._latencia = latencia
+
+    def execute(self, *args):
+        time.sleep(self._latencia)
+        return self._cursor.execute(*args)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionLenta:
+    def __init__(self, conexion, latencia: float):
+        self._conexion = conexion
+        self._latencia = latencia
+
+    def cursor(self):
+        return CursorLento(self._conexion.cursor(), self._latencia)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+
+class BackendLento(BackendSQLite):
+    def __init__(self, latencia: float):
+        super().__init__("file:bench_async?mode=memory&cache=shared")
+        self.latencia = latencia
+
+    def conectar(self):
+        return ConexionLenta(super().conectar(), self.latencia)
+
+
+def crear_app(pool: PoolConexiones, repo: RepositorioClientes) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/{rut}")
+    def cliente_sync(rut: str):
+        # Como estaba antes: el hilo queda tomado mientras la BD responde
+        conexion = pool.adquirir()
+        try:
+            cursor = conexion.cursor()
+            cursor.execute(f"SELECT {', '.join(COLUMNAS)} FROM CLIENTES WHERE RUT = :rut", {"rut": rut})
+            fila = cursor.fetchone()
+            cursor.close()
+            return dict(zip(COLUMNAS, fila)) if fila else None
+        finally:
+            pool.liberar(conexion)
+
+    @app.get("/async/{rut}")
+    async def cliente_async(rut: str):
+        return await repo.obtener_cliente(rut)
+
+    @app.get("/ping")
+    def ping():
+        # Endpoint síncrono barato (como /regiones): solo necesita un hilo libre
+        return {"ok": True}
+
+    return app
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+
+async def cargar(cliente: httpx.AsyncClient, ruta: str, concurrencia: int, peticiones: int):
+    latencias = []
+    latencias_ping = []
+    restantes = iter(range(peticiones))
+
+    async def trabajador():
+        for _ in restantes:
+            inicio = time.perf_counter()
+            respuesta = await cliente.get(ruta)
+            respuesta.raise_for_status()
+            latencias.append(time.perf_counter() - inicio)
+
+    async def sonda():
+        # Mientras dura la carga, un /ping cada 10 ms
+        while len(latencias) < peticiones:
+            inicio = time.perf_counter()
+            await cliente.get("/ping")
+            latencias_ping.append(time.perf_counter() - inicio)
+            await asyncio.sleep(0.01)
+
+    inicio = time.perf_counter()
+    tarea_sonda = asyncio.create_task(sonda())
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    await tarea_sonda
+    return peticiones / duracion, percentil(latencias, 0.50), percentil(latencias, 0.99), percentil(latencias_ping, 0.99)
+
+
+async def main(concurrencia: int, peticiones: int, latencia: float, conexiones: int):
+    pool = PoolConexiones(BackendLento(latencia), minimo=conexiones, maximo=conexiones, timeout_adquirir=60,
+                          revisar_al_prestar=False)
+    pool.abrir()
+    conexion = pool.adquirir()
+    conexion.execute("INSERT OR REPLACE INTO CLIENTES VALUES ('12345678-5', 'Juan', 'juan@x.cl', 'x', 'Maule', 'Talca', 'Av 1')")
+    conexion.commit()
+    pool.liberar(conexion)
+    repo = RepositorioClientes(pool, max_concurrencia=conexiones, max_pendientes=concurrencia * 2)
+
+    transporte = httpx.ASGITransport(app=crear_app(pool, repo))
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"concurrencia={concurrencia} peticiones={peticiones} latencia BD={latencia * 1000:.0f} ms conexiones={conexiones}")
+        print(f"{'camino':<8}{'req/s':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'p99 /ping (ms)':>17}")
+        for nombre in ("sync", "async"):
+            rps, p50, p99, p99_ping = await cargar(cliente, f"/{nombre}/12345678-5", concurrencia, peticiones)
+            print(f"{nombre:<8}{rps:>9.0f}{p50:>11.1f}{p99:>11.1f}{p99_ping:>17.1f}")
+
+    repo.cerrar()
+    pool.cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el acceso síncrono y asíncrono a la BD bajo carga")
+    parser.add_argument("--concurrencia", type=int, default=200, help="peticiones simultáneas")
+    parser.add_argument("--peticiones", type=int, default=2000, help="peticiones totales por camino")
+    parser.add_argument("--latencia-ms", type=float, default=50, help="latencia simulada por consulta")
+    parser.add_argument("--conexiones", type=int, default=80, help="tamaño del pool (y de la concurrencia async)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrencia, args.peticiones, args.latencia_ms / 1000, args.conexiones))
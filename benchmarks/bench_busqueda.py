@@ -0,0 +1,114 @@
+# Benchmark del índice de búsqueda de clientes (app/busqueda.py), sin BD.
+# Arma N clientes con nombres, emails y direcciones realistas (con tildes y eñes), los carga en el índice
+# y mide la latencia p50/p95/p99 de varias búsquedas típicas del equipo de soporte, más la de los cambios
+# que hacen los endpoints de escritura (miles de altas con emails nuevos, como una carga masiva, y el máximo,
+# que es lo que frena a las demás peticiones). Informa también el tiempo de carga y la memoria del proceso.
+# Uso: python benchmarks/bench_busqueda.py [--clientes 1000000] [--repeticiones 200] [--altas 20000]
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.busqueda import IndiceBusqueda  # noqa: E402
+from app.validaciones import regiones_y_comunas  # noqa: E402
+
+NOMBRES = ["Juan", "María", "José", "Ana", "Pedro", "Sofía", "Diego", "Camila", "Matías", "Valentina", "Benjamín",
+           "Martina", "Tomás", "Isidora", "Agustín", "Florencia", "Vicente", "Josefa", "Ignacio", "Antonia", "Nicolás",
+           "Catalina", "Sebastián", "Fernanda", "Cristóbal", "Constanza", "Joaquín", "Javiera", "Andrés", "Ñusta"]
+APELLIDOS = ["González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda",
+             "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya", "Flores", "Espinoza", "Valenzuela",
+             "Castillo", "Tapia", "Reyes", "Gutiérrez", "Castro", "Pizarro", "Álvarez", "Vásquez", "Sánchez", "Fernández",
+             "Núñez", "Ibáñez", "Carrasco", "Cortés", "Herrera", "Riquelme", "Ñancupil", "Huenchullán", "Quiñones", "Briceño"]
+CALLES = ["Av. Libertador Bernardo O'Higgins", "Pasaje Los Aromos", "Calle Ñuble", "Av. Vicuña Mackenna", "Los Carrera",
+          "Av. Irarrázaval", "Calle Huérfanos", "Camino a Melipilla", "Av. Pajaritos", "Pasaje El Peñón"]
+COMUNAS = [comuna for comunas in regiones_y_comunas.values() for comuna in comunas]
+
+CONSULTAS = [
+    ("nombre y apellido", "juan perez"),
+    ("apellido con tilde", "Núñez"),
+    ("prefijo corto", "huen"),
+    ("email completo", None),  # se completa con un email existente
+    ("parte del email", None),
+    ("apellido + comuna", "soto nunoa"),
+    ("palabra muy común", "calle"),
+    ("dos términos comunes", "av 12"),
+    ("sin resultados", "xyzzy"),
+]
+
+
+def clientes_de_prueba(cantidad: int) -> list:
+    aleatorio = random.Random(42)
+    filas = []
+    for i in range(cantidad):
+        nombre = aleatorio.choice(NOMBRES)
+        paterno, materno = aleatorio.choice(APELLIDOS), aleatorio.choice(APELLIDOS)
+        email = f"{nombre[0]}{paterno}{i}@ferremas.cl".lower()
+        direccion = f"{aleatorio.choice(CALLES)} {aleatorio.randint(1, 9999)}, {aleatorio.choice(COMUNAS)}"
+        filas.append((f"{10_000_000 + i}-{i % 10}", f"{nombre} {paterno} {materno}", email, direccion))
+    return filas
+
+
+def memoria_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux informa KiB
+
+
+def percentiles(latencias: list) -> str:
+    ordenadas = sorted(latencias)
+    p = lambda q: ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * q))] * 1000  # noqa: E731
+    return f"{p(0.50):>9.2f}{p(0.95):>9.2f}{p(0.99):>9.2f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del índice de búsqueda de clientes")
+    parser.add_argument("--clientes", type=int, default=1_000_000, help="clientes cargados en el índice")
+    parser.add_argument("--repeticiones", type=int, default=200, help="veces que se repite cada búsqueda")
+    parser.add_argument("--limite", type=int, default=20, help="resultados por búsqueda")
+    parser.add_argument("--altas", type=int, default=20_000, help="clientes nuevos que se agregan después de la carga")
+    args = parser.parse_args()
+
+    filas = clientes_de_prueba(args.clientes)
+    antes = memoria_mib()
+    indice = IndiceBusqueda()
+    inicio = time.perf_counter()
+    for i in range(0, len(filas), 2000):  # mismo tamaño de lote que EXPORT_LOTE
+        indice.cargar(filas[i:i + 2000])
+    indice.terminar_carga()
+    carga = time.perf_counter() - inicio
+    print(f"{args.clientes} clientes cargados en {carga:.1f} s ({args.clientes / carga:,.0f}/s), "
+          f"memoria +{memoria_mib() - antes:,.0f} MiB, {indice.metricas()['palabras']:,} palabras")
+
+    rut, _, email, _ = filas[len(filas) // 2]
+    print(f"\n{'búsqueda':<24}{'consulta':<26}{'result.':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for nombre, consulta in CONSULTAS:
+        consulta = consulta or (email if nombre == "email completo" else email.split("@")[0][:6])
+        latencias = []
+        for _ in range(args.repeticiones):
+            t = time.perf_counter()
+            resultado = indice.buscar(consulta, args.limite)
+            latencias.append(time.perf_counter() - t)
+        print(f"{nombre:<24}{consulta[:25]:<26}{len(resultado):>8}{percentiles(latencias)}")
+
+    # Lo que agregan los endpoints de escritura
+    latencias = {"actualizar (alta)": [], "actualizar (cambio)": [], "eliminar": []}
+    for i in range(args.altas):
+        t = time.perf_counter()
+        indice.actualizar(f"{90_000_000 + i}-0", {"NOMBRE_COMPLETO": f"Nuevo Cliente {i}", "EMAIL": f"nuevo{i}@ferremas.cl",
+                                                  "DIRECCION": "Calle Ñuble 1"})
+        latencias["actualizar (alta)"].append(time.perf_counter() - t)
+    for i in range(args.repeticiones):
+        t = time.perf_counter()
+        indice.actualizar(f"{90_000_000 + i}-0", {"EMAIL": f"cambiado{i}@ferremas.cl"})
+        latencias["actualizar (cambio)"].append(time.perf_counter() - t)
+    for i in range(args.repeticiones):
+        t = time.perf_counter()
+        indice.eliminar(f"{90_000_000 + i}-0")
+        latencias["eliminar"].append(time.perf_counter() - t)
+    print(f"\n{'cambio':<50}{'veces':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    for operacion, valores in latencias.items():
+        print(f"{operacion:<50}{len(valores):>8}{percentiles(valores)}{max(valores) * 1000:>9.2f}"
+              f"  (media {statistics.mean(valores) * 1000:.2f} ms)")
@@ -0,0 +1,202 @@
+# Benchmark de carga de todos los endpoints, sin necesitar Oracle.
+# Levanta la API en el mismo proceso con la base SQLite en memoria (DB_BACKEND=sqlite), carga N clientes
+# y recorre cada endpoint con un cliente ASGI. Por endpoint informa peticiones por segundo, latencia
+# p50/p95/p99 y memoria máxima asignada, y compara con una línea base guardada para ver regresiones.
+# Uso:
+#   python benchmarks/bench_endpoints.py                  # mide y compara con benchmarks/base_endpoints.json
+#   python benchmarks/bench_endpoints.py --guardar-base   # mide y guarda la línea base
+#   python benchmarks/bench_endpoints.py --clientes 20000 --concurrencia 50 --factor 0.2
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# La configuración se lee al iniciar la API, así que se define antes de importarla
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("DB_SQLITE_RUTA", ":memory:")
+os.environ.setdefault("LOGIN_LIMITADOR", "ninguno")  # todas las peticiones salen de la misma IP
+
+import bcrypt  # noqa: E402
+import httpx  # noqa: E402
+
+from app.main import api  # noqa: E402
+from app.repositorio import COLUMNAS  # noqa: E402
+from app.validaciones import calcular_dv, regiones_y_comunas  # noqa: E402
+
+ARCHIVO_BASE = os.path.join(os.path.dirname(__file__), "base_endpoints.json")
+CONTRASENIA = "clave-benchmark"
+PRIMER_RUT = 10_000_000
+MEMORIA_MINIMA_KIB = 512  # diferencias de memoria menores a esto se consideran ruido
+
+
+def rut(numero: int) -> str:
+    return f"{numero}-{calcular_dv(str(numero))}"
+
+
+def sembrar(pool, cantidad: int) -> list:
+    # Inserta 'cantidad' clientes directo en la BD (todos con el mismo hash para no esperar a bcrypt)
+    hash_comun = bcrypt.hashpw(CONTRASENIA.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    regiones = list(regiones_y_comunas.items())
+    filas = []
+    for i in range(cantidad):
+        region, comunas = regiones[i % len(regiones)]
+        filas.append((rut(PRIMER_RUT + i), f"Cliente {i}", f"cliente{i}@ferremas.cl", hash_comun,
+                      region, comunas[i % len(comunas)], f"Calle {i}"))
+    conexion = pool.adquirir()
+    try:
+        conexion.cursor().executemany(f"INSERT INTO CLIENTES ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})", filas)
+        conexion.commit()
+    finally:
+        pool.liberar(conexion)
+    return filas
+
+
+def cliente_nuevo(numero: int) -> dict:
+    return {"rut": rut(numero), "nombre_completo": f"Nuevo {numero}", "email": f"nuevo{numero}@ferremas.cl",
+            "contrasenia": CONTRASENIA, "region": "Maule", "comuna": "Talca", "direccion": "Av. Benchmark 1"}
+
+
+def escenarios(filas: list) -> list:
+    # (nombre, peticiones con factor 1, función que hace la i-ésima petición)
+    ruts = [f[0] for f in filas]
+    emails = [f[2] for f in filas]
+    region = filas[0][4]
+    nuevos = iter(range(PRIMER_RUT + len(filas) + 1000, 99_999_999))  # RUT que no están sembrados
+    creados = []  # clientes creados por POST /clientes, que después se eliminan
+
+    async def crear(c, i):
+        datos = cliente_nuevo(next(nuevos))
+        creados.append(datos["rut"])
+        return await c.post("/clientes", json=datos)
+
+    async def eliminar(c, i):
+        return await c.delete(f"/clientes/{creados.pop() if creados else rut(next(nuevos))}")  # sin borrar los sembrados
+
+    async def bulk(c, i):
+        return await c.post("/clientes/bulk", json=[cliente_nuevo(next(nuevos)) for _ in range(10)])
+
+    return [
+        ("GET /regiones", 2000, lambda c, i: c.get("/regiones")),
+        ("GET /clientes", 1000, lambda c, i: c.get("/clientes", params={"after": random.choice(ruts), "limit": 100})),
+        ("GET /clientes?region", 500, lambda c, i: c.get("/clientes", params={"region": region, "limit": 50})),
+        ("GET /clientes/search", 1000, lambda c, i: c.get("/clientes/search", params={"q": f"cliente {random.randrange(len(filas))}"})),
+        ("GET /clientes/{rut}", 2000, lambda c, i: c.get(f"/clientes/{random.choice(ruts)}")),
+        ("PATCH /clientes/{rut}", 500, lambda c, i: c.patch(f"/clientes/{random.choice(ruts)}", json={"direccion": f"Calle {i}"})),
+        ("GET /clientes/export", 5, lambda c, i: c.get("/clientes/export")),
+        ("POST /login", 20, lambda c, i: c.post("/login", json={"email": random.choice(emails), "contrasenia": CONTRASENIA})),
+        ("POST /clientes", 20, crear),
+        ("DELETE /clientes/{rut}", 20, eliminar),
+        ("PUT /clientes/{rut}", 10, lambda c, i: c.put(f"/clientes/{ruts[i]}", json={**cliente_nuevo(0), "rut": ruts[i], "email": emails[i]})),
+        ("POST /clientes/bulk", 2, bulk),
+    ]
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+
+async def correr(cliente: httpx.AsyncClient, funcion, peticiones: int, concurrencia: int) -> dict:
+    latencias = []
+    restantes = iter(range(peticiones))
+
+    async def trabajador():
+        for i in restantes:
+            inicio = time.perf_counter()
+            respuesta = await funcion(cliente, i)
+            latencias.append(time.perf_counter() - inicio)
+            if respuesta.status_code >= 500:
+                raise RuntimeError(f"{respuesta.status_code}: {respuesta.text[:200]}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(min(concurrencia, peticiones))))
+    duracion = time.perf_counter() - inicio
+    return {"peticiones": peticiones, "rps": round(peticiones / duracion, 1), "p50_ms": round(percentil(latencias, 0.50), 2),
+            "p95_ms": round(percentil(latencias, 0.95), 2), "p99_ms": round(percentil(latencias, 0.99), 2)}
+
+
+async def memoria_maxima(cliente: httpx.AsyncClient, funcion, peticiones: int, concurrencia: int) -> float:
+    # Segunda pasada más corta con tracemalloc (lo hace todo más lento, por eso no se mezcla con los tiempos)
+    tracemalloc.start()
+    try:
+        await correr(cliente, funcion, peticiones, concurrencia)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)  # KiB
+    finally:
+        tracemalloc.stop()
+
+
+def comparar(resultados: dict, base: dict, tolerancia: float) -> list:
+    regresiones = []
+    print(f"\nComparación con la línea base (tolerancia {tolerancia:.0%}):")
+    print(f"{'endpoint':<26}{'req/s':>10}{'p95':>10}{'memoria':>10}")
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            print(f"{nombre:<26}{'(nuevo)':>10}")
+            continue
+        cambio_rps = actual["rps"] / anterior["rps"] - 1
+        cambio_p95 = actual["p95_ms"] / anterior["p95_ms"] - 1 if anterior["p95_ms"] else 0.0
+        cambio_mem = actual["memoria_kib"] / anterior["memoria_kib"] - 1 if anterior["memoria_kib"] else 0.0
+        marca = ""
+        crecio_memoria = cambio_mem > tolerancia and actual["memoria_kib"] - anterior["memoria_kib"] > MEMORIA_MINIMA_KIB
+        if cambio_rps < -tolerancia or cambio_p95 > tolerancia or crecio_memoria:
+            marca = "  <- REGRESIÓN"
+            regresiones.append(nombre)
+        print(f"{nombre:<26}{cambio_rps:>+10.0%}{cambio_p95:>+10.0%}{cambio_mem:>+10.0%}{marca}")
+    return regresiones
+
+
+async def main(args) -> int:
+    async with api.router.lifespan_context(api):
+        filas = sembrar(api.state.pool, args.clientes)
+        api.state.buscador.recargar()  # los clientes sembrados no pasaron por los endpoints
+        transporte = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as cliente:
+            print(f"clientes={args.clientes} concurrencia={args.concurrencia} factor={args.factor}")
+            print(f"{'endpoint':<26}{'peticiones':>11}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mem KiB':>10}")
+            resultados = {}
+            for nombre, peticiones, funcion in escenarios(filas):
+                if args.solo and args.solo not in nombre:
+                    continue
+                peticiones = max(1, int(peticiones * args.factor))
+                random.seed(nombre)  # mismas peticiones en cada corrida, aunque se use --solo
+                resultado = await correr(cliente, funcion, peticiones, args.concurrencia)
+                resultado["memoria_kib"] = await memoria_maxima(cliente, funcion, max(1, peticiones // 5), args.concurrencia)
+                resultados[nombre] = resultado
+                print(f"{nombre:<26}{peticiones:>11}{resultado['rps']:>9.1f}{resultado['p50_ms']:>9.1f}"
+                      f"{resultado['p95_ms']:>9.1f}{resultado['p99_ms']:>9.1f}{resultado['memoria_kib']:>10.0f}")
+
+    if args.guardar_base:
+        with open(args.base, "w", encoding="utf-8") as archivo:
+            json.dump({"entorno": {"python": platform.python_version(), "sistema": platform.platform(),
+                                   "cpus": os.cpu_count(), "clientes": args.clientes,
+                                   "concurrencia": args.concurrencia, "factor": args.factor},
+                       "resultados": resultados}, archivo, ensure_ascii=False, indent=2)
+        print(f"\nLínea base guardada en {args.base}")
+        return 0
+    if not os.path.exists(args.base):
+        print(f"\nNo hay línea base en {args.base} (se crea con --guardar-base)")
+        return 0
+    with open(args.base, encoding="utf-8") as archivo:
+        base = json.load(archivo)
+    regresiones = comparar(resultados, base["resultados"], args.tolerancia)
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga de los endpoints con línea base")
+    parser.add_argument("--clientes", type=int, default=5000, help="clientes cargados antes de medir")
+    parser.add_argument("--concurrencia", type=int, default=20, help="peticiones simultáneas")
+    parser.add_argument("--factor", type=float, default=1.0, help="multiplica la cantidad de peticiones de cada endpoint")
+    parser.add_argument("--solo", default=None, help="mide solo los endpoints que contengan este texto")
+    parser.add_argument("--base", default=ARCHIVO_BASE, help="archivo de la línea base")
+    parser.add_argument("--guardar-base", action="store_true", help="guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="cambio permitido antes de marcar regresión")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,91 @@
+# Benchmark de la serialización de listas de clientes: compara el camino anterior (un diccionario por
+# fila + jsonable_encoder + json.dumps, lo que hacía FastAPI con la respuesta de GET /clientes) con
+# app/serializacion.py en las tres formas de ?shape= (objects, rows y columns) y con la exportación NDJSON.
+# Uso: python benchmarks/bench_serializacion.py [--filas 10000 100000]
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app import serializacion  # noqa: E402
+from app.serializacion import a_json, a_ndjson  # noqa: E402
+
+COLUMNAS = ["RUT", "NOMBRE_COMPLETO", "EMAIL", "REGION", "COMUNA", "DIRECCION"]
+
+
+def filas_de_prueba(cantidad: int) -> list:
+    # Tuplas como las que entrega el cursor
+    return [(f"{10_000_000 + i}-{i % 10}", f"Cliente Número {i}", f"cliente{i}@ferremas.cl", "Región del Ñuble",
+             "Chillán Viejo", f"Av. O'Higgins {i}") for i in range(cantidad)]
+
+
+# Implementación anterior, como la ejecutaban el endpoint y FastAPI
+def anterior_objetos(filas):
+    contenido = {"clientes": [dict(zip(COLUMNAS, c)) for c in filas], "siguiente": None}
+    return json.dumps(jsonable_encoder(contenido), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def anterior_ndjson(filas):
+    return "".join(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False) + "\n" for fila in filas).encode("utf-8")
+
+
+def nueva_objetos(filas):
+    return a_json({"clientes": [dict(zip(COLUMNAS, c)) for c in filas], "siguiente": None})
+
+
+def nueva_filas(filas):
+    return a_json({"columnas": COLUMNAS, "clientes": filas, "siguiente": None})
+
+
+def nueva_columnas(filas):
+    return a_json({"clientes": dict(zip(COLUMNAS, zip(*filas))), "siguiente": None})
+
+
+def nueva_ndjson(filas):
+    return a_ndjson(COLUMNAS, filas)
+
+
+CASOS = [
+    ("anterior (dict + jsonable_encoder)", anterior_objetos),
+    ("shape=objects", nueva_objetos),
+    ("shape=rows", nueva_filas),
+    ("shape=columns", nueva_columnas),
+    ("ndjson anterior", anterior_ndjson),
+    ("ndjson nuevo", nueva_ndjson),
+]
+
+
+def medir(funcion, filas, repeticiones: int):
+    # Mediana de la latencia (reloj) y del tiempo de CPU por llamada, en milisegundos
+    latencias = []
+    cpu = []
+    for _ in range(repeticiones):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        cuerpo = funcion(filas)
+        latencias.append(time.perf_counter() - inicio)
+        cpu.append(time.process_time() - inicio_cpu)
+    return statistics.median(latencias) * 1000, statistics.median(cpu) * 1000, len(cuerpo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la serialización anterior con la nueva")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000], help="tamaños de la lista")
+    args = parser.parse_args()
+    print(f"orjson: {'sí' if serializacion.orjson is not None else 'no (se usa json)'}")
+    for cantidad in args.filas:
+        filas = filas_de_prueba(cantidad)
+        repeticiones = max(3, 200_000 // cantidad)
+        print(f"\n{cantidad} filas ({repeticiones} repeticiones)")
+        print(f"{'camino':<36}{'latencia ms':>13}{'CPU ms':>10}{'KiB':>9}{'mejora':>9}")
+        base = None
+        for nombre, funcion in CASOS:
+            latencia, cpu, tamano = medir(funcion, filas, repeticiones)
+            if "anterior" in nombre:
+                base = latencia
+            print(f"{nombre:<36}{latencia:>13.1f}{cpu:>10.1f}{tamano / 1024:>9.0f}{base / latencia:>8.1f}x")
@@ -0,0 +1,62 @@
+# Micro-benchmark de las validaciones: compara la versión anterior (regex como texto, title() y
+# búsqueda lineal en la lista de comunas) con app/validaciones.py.
+# Uso: python benchmarks/bench_validaciones.py
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import validaciones  # noqa: E402
+from app.validaciones import regiones_y_comunas  # noqa: E402
+
+
+# Implementación anterior, copiada tal cual estaba en app/main.py
+def anterior_region_comuna(region, comuna):
+    region = region.strip().title()
+    comuna = comuna.strip().title()
+    return region in regiones_y_comunas and comuna in regiones_y_comunas[region]
+
+
+def anterior_email(email):
+    return bool(re.match(r"^[\w\.-]+@[\w\.-]+\.(com|cl|org|net|edu)$", email))
+
+
+def anterior_rut(rut):
+    if not re.match(r"^\d{7,8}-[\dkK]$", rut):
+        return False
+    cuerpo, dv_ingresado = rut.upper().split("-")
+    suma = 0
+    multiplicador = 2
+    for digito in reversed(cuerpo):
+        suma += int(digito) * multiplicador
+        multiplicador += 1
+        if multiplicador > 7:
+            multiplicador = 2
+    dv_calculado = 11 - suma % 11
+    dv_correcto = "0" if dv_calculado == 11 else "K" if dv_calculado == 10 else str(dv_calculado)
+    return dv_ingresado == dv_correcto
+
+
+CASOS = [
+    ("región/comuna", lambda: anterior_region_comuna("Metropolitana", "Peñaflor"),
+     lambda: validaciones.validar_region_comuna("Metropolitana", "Peñaflor")),
+    ("email", lambda: anterior_email("cliente.prueba@ferremas.cl"),
+     lambda: validaciones.email_valido("cliente.prueba@ferremas.cl")),
+    ("rut + dv", lambda: anterior_rut("12345678-5"),
+     lambda: validaciones.validar_rut_con_dv("12345678-5")),
+]
+
+
+def medir(funcion, repeticiones=200_000):
+    # Mejor de 5 corridas, en nanosegundos por llamada
+    return min(timeit.repeat(funcion, number=repeticiones, repeat=5)) / repeticiones * 1e9
+
+
+if __name__ == "__main__":
+    print(f"{'validación':<15}{'anterior (ns)':>15}{'nueva (ns)':>13}{'mejora':>9}")
+    for nombre, anterior, nueva in CASOS:
+        t_anterior = medir(anterior)
+        t_nueva = medir(nueva)
+        print(f"{nombre:<15}{t_anterior:>15.0f}{t_nueva:>13.0f}{t_anterior / t_nueva:>8.1f}x")
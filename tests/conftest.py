@@ -0,0 +1,59 @@
+# Configuración común de las pruebas: todo corre sobre DB_BACKEND=sqlite (una base temporal por pool),
+# con bcrypt de costo bajo para que las pruebas no tarden lo que tarda un hash de producción
+import os
+
+os.environ.update(
+    DB_BACKEND="sqlite",
+    DB_SQLITE_RUTA=":memory:",
+    HASH_COSTO="4",
+    HASH_TRABAJADORES="2",
+    API_CALENTAR="0",
+    BUSQUEDA_INDICE="ninguno",
+)
+
+import pytest  # noqa: E402
+
+from app.pool_conexiones import PoolConexiones, BackendSQLite  # noqa: E402
+from app.repositorio import RepositorioClientes  # noqa: E402
+from app.validaciones import calcular_dv  # noqa: E402
+
+
+def rut(cuerpo: int) -> str:
+    # RUT válido (con su dígito verificador) a partir del número
+    return f"{cuerpo}-{calcular_dv(str(cuerpo))}"
+
+
+def cliente(cuerpo: int, **cambios) -> dict:
+    # Cliente válido para POST /clientes
+    datos = {"rut": rut(cuerpo), "nombre_completo": f"Cliente {cuerpo}", "email": f"cliente{cuerpo}@ferremas.cl",
+             "contrasenia": "secreto123", "region": "Metropolitana", "comuna": "Ñuñoa", "direccion": "Av. Siempre Viva 742"}
+    datos.update(cambios)
+    return datos
+
+
+@pytest.fixture
+def pool():
+    pool = PoolConexiones(BackendSQLite(), minimo=1, maximo=3, timeout_adquirir=0.5)
+    pool.abrir()
+    conexion = pool.adquirir()
+    pool.backend.asegurar_indices_unicos(conexion)
+    pool.liberar(conexion)
+    yield pool
+    pool.cerrar()
+
+
+@pytest.fixture
+def repo(pool):
+    repositorio = RepositorioClientes(pool, max_concurrencia=2, max_pendientes=10)
+    yield repositorio
+    repositorio.cerrar()
+
+
+@pytest.fixture
+def api_cliente():
+    # La API completa con su ciclo de vida: cada prueba parte con una base, un caché y un límite de login nuevos
+    from fastapi.testclient import TestClient
+    from app.main import api
+
+    with TestClient(api) as cliente_http:
+        yield cliente_http
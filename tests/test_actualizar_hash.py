@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+pytest.importorskip("cx_Oracle")  # el script de migración habla directo con Oracle
+
+from app import actualizar_hash  # noqa: E402
+
+
+def test_checkpoint_nuevo_parte_sin_rut(tmp_path):
+    assert actualizar_hash.leer_checkpoint(str(tmp_path / "no_existe.json")) == {"ultimo_rut": None, "actualizadas": 0}
+
+
+def test_checkpoint_viejo_con_rut_vacio(tmp_path):
+    ruta = tmp_path / "checkpoint.json"
+    ruta.write_text(json.dumps({"ultimo_rut": "", "actualizadas": 0}), encoding="utf-8")
+    assert actualizar_hash.leer_checkpoint(str(ruta))["ultimo_rut"] is None
+
+
+def test_checkpoint_se_guarda_y_se_retoma(tmp_path):
+    ruta = str(tmp_path / "checkpoint.json")
+    actualizar_hash.guardar_checkpoint(ruta, {"ultimo_rut": "12345678-5", "actualizadas": 1000})
+    assert actualizar_hash.leer_checkpoint(ruta) == {"ultimo_rut": "12345678-5", "actualizadas": 1000}
+
+
+def test_la_primera_pagina_no_filtra_por_rut():
+    # Oracle toma '' como NULL: "RUT > :ultimo_rut" con '' no traería ninguna fila
+    assert ":ultimo_rut" not in actualizar_hash.SQL_PENDIENTES_INICIO
+    assert "RUT > :ultimo_rut" in actualizar_hash.SQL_PENDIENTES_DESDE
+    assert "CONTRASENIA = :p_anterior" in actualizar_hash.SQL_ACTUALIZAR
+
+
+def test_es_hash_bcrypt():
+    assert actualizar_hash.es_hash_bcrypt(actualizar_hash.hashear("secreto123", costo=4))
+    assert not actualizar_hash.es_hash_bcrypt("secreto123")
+    assert not actualizar_hash.es_hash_bcrypt(None)
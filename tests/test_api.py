@@ -0,0 +1,58 @@
+from tests.conftest import cliente, rut
+
+
+def test_crear_leer_y_duplicados(api_cliente):
+    respuesta = api_cliente.post("/clientes", json=cliente(12345678, rut="12.345.678-5", comuna="nunoa"))
+    assert respuesta.status_code == 200, respuesta.text
+    leido = api_cliente.get("/clientes/12.345.678-5").json()
+    assert leido["RUT"] == "12345678-5"
+    assert leido["COMUNA"] == "Ñuñoa"  # se guarda con el nombre oficial
+    assert "CONTRASENIA" not in leido
+    assert api_cliente.post("/clientes", json=cliente(12345678, email="otro@ferremas.cl")).status_code == 409
+    assert api_cliente.post("/clientes", json=cliente(11111111, email="cliente12345678@ferremas.cl")).status_code == 400
+    assert api_cliente.get("/clientes/12345678-5%0A").status_code == 400
+    assert api_cliente.get(f"/clientes/{rut(11111111)}").status_code == 404
+
+
+def test_paginas_con_after_vacio(api_cliente):
+    cuerpos = [10000000 + i for i in range(5)]
+    for cuerpo in cuerpos:
+        assert api_cliente.post("/clientes", json=cliente(cuerpo)).status_code == 200
+    primera = api_cliente.get("/clientes", params={"after": "", "limit": 3, "fields": "rut"}).json()
+    assert [c["RUT"] for c in primera["clientes"]] == [rut(c) for c in cuerpos[:3]]
+    segunda = api_cliente.get("/clientes", params={"after": primera["siguiente"], "limit": 3, "fields": "rut"}).json()
+    assert [c["RUT"] for c in segunda["clientes"]] == [rut(c) for c in cuerpos[3:]]
+    assert segunda["siguiente"] is None
+
+
+def test_patch_put_delete_invalidan_el_cache(api_cliente):
+    api_cliente.post("/clientes", json=cliente(11111111))
+    ruta = f"/clientes/{rut(11111111)}"
+    assert api_cliente.get(ruta).json()["DIRECCION"] == "Av. Siempre Viva 742"  # queda en el caché
+    assert api_cliente.patch(ruta, json={"direccion": "Calle Nueva 1"}).status_code == 200
+    assert api_cliente.get(ruta).json()["DIRECCION"] == "Calle Nueva 1"
+    assert api_cliente.put(ruta, json=cliente(11111111, nombre_completo="Otro Nombre")).status_code == 200
+    assert api_cliente.get(ruta).json()["NOMBRE_COMPLETO"] == "Otro Nombre"
+    assert api_cliente.delete(ruta).status_code == 200
+    assert api_cliente.get(ruta).status_code == 404
+
+
+def test_login_y_limite_de_intentos(api_cliente):
+    api_cliente.post("/clientes", json=cliente(11111111))
+    correcto = {"email": "cliente11111111@ferremas.cl", "contrasenia": "secreto123"}
+    assert api_cliente.post("/login", json=correcto).status_code == 200
+    assert api_cliente.post("/login", json={**correcto, "contrasenia": "incorrecta"}).status_code == 401
+    codigos = [api_cliente.post("/login", json={**correcto, "contrasenia": "incorrecta"}).status_code for _ in range(6)]
+    assert codigos[-1] == 429
+    respuesta = api_cliente.post("/login", json=correcto)
+    assert respuesta.status_code == 429
+    assert int(respuesta.headers["Retry-After"]) >= 1
+
+
+def test_carga_masiva_reporta_cada_fila(api_cliente):
+    filas = [cliente(10000000 + i) for i in range(4)]
+    filas[1]["email"] = "no-es-email"
+    filas[3]["email"] = filas[0]["email"]
+    respuesta = api_cliente.post("/clientes/bulk", json=filas).json()
+    assert respuesta["insertados"] == 2
+    assert [f["fila"] for f in respuesta["filas"] if not f.get("ok")] == [1, 3]
@@ -0,0 +1,77 @@
+import time
+
+from app.busqueda import IndiceBusqueda, BuscadorClientes
+
+
+def indice_con(*filas) -> IndiceBusqueda:
+    indice = IndiceBusqueda()
+    indice.cargar(list(filas))
+    indice.terminar_carga()
+    return indice
+
+
+def ruts(resultados: list) -> list:
+    return [rut for rut, _ in resultados]
+
+
+def test_busca_por_palabra_y_prefijo_sin_tildes():
+    indice = indice_con(("1-9", "José Núñez", "jose@ferremas.cl", "Av. Providencia 100"),
+                        ("2-7", "Josefa Soto", "jsoto@ferremas.cl", "Calle Nuñez 5"))
+    assert ruts(indice.buscar("jose", 10)) == ["1-9", "2-7"]  # palabra completa antes que prefijo
+    assert ruts(indice.buscar("NUNEZ jose", 10)) == ["1-9", "2-7"]
+    assert ruts(indice.buscar("providencia", 10)) == ["1-9"]
+    assert indice.buscar("inexistente", 10) == []
+    assert indice.buscar("j", 10) == []  # un término de una letra solo filtra
+
+
+def test_cambios_despues_de_la_carga():
+    indice = indice_con(("1-9", "Ana Pérez", "ana@ferremas.cl", "Calle Uno"))
+    indice.actualizar("2-7", {"NOMBRE_COMPLETO": "Zoe Zapata", "EMAIL": "zoe@ferremas.cl", "DIRECCION": "Calle Dos"})
+    assert ruts(indice.buscar("zapata", 10)) == ["2-7"]
+    indice.actualizar("1-9", {"NOMBRE_COMPLETO": "Ana Rojas"})
+    assert indice.buscar("perez", 10) == []
+    assert ruts(indice.buscar("rojas", 10)) == ["1-9"]
+    indice.actualizar("3-5", {"DIRECCION": "Sin cliente"})  # cambio parcial de un cliente que no está: se ignora
+    assert indice.buscar("cliente", 10) == []
+    indice.eliminar("2-7")
+    assert indice.buscar("zapata", 10) == []
+
+
+def test_cambios_durante_la_carga_ganan_a_la_fila_leida():
+    indice = IndiceBusqueda()
+    indice.cargar([("1-9", "Ana Pérez", "ana@ferremas.cl", "Calle Uno")])
+    # PATCH, PUT y DELETE de clientes que la carga todavía no trae: su fila leída de la BD puede ser más vieja
+    indice.actualizar("2-7", {"NOMBRE_COMPLETO": "Beatriz Soto"})
+    indice.actualizar("3-5", {"NOMBRE_COMPLETO": "Carla Díaz", "EMAIL": "carla@ferremas.cl", "DIRECCION": "Calle Tres"})
+    indice.actualizar("4-3", {"DIRECCION": "Pasaje Nuevo"})
+    indice.eliminar("4-3")
+    indice.cargar([("2-7", "Bea Antigua", "bea@ferremas.cl", "Calle Dos"),
+                   ("3-5", "Carla Vieja", "carla@ferremas.cl", "Calle Tres"),
+                   ("4-3", "Diego Mora", "diego@ferremas.cl", "Calle Cuatro")])
+    indice.terminar_carga()
+    assert ruts(indice.buscar("beatriz", 10)) == ["2-7"]
+    assert ruts(indice.buscar("bea", 10)) == ["2-7"]  # el email de la fila cargada se mantiene
+    assert indice.buscar("antigua", 10) == []
+    assert indice.buscar("vieja", 10) == []
+    assert indice.buscar("diego", 10) == []
+    assert indice.metricas()["documentos"] == 3
+
+
+def test_buscador_carga_en_segundo_plano_y_reparte_cambios():
+    filas = [("1-9", "Ana Pérez", "ana@ferremas.cl", "Calle Uno")]
+
+    def leer_lotes():
+        yield filas
+
+    buscador = BuscadorClientes(leer_lotes, recarga_s=0)
+    assert not buscador.listo
+    buscador.iniciar()
+    limite = time.monotonic() + 5
+    while not buscador.listo and time.monotonic() < limite:
+        time.sleep(0.01)
+    try:
+        assert ruts(buscador.buscar("ana", 10)) == ["1-9"]
+        buscador.actualizar_lote([("2-7", {"NOMBRE_COMPLETO": "Ana Soto", "EMAIL": "asoto@ferremas.cl", "DIRECCION": "x"})])
+        assert sorted(ruts(buscador.buscar("ana", 10))) == ["1-9", "2-7"]
+    finally:
+        buscador.cerrar()
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.cache_clientes import CacheLectura, CacheMemoria
+
+
+def nueva_cache(**opciones) -> CacheLectura:
+    return CacheLectura(CacheMemoria(**opciones))
+
+
+class Carga:
+    # cargar() de prueba: cuenta las llamadas y tarda un poco, como una consulta a la BD
+    def __init__(self, valor=None, error=None):
+        self.valor = {"RUT": "11111111-1"} if valor is None else valor
+        self.error = error
+        self.llamadas = 0
+
+    async def __call__(self):
+        self.llamadas += 1
+        await asyncio.sleep(0.05)
+        if self.error is not None:
+            raise self.error
+        return self.valor
+
+
+def test_una_sola_carga_para_peticiones_juntas():
+    async def probar():
+        cache, carga = nueva_cache(), Carga()
+        resultados = await asyncio.gather(*(cache.obtener_async("rut:1", carga) for _ in range(10)))
+        assert resultados == [carga.valor] * 10
+        assert carga.llamadas == 1
+        assert await cache.obtener_async("rut:1", carga) == carga.valor  # ahora sale del caché
+        assert carga.llamadas == 1
+        assert cache.metricas()["compartidas"] == 9
+
+    asyncio.run(probar())
+
+
+def test_si_se_cancela_la_primera_peticion_las_demas_reciben_el_valor():
+    async def probar():
+        cache, carga = nueva_cache(), Carga()
+        primera = asyncio.create_task(cache.obtener_async("rut:1", carga))
+        await asyncio.sleep(0)  # la primera ya empezó la carga
+        demas = [asyncio.create_task(cache.obtener_async("rut:1", carga)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        primera.cancel()
+        assert await asyncio.gather(*demas) == [carga.valor] * 3
+        assert primera.cancelled()
+        assert carga.llamadas == 1
+
+    asyncio.run(probar())
+
+
+def test_error_de_carga_llega_a_todas_y_no_queda_guardado():
+    async def probar():
+        cache, carga = nueva_cache(), Carga(error=RuntimeError("BD caída"))
+        resultados = await asyncio.gather(*(cache.obtener_async("rut:1", carga) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in resultados)
+        carga.error = None
+        assert await cache.obtener_async("rut:1", carga) == carga.valor  # el siguiente intento vuelve a la BD
+        assert carga.llamadas == 2
+
+    asyncio.run(probar())
+
+
+def test_invalidar_durante_la_carga_no_guarda_datos_viejos():
+    async def probar():
+        cache, carga = nueva_cache(), Carga()
+        tarea = asyncio.create_task(cache.obtener_async("rut:1", carga))
+        await asyncio.sleep(0.01)
+        cache.invalidar("rut:1")  # un PUT confirmó otro valor mientras se leía
+        await tarea
+        await cache.obtener_async("rut:1", carga)
+        assert carga.llamadas == 2
+
+    asyncio.run(probar())
+
+
+def test_lru_saca_la_menos_usada():
+    memoria = CacheMemoria(max_entradas=2, ttl=60)
+    memoria.guardar("a", 1)
+    memoria.guardar("b", 2)
+    memoria.obtener("a")
+    memoria.guardar("c", 3)
+    assert memoria.obtener("b") == (False, None)
+    assert memoria.obtener("a") == (True, 1)
+    assert memoria.metricas()["desalojadas"] == 1
+
+
+def test_configuracion_invalida():
+    with pytest.raises(ValueError):
+        CacheMemoria(max_entradas=0)
@@ -0,0 +1,80 @@
+import pytest
+
+import app.limite_login as limite_login
+from app.limite_login import LimitadorLogin, AlmacenMemoria
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    # Reloj manual para no esperar los bloqueos de verdad
+    ahora = [1000.0]
+    monkeypatch.setattr(limite_login.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def nuevo_limitador(**opciones) -> LimitadorLogin:
+    return LimitadorLogin(AlmacenMemoria(), **opciones)
+
+
+def test_rafaga_por_email_y_recarga(reloj):
+    limitador = nuevo_limitador(rafaga_email=3, por_minuto_email=6)
+    assert [limitador.revisar("ana@ferremas.cl", "10.0.0.1") for _ in range(3)] == [None] * 3
+    espera = limitador.revisar("ANA@ferremas.cl ", "10.0.0.2")  # mismo email aunque cambie la forma o la IP
+    assert espera == pytest.approx(10)
+    reloj[0] += 10
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.1") is None
+
+
+def test_ip_frenada_no_gasta_fichas_del_email(reloj):
+    limitador = nuevo_limitador(rafaga_ip=2, rafaga_email=5, por_minuto_email=0.001)
+    for i in range(2):
+        assert limitador.revisar(f"otro{i}@ferremas.cl", "10.0.0.9") is None
+    # La IP ya no tiene fichas: sus intentos con el email de otra persona no le quitan intentos a esa persona
+    for _ in range(10):
+        assert limitador.revisar("victima@ferremas.cl", "10.0.0.9") is not None
+    assert [limitador.revisar("victima@ferremas.cl", f"10.0.1.{i}") for i in range(5)] == [None] * 5
+
+
+def test_email_rechazado_devuelve_la_ficha_de_la_ip(reloj):
+    limitador = nuevo_limitador(rafaga_email=1, rafaga_ip=2, por_minuto_ip=0.001)
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.1") is None
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.1") is not None
+    assert limitador.revisar("bea@ferremas.cl", "10.0.0.1") is None  # a la IP le quedaba una ficha
+
+
+def test_fallos_seguidos_bloquean_con_tiempo_creciente(reloj):
+    limitador = nuevo_limitador(fallos_email=3, bloqueo_base=30, rafaga_email=100, rafaga_ip=100)
+    for _ in range(3):
+        limitador.registrar_fallo("ana@ferremas.cl", "10.0.0.1")
+        reloj[0] += 0.1
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.2") == pytest.approx(30 - 0.1)
+    reloj[0] += 30
+    limitador.registrar_fallo("ana@ferremas.cl", "10.0.0.1")
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.2") == pytest.approx(60)
+    assert limitador.metricas()["bloqueos"] == 2
+
+
+def test_fallos_espaciados_se_olvidan(reloj):
+    limitador = nuevo_limitador(fallos_email=3, ventana_fallos=900)
+    for _ in range(20):
+        reloj[0] += 600  # un error de tipeo cada 10 minutos
+        assert limitador.revisar("ana@ferremas.cl", "10.0.0.1") is None
+        limitador.registrar_fallo("ana@ferremas.cl", "10.0.0.1")
+    assert limitador.metricas()["bloqueos"] == 0
+
+
+def test_login_correcto_perdona_los_fallos_del_email(reloj):
+    limitador = nuevo_limitador(fallos_email=3)
+    for _ in range(2):
+        limitador.registrar_fallo("ana@ferremas.cl", "10.0.0.1")
+    limitador.registrar_exito("ana@ferremas.cl", "10.0.0.1")
+    limitador.registrar_fallo("ana@ferremas.cl", "10.0.0.1")
+    assert limitador.revisar("ana@ferremas.cl", "10.0.0.1") is None
+
+
+def test_almacen_saca_las_claves_inactivas():
+    limitador = LimitadorLogin(AlmacenMemoria(max_claves=2))
+    for i in range(3):
+        limitador.revisar(f"c{i}@ferremas.cl", None)
+    assert limitador.metricas()["claves"] == 2
+    assert limitador.metricas()["desalojadas"] == 1
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from app.pool_conexiones import PoolConexiones, BackendSQLite, PoolAgotadoError
+
+
+class BackendLento(BackendSQLite):
+    # Cada conexión nueva tarda, como el handshake con Oracle
+    def conectar(self):
+        time.sleep(0.3)
+        return super().conectar()
+
+
+class BackendQueFalla(BackendSQLite):
+    def __init__(self):
+        super().__init__()
+        self.fallar = False
+
+    def conectar(self):
+        if self.fallar:
+            raise ConnectionError("BD caída")
+        return super().conectar()
+
+
+def test_presta_y_devuelve(pool):
+    conexion = pool.adquirir()
+    assert conexion.execute("SELECT 1").fetchone() == (1,)
+    pool.liberar(conexion)
+    metricas = pool.metricas()
+    assert metricas["en_uso"] == 0
+    assert metricas["libres"] == metricas["abiertas"] == 1
+
+
+def test_no_pasa_del_maximo_y_avisa_con_timeout(pool):
+    conexiones = [pool.adquirir() for _ in range(pool.maximo)]
+    with pytest.raises(PoolAgotadoError):
+        pool.adquirir()
+    assert pool.metricas()["timeouts"] == 1
+    for conexion in conexiones:
+        pool.liberar(conexion)
+
+
+def test_conexion_nueva_no_frena_al_resto():
+    # Mientras un hilo abre una conexión lenta, los demás pueden devolver y pedir las que ya están abiertas
+    pool = PoolConexiones(BackendLento(), minimo=1, maximo=3)
+    pool.abrir()
+    try:
+        primera = pool.adquirir()
+        hilo = threading.Thread(target=lambda: pool.liberar(pool.adquirir()))
+        hilo.start()
+        time.sleep(0.05)  # el hilo ya está conectando
+        inicio = time.perf_counter()
+        pool.liberar(primera)
+        pool.liberar(pool.adquirir())
+        assert time.perf_counter() - inicio < 0.1
+        hilo.join()
+    finally:
+        pool.cerrar()
+
+
+def test_falla_al_conectar_devuelve_el_cupo():
+    backend = BackendQueFalla()
+    pool = PoolConexiones(backend, minimo=0, maximo=1)
+    pool.abrir()
+    try:
+        backend.fallar = True
+        with pytest.raises(ConnectionError):
+            pool.adquirir()
+        assert pool.metricas()["abiertas"] == 0
+        backend.fallar = False
+        pool.liberar(pool.adquirir())  # el cupo quedó libre para el siguiente intento
+    finally:
+        pool.cerrar()
+
+
+def test_incremento_abre_varias_de_una_vez():
+    pool = PoolConexiones(BackendSQLite(), minimo=0, maximo=5, incremento=3)
+    pool.abrir()
+    try:
+        pool.liberar(pool.adquirir())
+        limite = time.monotonic() + 2
+        while pool.metricas()["libres"] < 3 and time.monotonic() < limite:
+            time.sleep(0.01)  # las que sobran se abren en otro hilo
+        assert pool.metricas()["abiertas"] == 3
+    finally:
+        pool.cerrar()
+
+
+def test_muchos_hilos_a_la_vez():
+    pool = PoolConexiones(BackendSQLite(), minimo=0, maximo=4, incremento=2, timeout_adquirir=5)
+    pool.abrir()
+    errores = []
+
+    def trabajar():
+        try:
+            for _ in range(50):
+                conexion = pool.adquirir()
+                conexion.execute("SELECT 1").fetchone()
+                pool.liberar(conexion)
+        except Exception as ex:
+            errores.append(ex)
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(12)]
+    try:
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert errores == []
+        metricas = pool.metricas()
+        assert metricas["en_uso"] == 0
+        assert metricas["abiertas"] <= 4
+    finally:
+        pool.cerrar()
+
+
+def test_cerrado_no_presta():
+    pool = PoolConexiones(BackendSQLite(), minimo=1, maximo=1)
+    pool.abrir()
+    pool.cerrar()
+    with pytest.raises(PoolAgotadoError):
+        pool.adquirir()
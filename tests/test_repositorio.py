@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.repositorio import RepositorioClientes, ClienteDuplicadoError, BDOcupadaError, COLUMNAS
+from tests.conftest import rut
+
+
+def fila(cuerpo: int, **cambios) -> dict:
+    datos = {"RUT": rut(cuerpo), "NOMBRE_COMPLETO": f"Cliente {cuerpo}", "EMAIL": f"cliente{cuerpo}@ferremas.cl",
+             "CONTRASENIA": "hash", "REGION": "Metropolitana", "COMUNA": "Ñuñoa", "DIRECCION": "Av. Uno 1"}
+    datos.update(cambios)
+    return datos
+
+
+def test_crear_obtener_actualizar_eliminar(repo):
+    async def probar():
+        datos = fila(11111111)
+        await repo.crear_cliente(datos)
+        assert await repo.obtener_cliente(datos["RUT"]) == datos
+        assert (await repo.obtener_cliente_por_email(datos["EMAIL"]))["RUT"] == datos["RUT"]
+        assert await repo.actualizar_cliente(datos["RUT"], {"DIRECCION": "Calle Dos 2", "RUT": "no se cambia"})
+        assert (await repo.obtener_cliente(datos["RUT"]))["DIRECCION"] == "Calle Dos 2"
+        assert await repo.eliminar_cliente(datos["RUT"])
+        assert await repo.obtener_cliente(datos["RUT"]) is None
+        assert not await repo.actualizar_cliente(datos["RUT"], {"DIRECCION": "x"})
+        assert not await repo.eliminar_cliente(datos["RUT"])
+
+    asyncio.run(probar())
+
+
+def test_duplicados_los_detecta_el_indice_unico(repo):
+    async def probar():
+        await repo.crear_cliente(fila(11111111))
+        with pytest.raises(ClienteDuplicadoError) as error:
+            await repo.crear_cliente(fila(11111111, EMAIL="otro@ferremas.cl"))
+        assert error.value.columna == "RUT"
+        with pytest.raises(ClienteDuplicadoError) as error:
+            await repo.crear_cliente(fila(22222222, EMAIL="cliente11111111@ferremas.cl"))
+        assert error.value.columna == "EMAIL"
+        await repo.crear_cliente(fila(22222222))
+        with pytest.raises(ClienteDuplicadoError):
+            await repo.actualizar_cliente(rut(22222222), {"EMAIL": "cliente11111111@ferremas.cl"})
+
+    asyncio.run(probar())
+
+
+def test_listar_por_paginas_y_filtros(repo):
+    async def probar():
+        cuerpos = [10000000 + i for i in range(7)]
+        for cuerpo in cuerpos:
+            await repo.crear_cliente(fila(cuerpo, COMUNA="Maipú" if cuerpo % 2 else "Ñuñoa"))
+        await repo.crear_cliente(fila(20000000, EMAIL="con_guion@ferremas.cl"))
+        paginas, after = [], None
+        while True:
+            filas = await repo.listar_clientes(["RUT"], 3, after)
+            if not filas:
+                break
+            paginas.append([f[0] for f in filas])
+            after = filas[-1][0]
+        assert sum(paginas, []) == sorted(rut(c) for c in cuerpos + [20000000])
+        assert len(await repo.listar_clientes(["RUT"], 100, comuna="Maipú")) == 3
+        # "_" es comodín en LIKE: el prefijo se escapa y solo calza el email que lo tiene de verdad
+        assert await repo.listar_clientes(["EMAIL"], 100, email_prefijo="con_") == [("con_guion@ferremas.cl",)]
+        assert await repo.listar_clientes(["EMAIL"], 100, email_prefijo="cliente1000000_") == []
+        assert await repo.listar_clientes(["RUT", "NO_EXISTE"], 1) == [(rut(cuerpos[0]),)]
+
+    asyncio.run(probar())
+
+
+def test_reemplazar_contrasenia_solo_si_no_cambio(repo):
+    async def probar():
+        await repo.crear_cliente(fila(11111111, CONTRASENIA="hash-1"))
+        assert not await repo.reemplazar_contrasenia(rut(11111111), "hash-otro", "hash-2")
+        assert await repo.reemplazar_contrasenia(rut(11111111), "hash-1", "hash-2")
+        assert (await repo.obtener_cliente(rut(11111111)))["CONTRASENIA"] == "hash-2"
+
+    asyncio.run(probar())
+
+
+def test_lote_inserta_y_reporta_las_filas_con_error(repo):
+    async def probar():
+        filas = [fila(10000000 + i) for i in range(5)]
+        filas[3]["EMAIL"] = filas[1]["EMAIL"]
+        errores = await repo.insertar_lote(filas)
+        assert list(errores) == [3]
+        ruts, emails = await repo.existentes([filas[0]["RUT"]], [filas[2]["EMAIL"], "nadie@ferremas.cl"])
+        assert ruts == {filas[0]["RUT"], filas[2]["RUT"]}
+        assert emails == {filas[0]["EMAIL"], filas[2]["EMAIL"]}
+        lotes = list(repo.exportar(list(COLUMNAS), 2))
+        assert [len(lote) for lote in lotes] == [2, 2]
+        assert repo.pool.metricas()["en_uso"] == 0  # exportar devolvió su conexión
+
+    asyncio.run(probar())
+
+
+def test_rechaza_cuando_hay_demasiadas_consultas_en_espera(pool):
+    repositorio = RepositorioClientes(pool, max_concurrencia=1, max_pendientes=1)
+
+    async def probar():
+        resultados = await asyncio.gather(*(repositorio.obtener_cliente("1-9") for _ in range(3)), return_exceptions=True)
+        assert resultados[0] is None
+        assert all(isinstance(r, BDOcupadaError) for r in resultados[1:])
+        assert repositorio.metricas()["rechazadas"] == 2
+
+    try:
+        asyncio.run(probar())
+    finally:
+        repositorio.cerrar()
+
+
+def test_asegurar_indices_pasa_la_k_a_mayuscula(pool):
+    from app.main import asegurar_indices
+
+    conexion = pool.adquirir()
+    conexion.execute("INSERT INTO CLIENTES (RUT, NOMBRE_COMPLETO, EMAIL) VALUES ('10000013-k', 'Cliente', 'k@ferremas.cl')")
+    conexion.commit()
+    pool.liberar(conexion)
+    asegurar_indices(pool)
+    conexion = pool.adquirir()
+    assert conexion.execute("SELECT RUT FROM CLIENTES").fetchall() == [("10000013-K",)]
+    pool.liberar(conexion)
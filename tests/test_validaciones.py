@@ -0,0 +1,56 @@
+import pytest
+
+from app.validaciones import (
+    normalizar_rut, calcular_dv, email_valido, region_comuna_oficial, error_cliente, ERROR_RUT, ERROR_EMAIL,
+    ERROR_REGION_COMUNA, ERROR_CONTRASENIA, ERROR_NOMBRE,
+)
+
+
+@pytest.mark.parametrize("entrada, esperado", [
+    ("12345678-5", "12345678-5"),
+    ("12.345.678-5", "12345678-5"),
+    (" 12345678-5 ", "12345678-5"),
+    ("10000013-k", "10000013-K"),
+    ("12345678-4", None),  # dígito verificador incorrecto
+    ("12345678-5\n", None),
+    ("12345678-5\nx", None),
+    ("１２３４５６７８-5", None),  # dígitos que no son ASCII
+    ("123456785", None),
+    ("", None),
+])
+def test_normalizar_rut(entrada, esperado):
+    assert normalizar_rut(entrada) == esperado
+
+
+def test_calcular_dv_coincide_con_el_algoritmo_modulo_11():
+    for cuerpo in range(1000000, 1003000):
+        suma = sum(int(d) * (2 + i % 6) for i, d in enumerate(reversed(str(cuerpo))))
+        esperado = {10: "K", 11: "0"}.get(11 - suma % 11, str(11 - suma % 11))
+        assert calcular_dv(str(cuerpo)) == esperado
+
+
+@pytest.mark.parametrize("email, valido", [
+    ("cliente@ferremas.cl", True),
+    ("nombre.apellido-1@correo.empresa.com", True),
+    ("cliente@ferremas.cl\n", False),
+    ("cliente@ferremas.io", False),
+    ("sin-arroba.cl", False),
+])
+def test_email_valido(email, valido):
+    assert email_valido(email) is valido
+
+
+def test_region_y_comuna_se_guardan_con_el_nombre_oficial():
+    assert region_comuna_oficial("metropolitana", "NUNOA") == ("Metropolitana", "Ñuñoa")
+    assert region_comuna_oficial("Metropolitana", "Valparaíso") is None
+    assert region_comuna_oficial("No existe", "Ñuñoa") is None
+
+
+def test_error_cliente_devuelve_el_primer_error():
+    bueno = ("12345678-5", "Juan Pérez", "juan@ferremas.cl", "secreto123", "Metropolitana", "Ñuñoa")
+    assert error_cliente(*bueno) is None
+    assert error_cliente("12345678-4", *bueno[1:]) == ERROR_RUT
+    assert error_cliente(bueno[0], "12345", *bueno[2:]) == ERROR_NOMBRE
+    assert error_cliente(*bueno[:2], "juan", *bueno[3:]) == ERROR_EMAIL
+    assert error_cliente(*bueno[:4], "Maule", "Ñuñoa") == ERROR_REGION_COMUNA
+    assert error_cliente(*bueno[:3], "corta", *bueno[4:]) == ERROR_CONTRASENIA